@@ -14,6 +14,7 @@ from app.api.v1.profile import router as profile_router
 from app.api.v1.legal import router as legal_router
 from app.api.v1.routes_notifications import router as notifications_router
 from app.api.v1.routes_cron import router as cron_router
+from app.api.v1.routes_stream import router as stream_router
 
 api_router = APIRouter()
 
@@ -29,4 +30,5 @@ api_router.include_router(admin_router)  # ✅ NEW
 api_router.include_router(profile_router)
 api_router.include_router(legal_router)
 api_router.include_router(notifications_router)
-api_router.include_router(cron_router)
\ No newline at end of file
+api_router.include_router(cron_router)
+api_router.include_router(stream_router)
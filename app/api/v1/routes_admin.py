@@ -1,6 +1,8 @@
 # app/api/v1/routes_admin.py
 from __future__ import annotations
 
+from typing import Optional
+
 from fastapi import APIRouter, Depends
 from sqlmodel import Session, select, func
 
@@ -8,6 +10,13 @@ from app.db import get_session
 from app.models.coffee_db import CoffeeReadingDB
 from app.models.tarot_db import TarotReadingDB
 from app.models.payment_db import PaymentDB
+from app.repositories.claims import claim_stats
+from app.services import ai_circuit, ai_ledger, ai_retry, ai_usage, token_budget
+from app.services.ai_limiter import limiter_stats
+from app.services.generation_jobs import queue_stats
+from app.services.openai_service import image_cache_stats, openai_pool_stats
+from app.services.processing_reaper import reaper_stats
+from app.services.single_flight import single_flight_stats
 
 
 router = APIRouter(prefix="/admin", tags=["admin"])
@@ -27,3 +36,79 @@ def db_stats(session: Session = Depends(get_session)):
             "payments": int(payment_count or 0),
         },
     }
+
+
+@router.get("/openai-pool")
+def openai_pool():
+    return {"ok": True, "pool": openai_pool_stats()}
+
+
+@router.get("/image-cache")
+def image_cache():
+    return {"ok": True, "cache": image_cache_stats()}
+
+
+@router.get("/claims")
+def claims():
+    # lost: eşzamanlı /generate'te kilidi başka istek aldı (ya da sonuç zaten hazırdı)
+    return {"ok": True, "claims": claim_stats()}
+
+
+@router.get("/reaper")
+def reaper():
+    return {"ok": True, "reaper": reaper_stats()}
+
+
+@router.get("/single-flight")
+def single_flight():
+    # coalesced: lider'e bağlanan (ikinci OpenAI çağrısı yapmayan) istekler
+    return {"ok": True, "single_flight": single_flight_stats()}
+
+
+@router.get("/generation-queue")
+def generation_queue():
+    # Öncelik sınıfı (paid / prepay / backfill) başına kuyruk ve bekleme süresi
+    return {"ok": True, "queue": queue_stats()}
+
+
+@router.get("/openai-limiter")
+def openai_limiter():
+    # Model bazında limit (AIMD), kullanımdaki / bekleyen slot, ret ve 429 sayıları
+    return {"ok": True, "limiters": limiter_stats()}
+
+
+@router.get("/openai-circuit")
+def openai_circuit():
+    # Breaker durumu (closed/open/half_open), açılma sebebi, pencere hata oranı, ret / probe sayıları
+    return {"ok": True, "circuit": ai_circuit.breaker.stats()}
+
+
+@router.get("/openai-retries")
+def openai_retries():
+    # Aşama bazında tekrar sayısı, toplam bekleme, Retry-After'a uyulan deneme, bütçe / deneme hakkı biten
+    return {"ok": True, "stages": ai_retry.retry_stats()}
+
+
+@router.get("/openai-usage")
+def openai_usage():
+    # Ürün / aşama bazında input, cached (prompt cache isabeti) ve output token; cached oranı ve tahmini input tasarrufu.
+    # Cache sadece min_cacheable_input_tokens ve üstü input'ta devreye girer (eligible_calls / eligible_hit_rate)
+    return {
+        "ok": True,
+        "min_cacheable_input_tokens": ai_usage.PROMPT_CACHE_MIN_TOKENS,
+        "usage": ai_usage.usage_stats(),
+    }
+
+
+@router.get("/ai-calls")
+def ai_calls(days: int = 7, product: Optional[str] = None):
+    # ai_calls defteri: gün -> ürün -> p50/p95 gecikme ve token (+ aşama kırılımı: validate, initial, continue_n, fusion ...)
+    # aggregated_in: postgres (SQL percentile_cont) | python (SQLite; truncated ise en yeni AI_LEDGER_STATS_MAX_ROWS satır)
+    stats = ai_ledger.daily_stats(days=max(1, min(int(days), 90)), product=product)
+    return {"ok": True, "ledger": ai_ledger.ledger_counters(), **stats}
+
+
+@router.get("/token-budgets")
+def token_budgets():
+    # (ürün, açılım/konu) bazında seçilen ilk max_output_tokens, kaynağı (variant/product/static), devam oranı ve ort. hop
+    return {"ok": True, "budgets": token_budget.budget_stats()}
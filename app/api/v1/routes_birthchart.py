@@ -10,9 +10,10 @@ from sqlmodel import Session, select
 from app.db import get_session
 from app.core.device import get_device_id
 from app.models.birthchart_db import BirthChartReadingDB
+from app.repositories.claims import claim_processing
 from app.schemas.birthchart import BirthChartStartRequest
 from app.repositories.birthchart_repo import birthchart_repo
-from app.services.birthchart_service import generate_birthchart_reading
+from app.services.generation_jobs import enqueue_generation
 
 router = APIRouter(prefix="/birthchart", tags=["birthchart"])
 
@@ -134,42 +135,17 @@ def generate(
         fixed = birthchart_repo.set_status(session=session, reading_id=reading_id, status="done")
         return _mask_result_if_unpaid(fixed or reading)
 
-    # ✅ processing: Başka bir istek zaten yorum üretiyor; boş reading dönme, 409 ver ki istemci tekrar denesin.
-    if status == "processing":
+    # ✅ atomik processing kilidi (takılı kalmış processing'i de kurtarır)
+    if not claim_processing(session, BirthChartReadingDB, reading_id, product="birthchart"):
+        fresh = birthchart_repo.get(session=session, reading_id=reading_id) or reading
+        if (fresh.get("result_text") or "").strip():
+            return _mask_result_if_unpaid(fresh)
+        # Başka bir istek zaten yorum üretiyor; boş reading dönme, 409 ver ki istemci tekrar denesin.
         raise HTTPException(
             status_code=409,
             detail="Yorum hazırlanıyor, lütfen bekleyin.",
         )
 
-    # ✅ production generate
-    birthchart_repo.set_status(session=session, reading_id=reading_id, status="processing")
-
-    try:
-        result_text = generate_birthchart_reading(
-            name=reading.get("name") or "",
-            birth_date=reading.get("birth_date") or "",
-            birth_time=reading.get("birth_time"),
-            birth_city=reading.get("birth_city") or "",
-            birth_country=reading.get("birth_country") or "TR",
-            topic=reading.get("topic") or "genel",
-            question=reading.get("question"),
-        )
-        if not (result_text or "").strip():
-            birthchart_repo.set_status(session=session, reading_id=reading_id, status="paid")
-            raise HTTPException(
-                status_code=500,
-                detail="Doğum haritası yorumu boş döndü. Lütfen tekrar deneyin.",
-            )
-        updated = birthchart_repo.set_result(session=session, reading_id=reading_id, result_text=result_text.strip())
-        try:
-            from app.services.fcm_service import send_reading_ready_notification
-            send_reading_ready_notification(device_id)
-        except Exception:
-            pass
-        return _mask_result_if_unpaid(updated)
-
-    except HTTPException:
-        raise
-    except Exception as e:
-        birthchart_repo.set_status(session=session, reading_id=reading_id, status="paid")
-        raise HTTPException(status_code=500, detail=f"Doğum haritası yorum üretilemedi: {e}")
+    # ✅ kuyruğa bırak; yorum worker'da üretilir, istemci GET ile takip eder
+    enqueue_generation(session, "birthchart", reading_id)
+    return _mask_result_if_unpaid(birthchart_repo.get(session=session, reading_id=reading_id) or reading)
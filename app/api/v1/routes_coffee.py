@@ -1,6 +1,5 @@
 from __future__ import annotations
 
-import os
 from typing import List
 from datetime import datetime
 
@@ -12,19 +11,21 @@ from app.db import get_session
 from app.core.config import settings
 from app.core.device import get_device_id
 from app.models.coffee_db import CoffeeReadingDB
+from app.repositories.claims import claim_processing
 from app.repositories.coffee_repo import (
     get_reading,
     create_reading,
     update_reading,
     set_photos,
     list_photos,
-    set_status,
 )
-from app.services.storage import save_uploads
+from app.services import ai_ledger
+from app.services.storage import delete_uploads, save_uploads
+from app.services.generation_jobs import enqueue_generation
 from app.services.openai_service import (
-    generate_fortune,
-    validate_coffee_images,
+    avalidate_coffee_images,
     AIInsufficientQuotaError,
+    AIServiceSaturatedError,
     AIServiceUnavailableError,
     AIServiceError,
 )
@@ -33,6 +34,9 @@ from app.schemas.coffee import CoffeeStartRequest, CoffeeReading
 
 router = APIRouter(prefix="/coffee", tags=["coffee"])
 
+# Doğrulama reddi mesajı (upload'da 400, üretimde reddedilirse GET'te reject_reason + /generate 400)
+COFFEE_REJECTED_DETAIL = "Lütfen sadece kahve fincanı içi fotoğrafı yükleyin."
+
 
 class RatingRequest(BaseModel):
     rating: int
@@ -97,17 +101,13 @@ def _to_schema(r: CoffeeReadingDB) -> CoffeeReading:
         rating=r.rating,
         is_paid=r.is_paid,
         payment_ref=r.payment_ref,
+        reject_reason=COFFEE_REJECTED_DETAIL if r.status == "rejected" else None,
         created_at=r.created_at,
     )
 
 
 def _delete_paths(paths: List[str]) -> None:
-    for p in paths:
-        try:
-            if os.path.exists(p):
-                os.remove(p)
-        except Exception:
-            pass
+    delete_uploads(paths)
 
 
 # --------------------------------------------------
@@ -161,7 +161,11 @@ async def upload_images(
     # ✅ Upload aşamasında AI doğrulama başarısız olursa 500 değil doğru kod dönelim.
     # ✅ Quota/servis hatasında dosyaları silmiyoruz (kullanıcı daha sonra tekrar deneyebilir).
     try:
-        verdict = validate_coffee_images(saved)
+        with ai_ledger.reading("coffee", reading_id):
+            verdict = await avalidate_coffee_images(saved)
+    except AIServiceSaturatedError:
+        # main.py handler'ı: hızlı 503 + Retry-After
+        raise
     except AIInsufficientQuotaError:
         # 429 quota/billing -> 503
         raise HTTPException(
@@ -182,10 +186,7 @@ async def upload_images(
     if not verdict.get("ok"):
         # ✅ Bu gerçek bir doğrulama reddi -> burada dosyaları silmek mantıklı
         _delete_paths(saved)
-        raise HTTPException(
-            status_code=400,
-            detail="Lütfen sadece kahve fincanı içi fotoğrafı yükleyin.",
-        )
+        raise HTTPException(status_code=400, detail=COFFEE_REJECTED_DETAIL)
 
     r = set_photos(session, reading_id, saved)
     r.status = "photos_uploaded"
@@ -206,6 +207,10 @@ async def generate(
 ):
     r = _get_or_404_owner(session, reading_id, device_id)
 
+    # Üretim işi görselleri reddettiyse (fotoğraflar silindi): yeniden yüklenene kadar aynı 400
+    if r.status == "rejected":
+        raise HTTPException(status_code=400, detail=COFFEE_REJECTED_DETAIL)
+
     photos = list_photos(r)
     if not photos:
         raise HTTPException(status_code=400, detail="Fotoğraf yüklenmedi")
@@ -219,82 +224,13 @@ async def generate(
     if r.status == "processing":
         return _to_schema(r)
 
-    # ✅ Generate öncesi ikinci doğrulama
-    try:
-        verdict = validate_coffee_images(photos)
-    except AIInsufficientQuotaError:
-        raise HTTPException(
-            status_code=503,
-            detail="AI servis kotası şu anda yetersiz (billing/quota). Lütfen daha sonra tekrar dene.",
-        )
-    except AIServiceUnavailableError:
-        raise HTTPException(
-            status_code=503,
-            detail="AI servisi geçici olarak yoğun/ulaşılamıyor. Lütfen biraz sonra tekrar dene.",
-        )
-    except AIServiceError:
-        raise HTTPException(
-            status_code=503,
-            detail="AI servisinde beklenmeyen bir sorun oluştu. Lütfen daha sonra tekrar dene.",
-        )
-
-    if not verdict.get("ok"):
-        raise HTTPException(
-            status_code=400,
-            detail="Lütfen sadece kahve fincanı içi fotoğrafı yükleyin.",
-        )
-
-    # ✅ artık üretime geçiyoruz
-    set_status(session, reading_id, "processing")
-
-    try:
-        text = generate_fortune(
-            name=r.name,
-            topic=r.topic,
-            question=r.question,
-            image_paths=photos,
-        ).strip()
-
-        if not text:
-            raise RuntimeError("Boş sonuç")
-
-        r = set_status(session, reading_id, "completed", comment=text)
-        try:
-            from app.services.fcm_service import send_reading_ready_notification
-            send_reading_ready_notification(device_id)
-        except Exception:
-            pass
-        return _to_schema(r)
-
-    except AIInsufficientQuotaError:
-        # ✅ processing'de kalmasın
-        set_status(session, reading_id, "paid")
-        raise HTTPException(
-            status_code=503,
-            detail="AI servis kotası şu anda yetersiz (billing/quota). Lütfen daha sonra tekrar dene.",
-        )
-
-    except AIServiceUnavailableError:
-        set_status(session, reading_id, "paid")
-        raise HTTPException(
-            status_code=503,
-            detail="AI servisi geçici olarak yoğun/ulaşılamıyor. Lütfen biraz sonra tekrar dene.",
-        )
-
-    except AIServiceError:
-        set_status(session, reading_id, "paid")
-        raise HTTPException(
-            status_code=503,
-            detail="AI servisinde beklenmeyen bir sorun oluştu. Lütfen daha sonra tekrar dene.",
-        )
-
-    except Exception as e:
-        # ✅ processing'de kalmasın
-        set_status(session, reading_id, "paid")
-        raise HTTPException(
-            status_code=500,
-            detail=f"Kahve falı üretilemedi: {e}",
-        )
+    # ✅ atomik processing kilidi; eşzamanlı ikinci istek ikinci üretimi başlatmaz.
+    # Doğrulama burada tekrar yapılmaz: iş tek vision çağrısı yapar (upload'daki karar cache'te ise
+    # sadece yorum, değilse COFFEE_SINGLE_PASS ile doğrula + yorumla); ret "rejected" olarak yazılır.
+    if claim_processing(session, CoffeeReadingDB, reading_id, product="coffee"):
+        # fal worker'da üretilir, istemci GET ile takip eder
+        enqueue_generation(session, "coffee", reading_id)
+    return _to_schema(_get_or_404_owner(session, reading_id, device_id))
 
 
 # --------------------------------------------------
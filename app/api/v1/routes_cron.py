@@ -4,9 +4,13 @@ Cron endpoint'leri: dış scheduler (örn. cron-job.org) günde bir bu URL'yi ç
 from __future__ import annotations
 
 from fastapi import APIRouter, Header, HTTPException
+from sqlmodel import Session
 
 from app.core.config import settings
+from app.db import engine
+from app.repositories import vision_verdict_repo
 from app.services import fcm_service
+from app.services.processing_reaper import sweep_stale_processing
 
 router = APIRouter(prefix="/cron", tags=["cron"])
 
@@ -26,3 +30,19 @@ def daily_reminder(x_cron_secret: str | None = Header(default=None, alias="X-Cro
     _check_cron_secret(x_cron_secret)
     sent = fcm_service.send_daily_reminder_to_all()
     return {"ok": True, "sent": sent}
+
+
+@router.post("/purge-caches")
+def purge_caches(x_cron_secret: str | None = Header(default=None, alias="X-Cron-Secret")):
+    """Süresi dolmuş görsel doğrulama kararlarını siler. Günde bir kez çağrılması yeterli."""
+    _check_cron_secret(x_cron_secret)
+    with Session(engine) as session:
+        purged = vision_verdict_repo.purge_expired(session)
+    return {"ok": True, "vision_verdicts": purged}
+
+
+@router.post("/reap-processing")
+def reap_processing(x_cron_secret: str | None = Header(default=None, alias="X-Cron-Secret")):
+    """processing'de takılı okumaları tekrar kuyruğa bırakır / sıfırlar (worker reaper'ı yoksa dakikada bir)."""
+    _check_cron_secret(x_cron_secret)
+    return {"ok": True, "recovered": sweep_stale_processing()}
@@ -1,7 +1,6 @@
 # app/api/v1/routes_hand.py
 from __future__ import annotations
 
-import os
 from typing import List, Optional
 from datetime import datetime
 
@@ -13,16 +12,18 @@ from app.db import get_session
 from app.core.config import settings
 from app.core.device import get_device_id
 from app.models.hand_db import HandReadingDB
+from app.repositories.claims import claim_processing
 from app.repositories.hand_repo import (
     get_reading,
     create_reading,
     update_reading,
     set_photos,
     list_photos,
-    set_status,
 )
-from app.services.storage import save_uploads
-from app.services.openai_service import generate_hand_fortune, validate_hand_images
+from app.services import ai_ledger
+from app.services.storage import delete_uploads, save_uploads
+from app.services.generation_jobs import enqueue_generation
+from app.services.openai_service import avalidate_hand_images
 from app.schemas.hand import HandStartRequest, HandReading  # sende bu schema zaten var diye varsayıyorum
 
 router = APIRouter(prefix="/hand", tags=["hand"])
@@ -104,12 +105,7 @@ def _to_schema(r: HandReadingDB) -> HandReading:
 
 
 def _delete_paths(paths: List[str]) -> None:
-    for p in paths:
-        try:
-            if os.path.exists(p):
-                os.remove(p)
-        except Exception:
-            pass
+    delete_uploads(paths)
 
 
 @router.post("/start", response_model=HandReading)
@@ -164,7 +160,8 @@ async def upload_images(
 
     saved = await save_uploads(reading_id, files)
 
-    verdict = validate_hand_images(saved)
+    with ai_ledger.reading("hand", reading_id):
+        verdict = await avalidate_hand_images(saved)
     if not verdict.get("ok", False):
         _delete_paths(saved)
         reason = (verdict.get("reason") or "").strip()
@@ -235,7 +232,8 @@ async def generate(
     if status == "processing":
         return _to_schema(r)
 
-    verdict = validate_hand_images(photos)
+    with ai_ledger.reading("hand", reading_id):
+        verdict = await avalidate_hand_images(photos)
     if not verdict.get("ok", False):
         reason = (verdict.get("reason") or "").strip()
         msg = "Lütfen yalnızca avuç içi (palm) fotoğrafı yükleyiniz."
@@ -243,37 +241,11 @@ async def generate(
             msg = f"{msg} ({reason})"
         raise HTTPException(status_code=400, detail=msg)
 
-    set_status(session, reading_id, "processing")
-
-    try:
-        comment = generate_hand_fortune(
-            name=r.name,
-            topic=r.topic,
-            question=r.question,
-            image_paths=photos,
-        )
-        comment = (comment or "").strip()
-
-        if not comment:
-            set_status(session, reading_id, "paid", comment=None)
-            raise HTTPException(status_code=500, detail="Yorum üretilemedi (boş sonuç).")
-
-        r2 = set_status(session, reading_id, "completed", comment=comment)
-        try:
-            from app.services.fcm_service import send_reading_ready_notification
-            send_reading_ready_notification(device_id)
-        except Exception:
-            pass
-        return _to_schema(r2)
-
-    except HTTPException:
-        raise
-    except Exception as e:
-        try:
-            set_status(session, reading_id, "paid", comment=None)
-        except Exception:
-            pass
-        raise HTTPException(status_code=500, detail=f"El falı yorum üretilemedi: {e}")
+    # ✅ atomik processing kilidi; eşzamanlı ikinci istek ikinci üretimi başlatmaz
+    if claim_processing(session, HandReadingDB, reading_id, product="hand"):
+        # yorum worker'da üretilir, istemci GET ile takip eder
+        enqueue_generation(session, "hand", reading_id)
+    return _to_schema(_get_or_404_owner(session, reading_id, device_id))
 
 
 @router.get("/{reading_id}", response_model=HandReading)
@@ -1,7 +1,6 @@
 # app/api/v1/routes_numerology.py
 from __future__ import annotations
 
-from datetime import datetime, timedelta, timezone
 from typing import Any, Dict
 
 from fastapi import APIRouter, Depends, HTTPException
@@ -11,8 +10,9 @@ from app.core.device import get_device_id
 from app.db import get_session
 from app.models.numerology_db import NumerologyReadingDB
 from app.schemas.numerology import NumerologyStartIn, NumerologyReadingOut, MarkPaidIn
+from app.repositories.claims import claim_processing
 from app.repositories.numerology_repo import NumerologyRepo
-from app.services.openai_service import generate_numerology_reading
+from app.services.generation_jobs import enqueue_generation
 
 router = APIRouter(prefix="/numerology", tags=["numerology"])
 _repo = NumerologyRepo()
@@ -92,23 +92,6 @@ def _mask_result_if_unpaid(obj: Any) -> Dict[str, Any]:
     return d
 
 
-def _stale_processing_for_retry(d: Dict[str, Any], minutes: int = 10) -> bool:
-    """
-    Üretim sırasında sunucu kesilirse satır 'processing' + boş result'ta kalıyordu;
-    /generate her çağrıda erken dönüp yorumu sonsuza dek kilitleyebiliyordu.
-    Kayıt yeterince eskiyse yeniden üretime izin ver.
-    """
-    u = d.get("updated_at") or d.get("created_at")
-    if not isinstance(u, datetime):
-        return True
-    now = datetime.now(timezone.utc)
-    if u.tzinfo is None:
-        u_utc = u.replace(tzinfo=timezone.utc)
-    else:
-        u_utc = u.astimezone(timezone.utc)
-    return (now - u_utc) > timedelta(minutes=minutes)
-
-
 @router.post("/start", response_model=NumerologyReadingOut)
 def start(
     payload: NumerologyStartIn,
@@ -199,69 +182,15 @@ def generate(
     d = _require_owner(obj, device_id)
 
     # Ödeme öncesi de generate çağrılabilir (yorum DB'de, _mask_result_if_unpaid ile gizlenir)
-    status = (d.get("status") or "").lower().strip()
     result_text = (d.get("result_text") or "").strip()
 
     if result_text:
         return _mask_result_if_unpaid(obj)
 
-    if status == "processing":
-        # result_text yoksa buradayız (üstte doluysa döndük)
-        if _stale_processing_for_retry(d, minutes=10):
-            # Ödenmişse tekrar üret; ödenmemişse processing tuzağından çıkar (ödeme akışına dönsün)
-            if bool(d.get("is_paid")):
-                _repo.set_status(session=session, reading_id=reading_id, status="paid")
-            else:
-                _repo.set_status(session=session, reading_id=reading_id, status="started")
-            obj = _repo.get(session=session, reading_id=reading_id) or obj
-            d = _as_dict(obj)
-            status = (d.get("status") or "").lower().strip()
-            if not bool(d.get("is_paid")) and status == "started":
-                return _mask_result_if_unpaid(obj)
-        else:
-            return _mask_result_if_unpaid(obj)
-
-    if status not in ("paid", "processing", "completed"):
-        _repo.set_status(session=session, reading_id=reading_id, status="paid")
-        obj = _repo.get(session=session, reading_id=reading_id) or obj
-        d = _as_dict(obj)
-        status = (d.get("status") or "").lower().strip()
-
-    _repo.set_status(session=session, reading_id=reading_id, status="processing")
-
-    try:
-        text = generate_numerology_reading(
-            name=d.get("name", ""),
-            birth_date=d.get("birth_date", ""),
-            topic=d.get("topic", "genel"),
-            question=d.get("question"),
-        )
-        text = (text or "").strip()
-        if not text:
-            _repo.set_status(session=session, reading_id=reading_id, status="paid")
-            raise HTTPException(status_code=500, detail="Yorum üretilemedi (boş sonuç).")
+    # ✅ atomik processing kilidi (takılı kalmış processing'i de kurtarır); kaybeden istek ikinci üretim başlatmaz
+    if claim_processing(session, NumerologyReadingDB, reading_id, product="numerology"):
+        # yorum worker'da üretilir, istemci GET ile takip eder
+        enqueue_generation(session, "numerology", reading_id)
 
-        updated = _repo.set_result(session=session, reading_id=reading_id, result_text=text)
-        if not updated:
-            _repo.set_status(session=session, reading_id=reading_id, status="paid")
-            raise HTTPException(status_code=500, detail="AI sonucu DB'ye yazılamadı.")
-
-        try:
-            _repo.set_status(session=session, reading_id=reading_id, status="completed")
-        except Exception:
-            pass
-
-        try:
-            from app.services.fcm_service import send_reading_ready_notification
-            send_reading_ready_notification(device_id)
-        except Exception:
-            pass
-
-        return _mask_result_if_unpaid(updated)
-
-    except HTTPException:
-        _repo.set_status(session=session, reading_id=reading_id, status="paid")
-        raise
-    except Exception as e:
-        _repo.set_status(session=session, reading_id=reading_id, status="paid")
-        raise HTTPException(status_code=500, detail=f"Numerology yorum üretilemedi: {e}")
+    obj = _repo.get(session=session, reading_id=reading_id) or obj
+    return _mask_result_if_unpaid(obj)
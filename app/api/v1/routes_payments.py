@@ -32,6 +32,7 @@ from app.repositories.numerology_repo import NumerologyRepo
 from app.repositories.birthchart_repo import birthchart_repo
 from app.repositories.personality_repo import personality_repo
 from app.repositories.synastry_repo import synastry_repo
+from app.services.generation_jobs import promote_generation
 
 
 router = APIRouter(prefix="/payments", tags=["payments"])
@@ -200,7 +201,23 @@ def _unlock_reading_for_product(
     """
     ✅ CRITICAL: unlock işlemi idempotent olmalı.
     Yani tekrar çağrılırsa zarar vermemeli.
+    Ödeme öncesi bırakılmış üretim işi kuyrukta bekliyorsa ödenmiş önceliğine yükseltilir.
     """
+    _unlock_reading_row(session=session, product=product, reading_id=reading_id, payment_ref=payment_ref)
+    try:
+        promote_generation(session, product, reading_id)
+    except Exception:
+        # Öncelik yükseltme best-effort; unlock'u bozmasın
+        session.rollback()
+
+
+def _unlock_reading_row(
+    *,
+    session: Session,
+    product: str,
+    reading_id: str,
+    payment_ref: str,
+) -> None:
 
     # -------------------------
     # TAROT (kart seçimi şart)
@@ -3,19 +3,20 @@ from __future__ import annotations
 from uuid import uuid4
 from typing import Optional
 
-from fastapi import APIRouter, HTTPException, Depends, Header, BackgroundTasks
+from fastapi import APIRouter, HTTPException, Depends, Header
 from fastapi.responses import Response
 from sqlmodel import Session, select
 
-from app.db import get_session, engine
+from app.db import get_session
 from app.models.personality_db import PersonalityReadingDB
+from app.repositories.claims import claim_processing
 from app.schemas.personality import (
     PersonalityStartRequest,
     PersonalityMarkPaidRequest,
     PersonalityRatingRequest,
 )
 from app.repositories.personality_repo import personality_repo
-from app.services.personality_service import generate_personality_reading
+from app.services.generation_jobs import enqueue_generation
 from app.services.pdf_service import build_personality_pdf_bytes
 
 router = APIRouter(
@@ -145,85 +146,9 @@ def mark_paid(
     return _mask_result_if_unpaid(updated)
 
 
-def _bg_generate_personality(reading_id: str) -> None:
-    """
-    BackgroundTasks içinde çalışır.
-    Burada request session yok: yeni Session(engine) açıyoruz.
-    """
-    from datetime import datetime
-
-    with Session(engine) as session:
-        reading = personality_repo.get(session=session, reading_id=reading_id)
-        if not reading:
-            return
-
-        # ödeme kontrol
-        # Ödeme öncesi generate: is_paid kontrolü kaldırıldı (yorum saklanır, API göstermez)
-        if False and not reading.get("is_paid"):
-            # paid değilse processing’te bırakmayalım
-            personality_repo.set_status(session=session, reading_id=reading_id, status="paid")
-            return
-
-        try:
-            result_text = generate_personality_reading(
-                name=reading.get("name") or "",
-                birth_date=reading.get("birth_date") or "",
-                birth_time=reading.get("birth_time"),
-                birth_city=reading.get("birth_city") or "",
-                birth_country=reading.get("birth_country") or "TR",
-                topic=reading.get("topic") or "genel",
-                question=reading.get("question"),
-            )
-
-            personality_repo.set_result(
-                session=session,
-                reading_id=reading_id,
-                result_text=result_text,
-            )
-            did = (reading.get("device_id") or "").strip()
-            if did:
-                try:
-                    from app.services.fcm_service import send_reading_ready_notification
-                    send_reading_ready_notification(did)
-                except Exception:
-                    pass
-        except Exception as first_err:
-            # başarısızsa tekrar paid’e çek ki kullanıcı yeniden denesin
-            import time
-            for _ in range(3):
-                try:
-                    time.sleep(5)
-                    result_text = generate_personality_reading(
-                        name=reading.get("name") or "",
-                        birth_date=reading.get("birth_date") or "",
-                        birth_time=reading.get("birth_time"),
-                        birth_city=reading.get("birth_city") or "",
-                        birth_country=reading.get("birth_country") or "TR",
-                        topic=reading.get("topic") or "genel",
-                        question=reading.get("question"),
-                    )
-                    personality_repo.set_result(
-                        session=session,
-                        reading_id=reading_id,
-                        result_text=result_text,
-                    )
-                    did = (reading.get("device_id") or "").strip()
-                    if did:
-                        try:
-                            from app.services.fcm_service import send_reading_ready_notification
-                            send_reading_ready_notification(did)
-                        except Exception:
-                            pass
-                    return
-                except Exception:
-                    pass
-            personality_repo.set_status(session=session, reading_id=reading_id, status="paid")
-
-
 @router.post("/{reading_id}/generate")
 def generate_personality(
     reading_id: str,
-    background: BackgroundTasks,
     session: Session = Depends(get_session),
     x_device_id: Optional[str] = Header(default=None, alias="X-Device-Id"),
 ):
@@ -244,13 +169,10 @@ def generate_personality(
             return _mask_result_if_unpaid(fixed or reading)
         return _mask_result_if_unpaid(reading)
 
-    # ✅ zaten processing ise tekrar enqueue etme
-    if status == "processing":
-        return _mask_result_if_unpaid(personality_repo.get(session=session, reading_id=reading_id) or reading)
-
-    # ✅ processing'e çek ve background job başlat
-    personality_repo.set_status(session=session, reading_id=reading_id, status="processing")
-    background.add_task(_bg_generate_personality, reading_id)
+    # ✅ atomik processing kilidi: zaten processing ise (stale değilse) tekrar enqueue etme
+    if claim_processing(session, PersonalityReadingDB, reading_id, product="personality"):
+        # worker üretir; süreç yeniden başlasa da iş kaybolmaz
+        enqueue_generation(session, "personality", reading_id)
 
     # ✅ HEMEN dön (timeout bitti)
     return _mask_result_if_unpaid(personality_repo.get(session=session, reading_id=reading_id) or reading)
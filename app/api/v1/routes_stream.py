@@ -0,0 +1,483 @@
+# app/api/v1/routes_stream.py
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+import time
+from concurrent.futures import Future
+from dataclasses import dataclass
+from typing import Any, AsyncIterator, Callable, Dict, Optional, Tuple
+
+from fastapi import APIRouter, Depends, HTTPException
+from fastapi.responses import StreamingResponse
+from sqlmodel import Session
+
+from app.core.device import get_device_id
+from app.db import engine, get_session
+from app.models.birthchart_db import BirthChartReadingDB
+from app.models.numerology_db import NumerologyReadingDB
+from app.repositories import tarot_repo
+from app.repositories.claims import claim_processing
+from app.repositories.birthchart_repo import birthchart_repo
+from app.repositories.numerology_repo import numerology_repo
+from app.repositories.synastry_repo import synastry_repo
+from app.models.generation_job_db import GenerationJobDB
+from app.services import ai_ledger, ai_retry, generation_jobs, single_flight
+from app.services.generation_jobs import enqueue_generation
+from app.services.openai_service import (
+    AIServiceError,
+    ReadingPrompt,
+    astream_reading,
+    build_birthchart_prompt,
+    build_numerology_prompt,
+    build_synastry_prompt,
+    build_tarot_prompt,
+    join_reading_chunks,
+)
+
+router = APIRouter(tags=["stream"])
+log = logging.getLogger("lunaura.stream")
+
+# Ödenmemiş yorumda metin gönderilmez; sadece her N parçada bir ilerleme bildirilir.
+_PROGRESS_EVERY_CHUNKS = 20
+
+# create_task referansları GC'ye gitmesin; istemci koparsa üretim yine tamamlanıp DB'ye yazılır.
+# task -> (product, reading_id, devralınan iş): kapanışta bitmeyenler generation_jobs kuyruğuna devredilir.
+_RUNNING: Dict["asyncio.Task[None]", Tuple[str, str, Optional[GenerationJobDB]]] = {}
+_draining = False
+
+# /generate'in kuyruğa bıraktığı işi devralan stream'ler generation_jobs.locked_by'da böyle görünür
+_STREAM_WORKER = f"{generation_jobs.worker_id_prefix()}:stream"
+
+
+@dataclass(frozen=True)
+class _StreamProduct:
+    load: Callable[[Session, str], Optional[Dict[str, Any]]]
+    claim: Callable[[Session, Dict[str, Any]], bool]
+    build_prompt: Callable[[Dict[str, Any]], ReadingPrompt]
+    save: Callable[[Session, str, str], None]
+
+
+# -------------------------
+# TAROT
+# -------------------------
+def _tarot_load(session: Session, reading_id: str) -> Optional[Dict[str, Any]]:
+    r = tarot_repo.get_reading(session, reading_id)
+    if not r:
+        return None
+    d = r.model_dump()
+    d["cards"] = r.get_cards()
+    return d
+
+
+def _tarot_claim(session: Session, reading: Dict[str, Any]) -> bool:
+    if not reading.get("cards"):
+        raise HTTPException(status_code=400, detail="Önce kart seçmelisin.")
+    return tarot_repo.claim_processing(session, reading["id"])
+
+
+def _tarot_prompt(reading: Dict[str, Any]) -> ReadingPrompt:
+    return build_tarot_prompt(
+        name=reading.get("name") or "",
+        age=reading.get("age"),
+        topic=reading.get("topic") or "",
+        question=reading.get("question") or "",
+        spread_type=reading.get("spread_type") or "",
+        selected_cards=reading.get("cards") or [],
+    )
+
+
+def _tarot_save(session: Session, reading_id: str, text: str) -> None:
+    tarot_repo.set_status(session, reading_id, "completed", result_text=text)
+
+
+# -------------------------
+# NUMEROLOGY
+# -------------------------
+def _numerology_claim(session: Session, reading: Dict[str, Any]) -> bool:
+    return claim_processing(session, NumerologyReadingDB, reading["id"], product="numerology")
+
+
+def _numerology_prompt(reading: Dict[str, Any]) -> ReadingPrompt:
+    return build_numerology_prompt(
+        name=reading.get("name", ""),
+        birth_date=reading.get("birth_date", ""),
+        topic=reading.get("topic", "genel"),
+        question=reading.get("question"),
+    )
+
+
+def _numerology_save(session: Session, reading_id: str, text: str) -> None:
+    numerology_repo.set_result(session=session, reading_id=reading_id, result_text=text)
+
+
+# -------------------------
+# BIRTHCHART
+# -------------------------
+def _birthchart_claim(session: Session, reading: Dict[str, Any]) -> bool:
+    return claim_processing(session, BirthChartReadingDB, reading["id"], product="birthchart")
+
+
+def _birthchart_prompt(reading: Dict[str, Any]) -> ReadingPrompt:
+    return build_birthchart_prompt(
+        name=reading.get("name") or "",
+        birth_date=reading.get("birth_date") or "",
+        birth_time=reading.get("birth_time"),
+        birth_city=reading.get("birth_city") or "",
+        birth_country=reading.get("birth_country") or "TR",
+        topic=reading.get("topic") or "genel",
+        question=reading.get("question"),
+    )
+
+
+def _birthchart_save(session: Session, reading_id: str, text: str) -> None:
+    birthchart_repo.set_result(session=session, reading_id=reading_id, result_text=text)
+
+
+# -------------------------
+# SYNASTRY
+# -------------------------
+def _synastry_claim(session: Session, reading: Dict[str, Any]) -> bool:
+    _fresh, claimed = synastry_repo.claim_processing(session=session, reading_id=reading["id"])
+    return claimed
+
+
+def _synastry_prompt(reading: Dict[str, Any]) -> ReadingPrompt:
+    return build_synastry_prompt(
+        name_a=reading.get("name_a") or "",
+        birth_date_a=reading.get("birth_date_a") or "",
+        birth_time_a=reading.get("birth_time_a"),
+        birth_city_a=reading.get("birth_city_a") or "",
+        birth_country_a=reading.get("birth_country_a") or "TR",
+        name_b=reading.get("name_b") or "",
+        birth_date_b=reading.get("birth_date_b") or "",
+        birth_time_b=reading.get("birth_time_b"),
+        birth_city_b=reading.get("birth_city_b") or "",
+        birth_country_b=reading.get("birth_country_b") or "TR",
+        topic=reading.get("topic") or "Genel",
+        question=reading.get("question"),
+    )
+
+
+def _synastry_save(session: Session, reading_id: str, text: str) -> None:
+    synastry_repo.set_result(session=session, reading_id=reading_id, result_text=text)
+
+
+_PRODUCTS: Dict[str, _StreamProduct] = {
+    "tarot": _StreamProduct(_tarot_load, _tarot_claim, _tarot_prompt, _tarot_save),
+    "numerology": _StreamProduct(
+        lambda s, rid: numerology_repo.get(session=s, reading_id=rid),
+        _numerology_claim,
+        _numerology_prompt,
+        _numerology_save,
+    ),
+    "birthchart": _StreamProduct(
+        lambda s, rid: birthchart_repo.get(session=s, reading_id=rid),
+        _birthchart_claim,
+        _birthchart_prompt,
+        _birthchart_save,
+    ),
+    "synastry": _StreamProduct(
+        lambda s, rid: synastry_repo.get(session=s, reading_id=rid),
+        _synastry_claim,
+        _synastry_prompt,
+        _synastry_save,
+    ),
+}
+
+
+# -------------------------
+# SSE helpers
+# -------------------------
+def _sse(event: str, data: Dict[str, Any]) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False, default=str)}\n\n"
+
+
+def _final_payload(reading: Dict[str, Any]) -> Dict[str, Any]:
+    """Ödeme yapılmamışsa result_text istemciye gönderilmez."""
+    has_result = bool((reading.get("result_text") or "").strip())
+    return {
+        "status": reading.get("status"),
+        "is_paid": bool(reading.get("is_paid")),
+        "has_result": has_result,
+        "result_text": reading.get("result_text") if reading.get("is_paid") else None,
+    }
+
+
+def _persist_result(spec: _StreamProduct, reading: Dict[str, Any], text: str) -> Dict[str, Any]:
+    with Session(engine) as session:
+        spec.save(session, reading["id"], text)
+        saved = spec.load(session, reading["id"]) or reading
+
+    did = (reading.get("device_id") or "").strip()
+    if did:
+        try:
+            from app.services.fcm_service import send_reading_ready_notification
+            send_reading_ready_notification(did)
+        except Exception:
+            pass
+    return saved
+
+
+def _release_claim(product: str, reading: Dict[str, Any]) -> None:
+    # Bırakma kuralları (ödenmiş -> paid, değilse ürünün ödeme öncesi durumu) worker ile ortak
+    try:
+        with Session(engine) as session:
+            generation_jobs.release_reading(session, product, reading["id"])
+    except Exception:
+        log.exception("Stream release failed for reading_id=%s", reading.get("id"))
+
+
+async def _generate(
+    spec: _StreamProduct,
+    flight: single_flight.Flight,
+    reading: Dict[str, Any],
+    prompt: ReadingPrompt,
+    queue: "asyncio.Queue[tuple[str, Any]]",
+    job: Optional[GenerationJobDB] = None,
+) -> None:
+    chunks: list[str] = []
+    saved: Optional[Dict[str, Any]] = None
+    failure: Optional[BaseException] = None
+    try:
+        # Okuma başına retry bütçesi (stream açılışı + devam hop'ları paylaşır); metrikler / defter ürün adına
+        with (
+            ai_retry.reading_budget(flight.product, flight.reading_id),
+            ai_retry.stage(flight.product),
+            ai_ledger.reading(flight.product, flight.reading_id),
+        ):
+            async for delta in astream_reading(prompt):
+                chunks.append(delta)
+                queue.put_nowait(("delta", delta))
+
+        text = join_reading_chunks(chunks)
+        if not text:
+            raise RuntimeError("Boş sonuç")
+
+        saved = await asyncio.to_thread(_persist_result, spec, reading, text)
+        if job is not None:
+            await asyncio.to_thread(generation_jobs.finish_taken_over, job)
+        queue.put_nowait(("done", saved))
+    except Exception as e:
+        failure = e
+        log.exception("Stream generation failed for reading_id=%s", reading.get("id"))
+        if job is not None:
+            # Devralınan iş: worker ile aynı retry muhasebesi; hak kaldıysa okuma processing'de kalır, worker dener
+            if await asyncio.to_thread(generation_jobs.fail_taken_over, job, e) != "failed":
+                queue.put_nowait(("requeued", None))
+                return
+        else:
+            await asyncio.to_thread(_release_claim, flight.product, reading)
+        detail = str(e) if isinstance(e, AIServiceError) else "Yorum üretilemedi."
+        queue.put_nowait(("error", detail))
+    except asyncio.CancelledError as e:
+        # Kapanış drain'i: claim bırakılmaz, okuma kuyruğa devredilir (drain_streams)
+        failure = e
+        raise
+    finally:
+        await asyncio.to_thread(flight.finish, saved, failure)
+
+
+async def _pump(queue: "asyncio.Queue[tuple[str, Any]]", *, is_paid: bool) -> AsyncIterator[str]:
+    yield _sse("status", {"status": "processing", "is_paid": is_paid})
+
+    chunks = 0
+    chars = 0
+    while True:
+        kind, payload = await queue.get()
+        if kind == "delta":
+            chunks += 1
+            chars += len(payload)
+            if is_paid:
+                yield _sse("delta", {"text": payload})
+            elif chunks % _PROGRESS_EVERY_CHUNKS == 0:
+                yield _sse("progress", {"chars": chars})
+        elif kind == "done":
+            yield _sse("done", _final_payload(payload))
+            return
+        elif kind == "requeued":
+            # Üretim kuyrukta tekrar denenecek; istemci GET ile takip eder
+            yield _sse("status", {"status": "processing", "is_paid": is_paid})
+            return
+        else:
+            yield _sse("error", {"detail": payload})
+            return
+
+
+async def _single(event: str, data: Dict[str, Any]) -> AsyncIterator[str]:
+    yield _sse(event, data)
+
+
+async def _follow(
+    spec: _StreamProduct,
+    reading_id: str,
+    leader_result: "Future[Any]",
+    *,
+    is_paid: bool,
+) -> AsyncIterator[str]:
+    """Aynı okumayı üreten lider'e bağlanır; ikinci OpenAI çağrısı yapmadan sonucu done olarak döner."""
+    yield _sse("status", {"status": "processing", "is_paid": is_paid})
+    try:
+        await asyncio.wrap_future(leader_result)
+    except Exception:
+        yield _sse("error", {"detail": "Yorum üretilemedi."})
+        return
+
+    def _load() -> Optional[Dict[str, Any]]:
+        with Session(engine) as session:
+            return spec.load(session, reading_id)
+
+    fresh = await asyncio.to_thread(_load)
+    if fresh and (fresh.get("result_text") or "").strip():
+        yield _sse("done", _final_payload(fresh))
+    else:
+        yield _sse("error", {"detail": "Yorum üretilemedi."})
+
+
+def _event_stream(body: AsyncIterator[str]) -> StreamingResponse:
+    return StreamingResponse(
+        body,
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@router.get("/{product}/{reading_id}/stream")
+async def stream_reading(
+    product: str,
+    reading_id: str,
+    session: Session = Depends(get_session),
+    device_id: str = Depends(get_device_id),
+):
+    """
+    Yorumu Server-Sent Events ile üretir (tarot, numerology, birthchart, synastry).
+
+    Olaylar:
+      status   -> üretim başladı
+      delta    -> metin parçası (sadece ödenmiş yorumda)
+      progress -> üretilen karakter sayısı (ödenmemiş yorumda; metin gizli)
+      done     -> kalıcı kayıt sonrası son durum (ödenmemişse result_text=None)
+      error    -> üretim başarısız; kayıt tekrar denenebilir duruma çekildi
+    Yorum zaten varsa / başka istek üretiyorsa tek bir done/status olayı döner.
+
+    Mobil uygulama önce /generate çağırır: okuma processing'dedir ve iş kuyrukta bekler. Hiçbir worker
+    henüz almadıysa stream işi devralır (generation_jobs.take_over) ve metni yine canlı akıtır;
+    iş zaten bir worker'daysa tek status olayı döner ve istemci GET ile takip eder.
+    """
+    product = (product or "").lower().strip()
+    spec = _PRODUCTS.get(product)
+    if not spec:
+        raise HTTPException(status_code=404, detail=f"Streaming desteklenmiyor: {product}")
+
+    reading = spec.load(session, reading_id)
+    if not reading:
+        raise HTTPException(status_code=404, detail="Reading not found")
+
+    stored = (reading.get("device_id") or "").strip()
+    if stored and stored != device_id:
+        raise HTTPException(status_code=404, detail="Reading not found")
+
+    if (reading.get("result_text") or "").strip():
+        return _event_stream(_single("done", _final_payload(reading)))
+
+    is_paid = bool(reading.get("is_paid"))
+    processing = _single("status", {"status": "processing", "is_paid": is_paid})
+
+    job: Optional[GenerationJobDB] = None
+    if not spec.claim(session, reading):
+        # Bu süreçte aynı okuma üretiliyorsa sonucuna bağlan
+        leader_result = single_flight.follow(product, reading_id)
+        if leader_result is not None:
+            return _event_stream(_follow(spec, reading_id, leader_result, is_paid=is_paid))
+        # /generate kuyruğa bıraktı ama henüz başlamadıysa işi devral; değilse istemci GET ile takip eder
+        if not _draining:
+            job = await asyncio.to_thread(generation_jobs.take_over, product, reading_id, _STREAM_WORKER)
+        if job is None:
+            return _event_stream(processing)
+
+    try:
+        flight = await asyncio.to_thread(single_flight.begin, product, reading_id)
+    except single_flight.SingleFlightBusy as e:
+        # Başka worker üretiyor (stale reclaim sonrası); claim'i bırakma, o üretim sonucu yazacak
+        if job is not None:
+            await asyncio.to_thread(
+                generation_jobs.return_taken_over, job, str(e), delay_seconds=generation_jobs.BUSY_RETRY_SECONDS
+            )
+        return _event_stream(processing)
+    if not flight.leader:
+        if job is not None:
+            await asyncio.to_thread(
+                generation_jobs.return_taken_over,
+                job,
+                "generation in progress",
+                delay_seconds=generation_jobs.BUSY_RETRY_SECONDS,
+            )
+        return _event_stream(_follow(spec, reading_id, flight.future, is_paid=is_paid))
+
+    if _draining:
+        # Süreç kapanıyor: üretimi burada başlatma, kalıcı kuyruğa bırak (devralınan iş de geri verilir)
+        await asyncio.to_thread(flight.finish)
+        await asyncio.to_thread(_hand_over, product, reading_id, job)
+        return _event_stream(processing)
+
+    try:
+        prompt = spec.build_prompt(reading)
+    except Exception:
+        await asyncio.to_thread(flight.finish)
+        if job is not None:
+            await asyncio.to_thread(generation_jobs.return_taken_over, job, "stream prompt build failed")
+        raise
+    queue: "asyncio.Queue[tuple[str, Any]]" = asyncio.Queue()
+    task = asyncio.create_task(_generate(spec, flight, reading, prompt, queue, job))
+    _RUNNING[task] = (product, reading_id, job)
+    task.add_done_callback(lambda t: _RUNNING.pop(t, None))
+
+    return _event_stream(_pump(queue, is_paid=is_paid))
+
+
+def _hand_over(product: str, reading_id: str, job: Optional[GenerationJobDB] = None) -> None:
+    try:
+        if job is not None:
+            # Devralınan iş bu stream'de running: lease beklemeden kuyruğa geri ver
+            generation_jobs.return_taken_over(job, "stream drained on shutdown")
+            return
+        with Session(engine) as session:
+            enqueue_generation(session, product, reading_id)
+    except Exception:
+        log.exception("Stream hand over failed for %s/%s", product, reading_id)
+
+
+async def drain_streams(deadline_seconds: float) -> Dict[str, int]:
+    """
+    Kapanış: yeni stream üretimi başlatma, sürenleri deadline_seconds'a kadar bekle;
+    bitmeyenleri iptal edip generation_jobs kuyruğuna devret (okuma processing'de kalır, worker bitirir).
+    """
+    global _draining
+    _draining = True
+    started = time.monotonic()
+    running = dict(_RUNNING)
+    if running:
+        await asyncio.wait(list(running), timeout=max(0.0, float(deadline_seconds)))
+
+    unfinished = [(t, key) for t, key in running.items() if not t.done()]
+    for t, _ in unfinished:
+        t.cancel()
+    if unfinished:
+        await asyncio.gather(*(t for t, _ in unfinished), return_exceptions=True)
+    for _, (product, reading_id, job) in unfinished:
+        await asyncio.to_thread(_hand_over, product, reading_id, job)
+
+    counts = {
+        "in_flight": len(running),
+        "completed": len(running) - len(unfinished),
+        "handed_back": len(unfinished),
+    }
+    log.info(
+        "Stream drain: in_flight=%d completed=%d handed_back=%d waited=%.1fs",
+        counts["in_flight"],
+        counts["completed"],
+        counts["handed_back"],
+        time.monotonic() - started,
+    )
+    return counts
@@ -12,7 +12,7 @@ from app.models.synastry_db import SynastryReadingDB
 from app.schemas.synastry import SynastryStartRequest, SynastryMarkPaidRequest, SynastryRatingRequest
 from app.repositories.synastry_repo import synastry_repo
 
-from app.services.synastry_service import generate_synastry_reading
+from app.services.generation_jobs import enqueue_generation
 from app.services.pdf_service import build_synastry_pdf_bytes
 
 
@@ -121,37 +121,13 @@ def generate(reading_id: str, session: Session = Depends(get_session)):
     if (reading.get("result_text") or "").strip():
         return _mask_result_if_unpaid(reading)
 
-    if (reading.get("status") or "").lower().strip() == "processing" and not claimed:
+    # Kilidi başka istek aldı (ya da sonuç hazır): ikinci üretimi başlatma
+    if not claimed:
         return _mask_result_if_unpaid(reading)
 
-    try:
-        result_text = generate_synastry_reading(
-            name_a=reading.get("name_a") or "",
-            birth_date_a=reading.get("birth_date_a") or "",
-            birth_time_a=reading.get("birth_time_a"),
-            birth_city_a=reading.get("birth_city_a") or "",
-            birth_country_a=reading.get("birth_country_a") or "TR",
-            name_b=reading.get("name_b") or "",
-            birth_date_b=reading.get("birth_date_b") or "",
-            birth_time_b=reading.get("birth_time_b"),
-            birth_city_b=reading.get("birth_city_b") or "",
-            birth_country_b=reading.get("birth_country_b") or "TR",
-            topic=reading.get("topic") or "Genel",
-            question=reading.get("question"),
-        )
-        updated = synastry_repo.set_result(session=session, reading_id=reading_id, result_text=result_text)
-        did = (reading.get("device_id") or "").strip()
-        if did:
-            try:
-                from app.services.fcm_service import send_reading_ready_notification
-                send_reading_ready_notification(did)
-            except Exception:
-                pass
-        return _mask_result_if_unpaid(updated)
-    except Exception as e:
-        fallback_status = "paid" if reading.get("is_paid") else "started"
-        synastry_repo.set_status(session=session, reading_id=reading_id, status=fallback_status)
-        raise HTTPException(status_code=500, detail=f"Synastry üretilemedi: {e}")
+    # ✅ kuyruğa bırak; yorum worker'da üretilir, istemci GET ile takip eder
+    enqueue_generation(session, "synastry", reading_id)
+    return _mask_result_if_unpaid(reading)
 
 
 @router.post("/{reading_id}/rate")
@@ -2,14 +2,13 @@ from __future__ import annotations
 
 from datetime import datetime
 from uuid import uuid4
-import threading
 import logging
 
 from fastapi import APIRouter, Depends, HTTPException
 from sqlmodel import Session, select
 
 from app.core.device import get_device_id
-from app.db import engine, get_session
+from app.db import get_session
 from app.models.tarot_db import TarotReadingDB
 from app.repositories import tarot_repo
 from app.schemas.tarot import (
@@ -19,71 +18,12 @@ from app.schemas.tarot import (
     TarotRatingRequest,
     TarotReading,
 )
-from app.services.openai_service import generate_tarot_reading
+from app.services.generation_jobs import enqueue_generation
 
 router = APIRouter(prefix="/tarot", tags=["tarot"])
 log = logging.getLogger("lunaura.tarot")
 
 
-def _run_generation_in_background(reading_id: str) -> None:
-    """
-    OpenAI uzun sürebilir, request'i bloklamasın diye thread'de çalışır.
-    Hata durumunda 4 kez daha dener (toplam 5); yorum mutlaka düşsün.
-    """
-    from sqlmodel import Session as _Session
-
-    max_attempts = 5
-    for attempt in range(1, max_attempts + 1):
-        with _Session(engine) as session:
-            r = tarot_repo.get_reading(session, reading_id)
-            if not r:
-                return
-
-            if r.status == "completed" and (r.result_text or "").strip():
-                return
-
-            if not r.get_cards():
-                tarot_repo.set_status(session, reading_id, "paid" if r.is_paid else "pending_payment")
-                return
-
-            try:
-                cards = r.get_cards()
-                text = generate_tarot_reading(
-                    name=r.name,
-                    age=r.age,
-                    topic=r.topic,
-                    question=r.question,
-                    spread_type=r.spread_type,
-                    selected_cards=cards,
-                )
-                tarot_repo.set_status(session, reading_id, "completed", result_text=text)
-                did = (r.device_id or "").strip()
-                if did:
-                    try:
-                        from app.services.fcm_service import send_reading_ready_notification
-                        send_reading_ready_notification(did)
-                    except Exception:
-                        pass
-                return
-            except Exception:
-                log.exception(
-                    "Tarot generation attempt %s/%s failed for reading_id=%s",
-                    attempt,
-                    max_attempts,
-                    reading_id,
-                )
-                if attempt == max_attempts:
-                    tarot_repo.set_status(session, reading_id, "paid" if r.is_paid else "pending_payment")
-                    return
-                import time
-                time.sleep(5)
-
-
-def _spawn_thread(reading_id: str) -> None:
-    t = threading.Thread(target=_run_generation_in_background, args=(reading_id,), daemon=True)
-    t.start()
-
-
 def _to_schema(r: TarotReadingDB) -> TarotReading:
     """Ödeme yapılmamışsa yorum (result_text) istemciye gönderilmez."""
     has_result = bool((r.result_text or "").strip())
@@ -233,9 +173,9 @@ async def generate(
         return _to_schema(r)
 
     # ✅ stale processing kurtarma + atomic lock
-    claimed = tarot_repo.claim_processing(session, reading_id, stale_seconds=120)
+    claimed = tarot_repo.claim_processing(session, reading_id)
     if claimed:
-        _spawn_thread(reading_id)
+        enqueue_generation(session, "tarot", reading_id)
 
     r = _get_or_404(session, reading_id)
     return _to_schema(r)
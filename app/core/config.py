@@ -41,11 +41,89 @@ class Settings(BaseSettings):
     # OpenAI
     openai_api_key: str = Field(default="", alias="OPENAI_API_KEY")
     openai_model: str = Field(default="gpt-4.1-mini", alias="OPENAI_MODEL")
-    openai_max_output_tokens: int = Field(default=2500, alias="OPENAI_MAX_OUTPUT_TOKENS")
+    # > 0 ise tüm ilk çağrı / devam bütçelerini ezer (global override); 0: çağrı noktası varsayılanı + token_budget
+    openai_max_output_tokens: int = Field(default=0, alias="OPENAI_MAX_OUTPUT_TOKENS")
 
     # Railway timeout / retry
     openai_timeout_seconds: int = Field(default=90, alias="OPENAI_TIMEOUT_SECONDS")
-    openai_max_retries: int = Field(default=2, alias="OPENAI_MAX_RETRIES")
+    # SDK'nın kendi tekrarları (limiter / breaker dışında kalır); tekrarlar ai_retry politikasıyla yapılır
+    openai_max_retries: int = Field(default=0, alias="OPENAI_MAX_RETRIES")
+
+    # Ortak retry politikası (decorrelated jitter, Retry-After / x-ratelimit-reset-* alt sınır)
+    openai_retry_max_attempts: int = Field(default=3, alias="OPENAI_RETRY_MAX_ATTEMPTS")
+    openai_retry_base_seconds: float = Field(default=0.5, alias="OPENAI_RETRY_BASE_SECONDS")
+    openai_retry_cap_seconds: float = Field(default=20.0, alias="OPENAI_RETRY_CAP_SECONDS")
+    # Okuma başına toplam bütçe (tüm aşamalar ortak): yeniden deneme sayısı + toplam bekleme
+    openai_retry_budget_per_reading: int = Field(default=6, alias="OPENAI_RETRY_BUDGET_PER_READING")
+    openai_retry_budget_seconds: float = Field(default=60.0, alias="OPENAI_RETRY_BUDGET_SECONDS")
+
+    # Prompt cache isabetinde cached input token indirimi (gpt-4.1 ailesi %75, gpt-4o %50); maliyet metriği için
+    openai_cached_input_discount: float = Field(default=0.75, alias="OPENAI_CACHED_INPUT_DISCOUNT")
+
+    # OpenAI çağrı defteri (ai_calls): tamponlanır, flush thread'i toplu yazar
+    ai_ledger_enabled: bool = Field(default=True, alias="AI_LEDGER_ENABLED")
+    ai_ledger_flush_seconds: float = Field(default=2.0, alias="AI_LEDGER_FLUSH_SECONDS")
+    ai_ledger_batch_size: int = Field(default=200, alias="AI_LEDGER_BATCH_SIZE")
+    ai_ledger_buffer_max: int = Field(default=10000, alias="AI_LEDGER_BUFFER_MAX")
+    # Postgres'te p50/p95 SQL'de (percentile_cont); SQLite yedek yolu en yeni bu kadar satırı Python'da özetler
+    ai_ledger_stats_max_rows: int = Field(default=200000, alias="AI_LEDGER_STATS_MAX_ROWS")
+
+    # Uyarlamalı ilk max_output_tokens: (ürün, açılım/konu) bazında gözlenen output dağılımından
+    token_budget_enabled: bool = Field(default=True, alias="TOKEN_BUDGET_ENABLED")
+    token_budget_target_continuation_rate: float = Field(default=0.05, alias="TOKEN_BUDGET_TARGET_CONTINUATION_RATE")
+    token_budget_min_samples: int = Field(default=20, alias="TOKEN_BUDGET_MIN_SAMPLES")
+    token_budget_headroom: float = Field(default=1.10, alias="TOKEN_BUDGET_HEADROOM")
+    token_budget_window: int = Field(default=500, alias="TOKEN_BUDGET_WINDOW")
+    token_budget_floor: int = Field(default=800, alias="TOKEN_BUDGET_FLOOR")
+    token_budget_ceiling: int = Field(default=6000, alias="TOKEN_BUDGET_CEILING")
+    # Açılışta ai_calls defterinden ısınma (gün; 0 kapalı)
+    token_budget_warm_start_days: int = Field(default=7, alias="TOKEN_BUDGET_WARM_START_DAYS")
+
+    # OpenAI connection pool (süreç başına tek client)
+    openai_max_connections: int = Field(default=20, alias="OPENAI_MAX_CONNECTIONS")
+    openai_max_keepalive_connections: int = Field(default=10, alias="OPENAI_MAX_KEEPALIVE_CONNECTIONS")
+    openai_keepalive_expiry_seconds: float = Field(default=120.0, alias="OPENAI_KEEPALIVE_EXPIRY_SECONDS")
+    openai_warmup: bool = Field(default=True, alias="OPENAI_WARMUP")
+    openai_warmup_timeout_seconds: float = Field(default=5.0, alias="OPENAI_WARMUP_TIMEOUT_SECONDS")
+
+    # Model bazında eşzamanlı OpenAI çağrısı (AIMD: 429'da yarıya iner, başarıda artar)
+    openai_concurrency_initial: int = Field(default=8, alias="OPENAI_CONCURRENCY_INITIAL")
+    openai_concurrency_min: int = Field(default=2, alias="OPENAI_CONCURRENCY_MIN")
+    openai_concurrency_max: int = Field(default=32, alias="OPENAI_CONCURRENCY_MAX")
+    # Model bazlı başlangıç limiti: "gpt-4.1-mini=16,gpt-4o=6"
+    openai_concurrency_per_model: str = Field(default="", alias="OPENAI_CONCURRENCY_PER_MODEL")
+    # Slot bekleyen çağrı kuyruğu; dolunca / süre aşılınca hızlı 503 + Retry-After
+    openai_queue_max: int = Field(default=64, alias="OPENAI_QUEUE_MAX")
+    openai_queue_timeout_seconds: float = Field(default=20.0, alias="OPENAI_QUEUE_TIMEOUT_SECONDS")
+
+    # OpenAI circuit breaker: pencere içi hata oranı / art arda timeout ile açılır, açıkken çağrılar ms'de reddedilir
+    openai_circuit_window_seconds: float = Field(default=60.0, alias="OPENAI_CIRCUIT_WINDOW_SECONDS")
+    openai_circuit_min_calls: int = Field(default=10, alias="OPENAI_CIRCUIT_MIN_CALLS")
+    openai_circuit_error_rate: float = Field(default=0.5, alias="OPENAI_CIRCUIT_ERROR_RATE")
+    openai_circuit_consecutive_timeouts: int = Field(default=3, alias="OPENAI_CIRCUIT_CONSECUTIVE_TIMEOUTS")
+    openai_circuit_open_seconds: float = Field(default=30.0, alias="OPENAI_CIRCUIT_OPEN_SECONDS")
+    openai_circuit_quota_open_seconds: float = Field(default=300.0, alias="OPENAI_CIRCUIT_QUOTA_OPEN_SECONDS")
+
+    # Üretim kuyruğu (generation_jobs): web süreci içi tüketici sayısı (0 = sadece ayrı worker)
+    generation_inline_workers: int = Field(default=2, alias="GENERATION_INLINE_WORKERS")
+    # Ayrı worker süreci (python -m app.worker) içinde eşzamanlı üretim sayısı
+    generation_worker_concurrency: int = Field(default=4, alias="GENERATION_WORKER_CONCURRENCY")
+    generation_job_max_attempts: int = Field(default=5, alias="GENERATION_JOB_MAX_ATTEMPTS")
+    generation_job_retry_base_seconds: float = Field(default=5.0, alias="GENERATION_JOB_RETRY_BASE_SECONDS")
+    generation_job_retry_cap_seconds: float = Field(default=120.0, alias="GENERATION_JOB_RETRY_CAP_SECONDS")
+    # running işin lease süresi: worker ölürse bu süreden sonra başka worker alır
+    generation_job_lease_seconds: int = Field(default=900, alias="GENERATION_JOB_LEASE_SECONDS")
+    # Kapanışta (SIGTERM / deploy) süren üretimler için bekleme süresi; gunicorn --graceful-timeout'tan kısa olmalı
+    generation_drain_seconds: float = Field(default=45.0, alias="GENERATION_DRAIN_SECONDS")
+
+    # processing'de takılı okumaları tarayan reaper (0 = kapalı; cron endpoint'i yine çalışır)
+    processing_reaper_interval_seconds: int = Field(default=60, alias="PROCESSING_REAPER_INTERVAL_SECONDS")
+    # Ürün bazlı eşik override'ı: "personality=1200,coffee=600" (boş = claims.STALE_SECONDS)
+    processing_reaper_thresholds: str = Field(default="", alias="PROCESSING_REAPER_THRESHOLDS")
+    processing_reaper_batch: int = Field(default=200, alias="PROCESSING_REAPER_BATCH")
+
+    # Kişilik analizi (numeroloji ∥ doğum haritası -> füzyon) için toplam süre sınırı
+    personality_deadline_seconds: float = Field(default=420.0, alias="PERSONALITY_DEADLINE_SECONDS")
 
     cors_origins_raw: str = Field(default="*", alias="CORS_ORIGINS")
 
@@ -57,6 +135,19 @@ class Settings(BaseSettings):
     min_photos: int = 3
     max_photos: int = 5
 
+    # Vision türevi: upload anında EXIF düzeltilip küçültülür, vision çağrıları bunu kullanır
+    vision_image_long_edge: int = Field(default=1536, alias="VISION_IMAGE_LONG_EDGE")
+    vision_image_format: str = Field(default="jpeg", alias="VISION_IMAGE_FORMAT")  # jpeg | webp
+    vision_image_quality: int = Field(default=82, alias="VISION_IMAGE_QUALITY")
+    # Doğrulama thumb'ı (detail=low): model zaten 512x512'ye indirir, sabit ~85 görsel token
+    vision_thumb_long_edge: int = Field(default=512, alias="VISION_THUMB_LONG_EDGE")
+    # Süreç içi base64 data URL LRU cache'i (byte cinsinden üst sınır, 0 = kapalı)
+    vision_data_url_cache_bytes: int = Field(default=64 * 1024 * 1024, alias="VISION_DATA_URL_CACHE_BYTES")
+    # Görsel doğrulama kararı cache TTL (sn, 0 = kapalı)
+    vision_verdict_ttl_seconds: int = Field(default=7 * 24 * 3600, alias="VISION_VERDICT_TTL_SECONDS")
+    # Kahve /generate: doğrulama + yorum tek vision çağrısında (false = eski iki aşamalı akış)
+    coffee_single_pass: bool = Field(default=True, alias="COFFEE_SINGLE_PASS")
+
     # FCM: Yorum hazır push bildirimi (JSON string veya boş = bildirim gönderilmez)
     firebase_credentials_json: Optional[str] = Field(default=None, alias="FIREBASE_CREDENTIALS_JSON")
     # Cron: günlük hatırlatma endpoint'i için gizli token (boş = cron kapalı)
@@ -18,6 +18,9 @@ from app.models.synastry_db import SynastryReadingDB  # noqa: F401
 from app.models.payment_db import PaymentDB  # noqa: F401
 from app.models.profile_db import UserProfileDB  # noqa: F401
 from app.models.legal_consent_db import LegalConsentDB  # noqa: F401
+from app.models.vision_verdict_db import VisionVerdictDB  # noqa: F401
+from app.models.generation_job_db import GenerationJobDB  # noqa: F401
+from app.models.ai_call_db import AICallDB  # noqa: F401
 
 
 def _normalize_database_url(url: str) -> str:
@@ -475,6 +478,18 @@ def ensure_legal_consent_schema() -> None:
     )
 
 
+def ensure_generation_jobs_schema() -> None:
+    _ensure_columns(
+        "generation_jobs",
+        {
+            "priority": "INTEGER",
+        },
+    )
+    if (_is_sqlite() and _sqlite_has_table("generation_jobs")) or (_is_postgres() and _pg_has_table("generation_jobs")):
+        with engine.begin() as conn:
+            conn.execute(text("UPDATE generation_jobs SET priority = 1 WHERE priority IS NULL;"))
+
+
 def ensure_profile_constraints() -> None:
     if not _is_postgres():
         return
@@ -492,6 +507,28 @@ def ensure_profile_constraints() -> None:
         )
 
 
+# Stale "processing" reaper: status + updated_at üzerinden tek indexli sorgu
+_READING_TABLES = (
+    "coffee_readings",
+    "hand_readings",
+    "tarot_readings",
+    "numerology_readings",
+    "birthchart_readings",
+    "personality_readings",
+    "synastry_readings",
+)
+
+
+def ensure_processing_indexes() -> None:
+    for t in _READING_TABLES:
+        if _is_sqlite() and not _sqlite_has_table(t):
+            continue
+        if _is_postgres() and not _pg_has_table(t):
+            continue
+        with engine.begin() as conn:
+            conn.execute(text(f"CREATE INDEX IF NOT EXISTS ix_{t}_status_updated_at ON {t} (status, updated_at);"))
+
+
 def init_db() -> None:
     try:
         if db_url.startswith("sqlite"):
@@ -513,6 +550,8 @@ def init_db() -> None:
         ensure_synastry_schema()
         ensure_payments_schema()
         ensure_profile_schema()
+        ensure_generation_jobs_schema()
+        ensure_processing_indexes()
         return
 
     LOCK_KEY = 91520260115
@@ -548,7 +587,9 @@ def init_db() -> None:
             ensure_payments_schema()
             ensure_profile_schema()
             ensure_legal_consent_schema()
+            ensure_generation_jobs_schema()
 
             ensure_profile_constraints()
+            ensure_processing_indexes()
         finally:
             conn.execute(text("SELECT pg_advisory_unlock(:k)"), {"k": LOCK_KEY})
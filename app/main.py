@@ -1,12 +1,23 @@
 from __future__ import annotations
 
-from fastapi import FastAPI
+import asyncio
+
+import math
+
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import HTMLResponse  # ✅ EKLENDİ
+from fastapi.responses import HTMLResponse, JSONResponse  # ✅ EKLENDİ
 
 from app.api.v1 import api_router
+from app.api.v1.routes_stream import drain_streams
 from app.core.config import settings
 from app.db import init_db
+from app.services.generation_jobs import start_inline_consumers, stop_inline_consumers
+from app.services import ai_circuit
+from app.services.openai_service import AICircuitOpenError, AIServiceSaturatedError, awarmup_openai_client, warmup_openai_client
+from app.services.ai_ledger import start_ledger, stop_ledger
+from app.services.token_budget import warm_start as warm_token_budgets
+from app.services.processing_reaper import start_reaper, stop_reaper
 
 app = FastAPI(title="Lunaura API")
 
@@ -24,15 +35,63 @@ app.add_middleware(
 )
 
 
+@app.exception_handler(AIServiceSaturatedError)
+async def _ai_saturated(_request: Request, exc: AIServiceSaturatedError) -> JSONResponse:
+    # OpenAI limiter dolu / circuit açık: istek kuyrukta birikmesin, istemci Retry-After kadar sonra tekrar denesin
+    retry_after = max(1, int(math.ceil(exc.retry_after)))
+    if isinstance(exc, AICircuitOpenError):
+        detail = "AI servisi şu anda geçici olarak kullanılamıyor. Lütfen biraz sonra tekrar dene."
+    else:
+        detail = "AI servisi şu anda yoğun. Lütfen biraz sonra tekrar dene."
+    return JSONResponse(
+        status_code=503,
+        content={"detail": detail},
+        headers={"Retry-After": str(retry_after)},
+    )
+
+
 @app.on_event("startup")
 def _startup() -> None:
     settings.ensure_dirs()
     init_db()
+    # OpenAI çağrı defteri (ai_calls) toplu yazıcısı
+    start_ledger()
+    # İlk output bütçeleri son günlerin defterinden öğrenilmiş başlasın
+    warm_token_budgets()
+
+
+@app.on_event("startup")
+def _start_generation_consumers() -> None:
+    # /generate işleri generation_jobs kuyruğundan tüketilir (GENERATION_INLINE_WORKERS=0 => sadece ayrı worker)
+    if start_inline_consumers():
+        # Üretim bu süreçte yapılıyorsa takılı processing reaper'ı da burada çalışsın
+        start_reaper()
+
+
+@app.on_event("shutdown")
+async def _drain_generations() -> None:
+    # SIGTERM / worker recycle: yeni üretim alma, sürenleri bekle, bitmeyenleri kuyruğa devret
+    deadline = float(settings.generation_drain_seconds)
+    stop_reaper()
+    await asyncio.gather(
+        drain_streams(deadline),
+        asyncio.to_thread(stop_inline_consumers, deadline),
+    )
+    # Drain sırasında biten çağrıların satırları da yazılsın
+    await asyncio.to_thread(stop_ledger)
+
+
+@app.on_event("startup")
+async def _warmup_openai() -> None:
+    # Pooled client'ları önceden oluştur; bağlantılar ilk yorumdan önce ısınsın.
+    await asyncio.to_thread(warmup_openai_client)
+    await awarmup_openai_client()
 
 
 @app.get("/health")
 def health():
-    return {"ok": True, "env": settings.environment}
+    # Circuit açıkken de süreç sağlıklı (ok); OpenAI durumu ayrıca raporlanır
+    return {"ok": True, "env": settings.environment, "openai_circuit": ai_circuit.breaker.state()}
 
 
 # ✅ YENİ: Privacy Policy URL (App Store Connect için)
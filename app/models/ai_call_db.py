@@ -0,0 +1,32 @@
+# app/models/ai_call_db.py
+"""OpenAI çağrı defteri: her responses.create (ve stream) için bir satır - token, gecikme, sonuç."""
+from __future__ import annotations
+
+from datetime import datetime
+from typing import Optional
+
+from sqlmodel import SQLModel, Field
+
+
+class AICallDB(SQLModel, table=True):
+    __tablename__ = "ai_calls"
+
+    id: Optional[int] = Field(default=None, primary_key=True)
+
+    # coffee | hand | tarot | numerology | birthchart | personality | synastry | openai (okuma dışı)
+    product: str = Field(index=True, max_length=20)
+    reading_id: Optional[str] = Field(default=None, index=True)
+    # validate | observe | initial | numerology | birthchart | fusion ... ; devam hop'ları "<aşama>.continue_<n>"
+    stage: str = Field(max_length=40)
+    model: str = Field(max_length=60)
+
+    input_tokens: int = Field(default=0)
+    cached_tokens: int = Field(default=0)
+    output_tokens: int = Field(default=0)
+    latency_ms: int = Field(default=0)
+
+    # ok | incomplete | timeout | rate_limited | unavailable | quota | error | cancelled
+    outcome: str = Field(default="ok", max_length=20)
+    response_id: Optional[str] = Field(default=None, max_length=80)
+
+    created_at: datetime = Field(default_factory=datetime.utcnow, index=True)
@@ -0,0 +1,41 @@
+# app/models/generation_job_db.py
+"""Kalıcı yorum üretim kuyruğu: /generate iş bırakır, worker (veya web içi tüketici) işler."""
+from __future__ import annotations
+
+from datetime import datetime
+from typing import Optional
+import uuid
+
+from sqlalchemy import Column, Text
+from sqlmodel import SQLModel, Field
+
+
+class GenerationJobDB(SQLModel, table=True):
+    __tablename__ = "generation_jobs"
+
+    id: str = Field(
+        default_factory=lambda: str(uuid.uuid4()),
+        primary_key=True,
+        index=True,
+    )
+
+    # coffee | hand | tarot | numerology | birthchart | personality | synastry
+    product: str = Field(index=True, max_length=20)
+    reading_id: str = Field(index=True)
+
+    # queued -> running -> done | failed (running + süresi geçmiş lease => tekrar alınır)
+    status: str = Field(default="queued", index=True, max_length=20)
+
+    # Küçük önce çalışır: 0 = ödenmiş, 1 = ödeme öncesi (spekülatif), 2 = backfill
+    priority: int = Field(default=1, index=True)
+
+    attempts: int = Field(default=0)
+    max_attempts: int = Field(default=5)
+    next_run_at: datetime = Field(default_factory=datetime.utcnow, index=True)
+
+    locked_at: Optional[datetime] = Field(default=None)
+    locked_by: Optional[str] = Field(default=None, max_length=120)
+    last_error: Optional[str] = Field(default=None, sa_column=Column(Text))
+
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+    updated_at: datetime = Field(default_factory=datetime.utcnow)
@@ -0,0 +1,23 @@
+# app/models/vision_verdict_db.py
+"""Görsel doğrulama (coffee/hand validate) sonuç cache'i - aynı fotoğraflar için tekrar ücretli çağrı yapılmaz."""
+from __future__ import annotations
+
+from datetime import datetime
+
+from sqlmodel import SQLModel, Field
+
+
+class VisionVerdictDB(SQLModel, table=True):
+    __tablename__ = "vision_verdicts"
+
+    # sha256(kind + prompt_version + sıralı görsel sha256 listesi)
+    key: str = Field(primary_key=True, max_length=64)
+
+    kind: str = Field(max_length=20, description="coffee | hand")
+    prompt_version: str = Field(max_length=80)
+
+    ok: bool = Field(default=False)
+    verdict_json: str = Field(default="{}")
+
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+    expires_at: datetime = Field(index=True)
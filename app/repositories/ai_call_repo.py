@@ -0,0 +1,101 @@
+from __future__ import annotations
+
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import func, insert, literal_column, tuple_
+from sqlmodel import Session, select
+
+from app.models.ai_call_db import AICallDB
+
+
+def insert_many(session: Session, rows: List[Dict[str, Any]]) -> int:
+    """Tek executemany ile toplu ekleme (defter flush'ı)."""
+    if not rows:
+        return 0
+    session.execute(insert(AICallDB), rows)
+    session.commit()
+    return len(rows)
+
+
+def list_since(
+    session: Session,
+    since: datetime,
+    *,
+    product: Optional[str] = None,
+    limit: Optional[int] = None,
+) -> List[Any]:
+    """
+    Toplama için sadece gereken kolonlar: (created_at, product, stage, latency_ms, input, cached, output, outcome).
+    limit verilirse en yeni `limit` satır döner.
+    """
+    stmt = select(
+        AICallDB.created_at,
+        AICallDB.product,
+        AICallDB.stage,
+        AICallDB.latency_ms,
+        AICallDB.input_tokens,
+        AICallDB.cached_tokens,
+        AICallDB.output_tokens,
+        AICallDB.outcome,
+    ).where(AICallDB.created_at >= since)
+    if product:
+        stmt = stmt.where(AICallDB.product == product)
+    if limit:
+        stmt = stmt.order_by(AICallDB.created_at.desc()).limit(int(limit))  # type: ignore[attr-defined]
+    return list(session.exec(stmt).all())
+
+
+def _pct(column: Any, q: float) -> Any:
+    return func.percentile_cont(q).within_group(column.asc())
+
+
+def summarize_since(session: Session, since: datetime, *, product: Optional[str] = None) -> List[Dict[str, Any]]:
+    """
+    Postgres: gün / ürün / aşama özetleri tek sorguda, yüzdelikler DB'de (percentile_cont).
+    GROUPING SETS ile stage=None satırı o gün ürünün tüm aşamalarının toplamıdır.
+    """
+    # 'day' bind parametresi olmasın: SELECT ve GROUP BY ifadeleri birebir aynı kalmalı (psycopg server-side bind)
+    day = func.date_trunc(literal_column("'day'"), AICallDB.created_at)
+    total_tokens = AICallDB.input_tokens + AICallDB.output_tokens
+    stmt = (
+        select(
+            day.label("day"),
+            AICallDB.product,
+            AICallDB.stage,
+            func.count().label("calls"),
+            func.count().filter(AICallDB.outcome.not_in(("ok", "incomplete"))).label("errors"),  # type: ignore[attr-defined]
+            _pct(AICallDB.latency_ms, 0.50).label("latency_ms_p50"),
+            _pct(AICallDB.latency_ms, 0.95).label("latency_ms_p95"),
+            _pct(total_tokens, 0.50).label("tokens_p50"),
+            _pct(total_tokens, 0.95).label("tokens_p95"),
+            func.sum(AICallDB.input_tokens).label("input_tokens"),
+            func.sum(AICallDB.cached_tokens).label("cached_tokens"),
+            func.sum(AICallDB.output_tokens).label("output_tokens"),
+        )
+        .where(AICallDB.created_at >= since)
+        .group_by(
+            func.grouping_sets(
+                tuple_(day, AICallDB.product, AICallDB.stage),
+                tuple_(day, AICallDB.product),
+            )
+        )
+    )
+    if product:
+        stmt = stmt.where(AICallDB.product == product)
+    return [dict(r._mapping) for r in session.exec(stmt).all()]
+
+
+def list_reading_outputs_since(session: Session, since: datetime) -> List[Any]:
+    """token_budget ısınması: başarılı / kesilmiş çağrıların (product, reading_id, stage, output_tokens)."""
+    stmt = select(
+        AICallDB.product,
+        AICallDB.reading_id,
+        AICallDB.stage,
+        AICallDB.output_tokens,
+    ).where(
+        AICallDB.created_at >= since,
+        AICallDB.reading_id.is_not(None),  # type: ignore[union-attr]
+        AICallDB.outcome.in_(("ok", "incomplete")),  # type: ignore[attr-defined]
+    )
+    return list(session.exec(stmt).all())
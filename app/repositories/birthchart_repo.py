@@ -136,5 +136,40 @@ class BirthChartRepo:
         except Exception:
             return None
 
+    def find_completed(
+        self,
+        *,
+        session: Session,
+        device_id: str,
+        name: str,
+        birth_date: str,
+        birth_time: Optional[str],
+        birth_city: str,
+        birth_country: str,
+    ) -> Optional[dict]:
+        """Aynı cihaz + ad + doğum tarihi/saati/yeri için en güncel tamamlanmış yorum."""
+        did = (device_id or "").strip()
+        if not did:
+            return None
+        stmt = (
+            select(BirthChartReadingDB)
+            .where(
+                BirthChartReadingDB.device_id == did,
+                BirthChartReadingDB.birth_date == (birth_date or "").strip(),
+                BirthChartReadingDB.status == "done",
+            )
+            .order_by(BirthChartReadingDB.updated_at.desc())
+        )
+
+        def _norm(v: Optional[str]) -> str:
+            return (v or "").strip().casefold()
+
+        want = (_norm(name), _norm(birth_time), _norm(birth_city), _norm(birth_country or "TR"))
+        for obj in session.exec(stmt).all():
+            got = (_norm(obj.name), _norm(obj.birth_time), _norm(obj.birth_city), _norm(obj.birth_country or "TR"))
+            if got == want and (obj.result_text or "").strip():
+                return _dump(obj)
+        return None
+
 
 birthchart_repo = BirthChartRepo()
@@ -0,0 +1,99 @@
+from __future__ import annotations
+
+import threading
+from datetime import datetime, timedelta
+from typing import Any, Dict, Optional, Type
+
+from sqlalchemy import and_, or_, update
+from sqlmodel import Session
+
+# Sonucu yazılmış okumaların durumları (ürüne göre "completed" ya da "done")
+DONE_STATUSES = ("completed", "done")
+
+# processing'de bu süreden uzun kalan okuma tekrar claim edilebilir (süreç öldü / iş yarım kaldı)
+STALE_SECONDS: Dict[str, int] = {
+    "coffee": 300,
+    "hand": 300,
+    "tarot": 120,
+    "numerology": 600,
+    "birthchart": 600,
+    "personality": 900,
+    "synastry": 600,
+}
+
+_stats_lock = threading.Lock()
+_stats: Dict[str, Dict[str, int]] = {}
+
+
+def _count(product: str, key: str) -> None:
+    with _stats_lock:
+        bucket = _stats.setdefault(product, {"claimed": 0, "reclaimed_stale": 0, "lost": 0})
+        bucket[key] += 1
+
+
+def claim_stats() -> Dict[str, Dict[str, int]]:
+    """Ürün başına claim sonuçları: claimed, reclaimed_stale, lost (başka istek kilidi aldı / sonuç hazır)."""
+    with _stats_lock:
+        return {k: dict(v) for k, v in _stats.items()}
+
+
+def _cas(session: Session, model: Type[Any], reading_id: str, now: datetime, condition, extra) -> bool:
+    stmt = (
+        update(model)
+        .where(model.id == reading_id)
+        .where(or_(model.result_text.is_(None), model.result_text == ""))
+        .where(or_(model.status.is_(None), model.status.notin_(DONE_STATUSES)))
+        .where(condition)
+        .values(status="processing", updated_at=now)
+    )
+    if extra is not None:
+        stmt = stmt.where(extra)
+
+    res = session.exec(stmt)
+    session.commit()
+
+    # rowcount bazı driverlarda None dönebiliyor: updated_at = now bizim yazdığımız damga
+    rc = getattr(res, "rowcount", None)
+    if rc is not None:
+        return bool(rc > 0)
+
+    row = session.get(model, reading_id)
+    if row is not None:
+        session.refresh(row)
+    return bool(row is not None and row.status == "processing" and row.updated_at == now)
+
+
+def claim_processing(
+    session: Session,
+    model: Type[Any],
+    reading_id: str,
+    *,
+    product: str,
+    stale_seconds: Optional[int] = None,
+    extra=None,
+) -> bool:
+    """
+    ✅ Atomik "processing" kilidi (compare-and-set UPDATE), tüm okuma tabloları için.
+
+    - Sonuç yazılmışsa (result_text dolu / completed / done) dokunmaz.
+    - processing değilse processing'e çeker.
+    - processing ise sadece stale_seconds'tan eskiyse reclaim eder.
+    - extra: ek WHERE koşulu (ör. sadece ödenmiş okumalar).
+    Aynı okuma için eşzamanlı iki istekten yalnızca biri True alır.
+    """
+    now = datetime.utcnow()
+
+    fresh = or_(model.status.is_(None), model.status != "processing")
+    if _cas(session, model, reading_id, now, fresh, extra):
+        _count(product, "claimed")
+        return True
+
+    stale = int(stale_seconds if stale_seconds is not None else STALE_SECONDS.get(product, 600))
+    cutoff = now - timedelta(seconds=stale)
+    stuck = and_(model.status == "processing", model.updated_at < cutoff)
+    if _cas(session, model, reading_id, now, stuck, extra):
+        _count(product, "reclaimed_stale")
+        return True
+
+    _count(product, "lost")
+    return False
@@ -0,0 +1,284 @@
+from __future__ import annotations
+
+from datetime import datetime, timedelta
+from typing import Optional
+
+from sqlalchemy import and_, func, or_, text, update
+from sqlmodel import Session, select
+
+from app.models.generation_job_db import GenerationJobDB
+
+ACTIVE_STATUSES = ("queued", "running")
+
+# Öncelik sınıfları (küçük önce): ödenmiş > ödeme öncesi üretim > backfill
+PRIORITY_PAID = 0
+PRIORITY_PREPAY = 1
+PRIORITY_BACKFILL = 2
+PRIORITY_CLASSES = {PRIORITY_PAID: "paid", PRIORITY_PREPAY: "prepay", PRIORITY_BACKFILL: "backfill"}
+
+
+def get_job(session: Session, job_id: str) -> Optional[GenerationJobDB]:
+    return session.get(GenerationJobDB, job_id)
+
+
+def get_active(session: Session, product: str, reading_id: str) -> Optional[GenerationJobDB]:
+    stmt = select(GenerationJobDB).where(
+        GenerationJobDB.product == product,
+        GenerationJobDB.reading_id == reading_id,
+        GenerationJobDB.status.in_(ACTIVE_STATUSES),
+    )
+    return session.exec(stmt).first()
+
+
+def enqueue(
+    session: Session,
+    product: str,
+    reading_id: str,
+    *,
+    max_attempts: int = 5,
+    priority: int = PRIORITY_PREPAY,
+) -> GenerationJobDB:
+    """
+    Aynı okuma için aktif (queued/running) iş varsa onu döndürür (gerekirse önceliğini yükseltir);
+    yoksa yeni iş bırakır.
+    """
+    existing = get_active(session, product, reading_id)
+    if existing:
+        if existing.status == "queued" and existing.priority > priority:
+            promote(session, product, reading_id, priority=priority)
+            session.refresh(existing)
+        return existing
+
+    now = datetime.utcnow()
+    job = GenerationJobDB(
+        product=product,
+        reading_id=reading_id,
+        status="queued",
+        priority=int(priority),
+        attempts=0,
+        max_attempts=max(1, int(max_attempts)),
+        next_run_at=now,
+        created_at=now,
+        updated_at=now,
+    )
+    session.add(job)
+    session.commit()
+    session.refresh(job)
+    return job
+
+
+def promote(session: Session, product: str, reading_id: str, *, priority: int = PRIORITY_PAID) -> int:
+    """Kuyrukta bekleyen işi daha yüksek öncelik sınıfına taşır (ör. ödeme geldiğinde). Etkilenen satır sayısı."""
+    res = session.exec(
+        update(GenerationJobDB)
+        .where(GenerationJobDB.product == product)
+        .where(GenerationJobDB.reading_id == reading_id)
+        .where(GenerationJobDB.status == "queued")
+        .where(GenerationJobDB.priority > int(priority))
+        .values(priority=int(priority), updated_at=datetime.utcnow())
+    )
+    session.commit()
+    return int(getattr(res, "rowcount", 0) or 0)
+
+
+def queued_counts(session: Session) -> dict:
+    """Öncelik sınıfı başına kuyrukta bekleyen iş sayısı."""
+    rows = session.exec(
+        select(GenerationJobDB.priority, func.count())
+        .where(GenerationJobDB.status == "queued")
+        .group_by(GenerationJobDB.priority)
+    ).all()
+    return {PRIORITY_CLASSES.get(p, str(p)): int(c) for p, c in rows}
+
+
+def _claimable(now: datetime, lease_cutoff: datetime):
+    return or_(
+        and_(GenerationJobDB.status == "queued", GenerationJobDB.next_run_at <= now),
+        # Worker öldüyse (deploy/recycle) lease süresi geçen iş tekrar alınır
+        and_(GenerationJobDB.status == "running", GenerationJobDB.locked_at < lease_cutoff),
+    )
+
+
+def claim_next(session: Session, worker_id: str, *, lease_seconds: int) -> Optional[GenerationJobDB]:
+    """
+    Sıradaki işi atomik olarak alır (status=running, attempts+1).
+    Postgres: SELECT ... FOR UPDATE SKIP LOCKED (worker'lar birbirini beklemez).
+    SQLite: aday seç + compare-and-set UPDATE (kaybeden sıradakini dener).
+    """
+    now = datetime.utcnow()
+    lease_cutoff = now - timedelta(seconds=int(lease_seconds))
+    dialect = session.get_bind().dialect.name
+
+    if dialect == "postgresql":
+        row = session.execute(
+            text(
+                """
+                UPDATE generation_jobs
+                   SET status = 'running',
+                       attempts = attempts + 1,
+                       locked_at = :now,
+                       locked_by = :worker,
+                       updated_at = :now
+                 WHERE id = (
+                    SELECT id FROM generation_jobs
+                     WHERE (status = 'queued' AND next_run_at <= :now)
+                        OR (status = 'running' AND locked_at < :lease_cutoff)
+                     ORDER BY priority, next_run_at
+                     LIMIT 1
+                     FOR UPDATE SKIP LOCKED
+                 )
+                RETURNING id
+                """
+            ).bindparams(now=now, worker=worker_id, lease_cutoff=lease_cutoff)
+        ).first()
+        session.commit()
+        return get_job(session, row[0]) if row else None
+
+    for _ in range(5):
+        candidate = session.exec(
+            select(GenerationJobDB.id)
+            .where(_claimable(now, lease_cutoff))
+            .order_by(GenerationJobDB.priority, GenerationJobDB.next_run_at)
+            .limit(1)
+        ).first()
+        if not candidate:
+            return None
+
+        res = session.exec(
+            update(GenerationJobDB)
+            .where(GenerationJobDB.id == candidate)
+            .where(_claimable(now, lease_cutoff))
+            .values(
+                status="running",
+                attempts=GenerationJobDB.attempts + 1,
+                locked_at=now,
+                locked_by=worker_id,
+                updated_at=now,
+            )
+        )
+        session.commit()
+        if getattr(res, "rowcount", 0):
+            return get_job(session, candidate)
+    return None
+
+
+def claim_queued(session: Session, product: str, reading_id: str, worker_id: str) -> Optional[GenerationJobDB]:
+    """
+    Belirli okumanın kuyrukta bekleyen (zamanı gelmiş) işini atomik olarak alır (SSE stream devralması).
+    Tek compare-and-set UPDATE: aynı anda claim_next yapan worker ile ancak biri kazanır.
+    """
+    now = datetime.utcnow()
+    res = session.exec(
+        update(GenerationJobDB)
+        .where(GenerationJobDB.product == product)
+        .where(GenerationJobDB.reading_id == reading_id)
+        .where(GenerationJobDB.status == "queued")
+        .where(GenerationJobDB.next_run_at <= now)
+        .values(
+            status="running",
+            attempts=GenerationJobDB.attempts + 1,
+            locked_at=now,
+            locked_by=worker_id,
+            updated_at=now,
+        )
+    )
+    session.commit()
+    if not getattr(res, "rowcount", 0):
+        return None
+    return get_active(session, product, reading_id)
+
+
+def _owned_by(job_id: str, worker_id: Optional[str]):
+    # Lease süresi geçip iş başka worker'a verildiyse (claim_next) eski sahip durumu ezmesin
+    return and_(
+        GenerationJobDB.id == job_id,
+        GenerationJobDB.status == "running",
+        GenerationJobDB.locked_by == worker_id,
+    )
+
+
+def mark_done(session: Session, job_id: str, worker_id: Optional[str]) -> bool:
+    """İşi hâlâ worker_id tutuyorsa done yapar (compare-and-set). Lease kaybedildiyse False."""
+    now = datetime.utcnow()
+    res = session.exec(
+        update(GenerationJobDB)
+        .where(_owned_by(job_id, worker_id))
+        .values(status="done", locked_at=None, updated_at=now)
+    )
+    session.commit()
+    return bool(getattr(res, "rowcount", 0))
+
+
+def defer(session: Session, job_id: str, reason: str, *, delay_seconds: float) -> None:
+    """İş çalıştırılamadı ama hata değil (ör. okuma başka worker'da üretiliyor): deneme hakkı yakmadan ertele."""
+    job = get_job(session, job_id)
+    if not job:
+        return
+    now = datetime.utcnow()
+    job.status = "queued"
+    job.attempts = max(0, int(job.attempts or 0) - 1)
+    job.next_run_at = now + timedelta(seconds=float(delay_seconds))
+    job.last_error = (reason or "")[:2000]
+    job.locked_at = None
+    job.updated_at = now
+    session.add(job)
+    session.commit()
+
+
+def hand_back(session: Session, job_id: str, reason: str) -> bool:
+    """Kapanışta bitmeyen running işi hemen tekrar alınabilir yap (lease süresini beklemeden)."""
+    job = get_job(session, job_id)
+    if not job or job.status != "running":
+        return False
+    now = datetime.utcnow()
+    job.status = "queued"
+    job.attempts = max(0, int(job.attempts or 0) - 1)
+    job.next_run_at = now
+    job.last_error = (reason or "")[:2000]
+    job.locked_at = None
+    job.locked_by = None
+    job.updated_at = now
+    session.add(job)
+    session.commit()
+    return True
+
+
+def mark_failed(
+    session: Session,
+    job_id: str,
+    worker_id: Optional[str],
+    error: str,
+    *,
+    retry_in_seconds: Optional[float],
+) -> Optional[str]:
+    """
+    retry_in_seconds verilir ve deneme hakkı kaldıysa iş tekrar kuyruğa girer;
+    aksi halde kalıcı olarak failed olur. Sadece işi hâlâ worker_id tutuyorsa (compare-and-set).
+    Dönüş: yeni durum ("queued" / "failed"); lease kaybedildiyse None (satıra dokunulmadı).
+    """
+    now = datetime.utcnow()
+    last_error = (error or "")[:2000]
+    if retry_in_seconds is not None:
+        res = session.exec(
+            update(GenerationJobDB)
+            .where(_owned_by(job_id, worker_id))
+            .where(GenerationJobDB.attempts < GenerationJobDB.max_attempts)
+            .values(
+                status="queued",
+                next_run_at=now + timedelta(seconds=float(retry_in_seconds)),
+                last_error=last_error,
+                locked_at=None,
+                updated_at=now,
+            )
+        )
+        session.commit()
+        if getattr(res, "rowcount", 0):
+            return "queued"
+
+    res = session.exec(
+        update(GenerationJobDB)
+        .where(_owned_by(job_id, worker_id))
+        .values(status="failed", last_error=last_error, locked_at=None, updated_at=now)
+    )
+    session.commit()
+    return "failed" if getattr(res, "rowcount", 0) else None
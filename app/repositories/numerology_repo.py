@@ -138,5 +138,32 @@ class NumerologyRepo:
         except ValueError:
             return None
 
+    def find_completed(
+        self,
+        *,
+        session: Session,
+        device_id: str,
+        name: str,
+        birth_date: str,
+    ) -> Optional[dict]:
+        """Aynı cihaz + ad + doğum tarihi için en güncel tamamlanmış yorum (kişilik analizinde yeniden kullanılır)."""
+        did = (device_id or "").strip()
+        if not did:
+            return None
+        stmt = (
+            select(NumerologyReadingDB)
+            .where(
+                NumerologyReadingDB.device_id == did,
+                NumerologyReadingDB.birth_date == (birth_date or "").strip(),
+                NumerologyReadingDB.status == "completed",
+            )
+            .order_by(NumerologyReadingDB.updated_at.desc())
+        )
+        want = (name or "").strip().casefold()
+        for obj in session.exec(stmt).all():
+            if (obj.name or "").strip().casefold() == want and (obj.result_text or "").strip():
+                return _dump(obj)
+        return None
+
 
 numerology_repo = NumerologyRepo()
@@ -6,6 +6,7 @@ from typing import Optional, Dict, Any, Tuple
 from sqlmodel import Session, select
 
 from app.models.synastry_db import SynastryReadingDB
+from app.repositories import claims
 
 
 class SynastryRepo:
@@ -89,11 +90,18 @@ class SynastryRepo:
         session.refresh(row)
         return row.model_dump()
 
-    def claim_processing(self, *, session: Session, reading_id: str) -> Tuple[Optional[Dict[str, Any]], bool]:
+    def claim_processing(
+        self,
+        *,
+        session: Session,
+        reading_id: str,
+        paid_only: bool = False,
+    ) -> Tuple[Optional[Dict[str, Any]], bool]:
         """
         - result_text varsa: done'a çek, claimed=False
-        - status=processing ise: claimed=False
-        - is_paid ise: processing'e çek, claimed=True
+        - status=processing ise: claimed=False (stale ise reclaim)
+        - aksi halde atomik olarak processing'e çek, claimed=True
+          (paid_only=True ise sadece ödenmiş okuma kilitlenir)
         """
         row = self._get_row(session=session, reading_id=reading_id)
         if not row:
@@ -108,19 +116,15 @@ class SynastryRepo:
                 session.refresh(row)
             return row.model_dump(), False
 
-        st = (row.status or "").lower().strip()
-        if st == "processing":
-            return row.model_dump(), False
-
-        if row.is_paid:
-            row.status = "processing"
-            row.updated_at = datetime.utcnow()
-            session.add(row)
-            session.commit()
-            session.refresh(row)
-            return row.model_dump(), True
-
-        return row.model_dump(), False
+        claimed = claims.claim_processing(
+            session,
+            SynastryReadingDB,
+            reading_id,
+            product="synastry",
+            extra=(SynastryReadingDB.is_paid == True) if paid_only else None,  # noqa: E712
+        )
+        session.refresh(row)
+        return row.model_dump(), claimed
 
     def set_status(self, *, session: Session, reading_id: str, status: str) -> Optional[Dict[str, Any]]:
         row = self._get_row(session=session, reading_id=reading_id)
@@ -1,12 +1,12 @@
 from __future__ import annotations
 
-from datetime import datetime, timedelta
+from datetime import datetime
 from typing import Optional, List
 
 from sqlmodel import Session, select
-from sqlalchemy import update, and_, or_
 
 from app.models.tarot_db import TarotReadingDB
+from app.repositories import claims
 
 
 def create_reading(session: Session, obj: TarotReadingDB) -> TarotReadingDB:
@@ -64,41 +64,18 @@ def set_status(
     return update_reading(session, r)
 
 
-def claim_processing(session: Session, reading_id: str, *, stale_seconds: int = 120) -> bool:
+def claim_processing(session: Session, reading_id: str, *, stale_seconds: Optional[int] = None) -> bool:
     """
-    ✅ Atomic "processing lock"
+    ✅ Atomic "processing lock" (ortak CAS: app.repositories.claims)
 
     - completed ise dokunmaz.
     - processing ise dokunmaz (ama stale ise reclaim eder).
     - paid/selected gibi durumlarda processing'e geçirir.
     """
-    now = datetime.utcnow()
-    stale_cutoff = now - timedelta(seconds=int(stale_seconds or 120))
-
-    can_claim = or_(
-        TarotReadingDB.status != "processing",
-        and_(TarotReadingDB.status == "processing", TarotReadingDB.updated_at < stale_cutoff),
-    )
-
-    stmt = (
-        update(TarotReadingDB)
-        .where(TarotReadingDB.id == reading_id)
-        .where(TarotReadingDB.status != "completed")
-        .where(can_claim)
-        .values(status="processing", updated_at=now)
+    return claims.claim_processing(
+        session,
+        TarotReadingDB,
+        reading_id,
+        product="tarot",
+        stale_seconds=stale_seconds,
     )
-
-    res = session.exec(stmt)
-    session.commit()
-
-    # rowcount bazı driverlarda None dönebiliyor
-    rc = getattr(res, "rowcount", None)
-    if rc is not None:
-        return bool(rc > 0)
-
-    # fallback: yeniden oku
-    r = get_reading(session, reading_id)
-    if not r:
-        return False
-
-    return (r.status == "processing") and ((now - (r.updated_at or now)).total_seconds() < 5)
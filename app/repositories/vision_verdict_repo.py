@@ -0,0 +1,49 @@
+from __future__ import annotations
+
+import json
+from datetime import datetime, timedelta
+from typing import Any, Dict, Optional
+
+from sqlalchemy import delete
+from sqlmodel import Session, select
+
+from app.models.vision_verdict_db import VisionVerdictDB
+
+
+def get_valid(session: Session, key: str) -> Optional[Dict[str, Any]]:
+    stmt = select(VisionVerdictDB).where(
+        VisionVerdictDB.key == key,
+        VisionVerdictDB.expires_at > datetime.utcnow(),
+    )
+    row = session.exec(stmt).first()
+    if not row:
+        return None
+    try:
+        return json.loads(row.verdict_json or "{}")
+    except Exception:
+        return None
+
+
+def put(
+    session: Session,
+    *,
+    key: str,
+    kind: str,
+    prompt_version: str,
+    verdict: Dict[str, Any],
+    ttl_seconds: int,
+) -> None:
+    now = datetime.utcnow()
+    row = session.get(VisionVerdictDB, key) or VisionVerdictDB(key=key, kind=kind, prompt_version=prompt_version, expires_at=now)
+    row.ok = bool(verdict.get("ok"))
+    row.verdict_json = json.dumps(verdict, ensure_ascii=False)
+    row.created_at = now
+    row.expires_at = now + timedelta(seconds=ttl_seconds)
+    session.add(row)
+    session.commit()
+
+
+def purge_expired(session: Session) -> int:
+    res = session.exec(delete(VisionVerdictDB).where(VisionVerdictDB.expires_at <= datetime.utcnow()))
+    session.commit()
+    return int(res.rowcount or 0)
@@ -13,6 +13,7 @@ CoffeeStatus = Literal[
     "paid",
     "processing",
     "completed",
+    "rejected",
 ]
 
 
@@ -45,5 +46,7 @@ class CoffeeReading(BaseModel):
 
     is_paid: bool = False
     payment_ref: Optional[str] = None
+    # status == "rejected": üretim işi görselleri kahve fincanı içi bulmadı (fotoğraflar yeniden yüklenmeli)
+    reject_reason: Optional[str] = None
 
     created_at: datetime
@@ -0,0 +1,165 @@
+# app/services/ai_circuit.py
+"""
+OpenAI çağrıları için circuit breaker (closed -> open -> half_open -> closed).
+
+- closed: çağrılar geçer; son window_seconds içindeki hata oranı eşiği aşarsa
+  (en az min_calls çağrıda) ya da art arda timeout sayısı dolarsa open olur.
+- open: çağrılar milisaniyede CircuitOpen ile reddedilir; open_seconds sonra half_open.
+- half_open: tek deneme çağrısı geçer; başarılıysa closed, başarısızsa tekrar open.
+- insufficient_quota hemen open yapar (quota_open_seconds boyunca).
+Sadece geçici servis hataları (timeout, bağlantı, 5xx) ve quota sayılır; 429 limiter'ın, 4xx istemcinin işidir.
+"""
+from __future__ import annotations
+
+import threading
+import time
+from collections import deque
+from typing import Any, Deque, Dict, Tuple
+
+from app.core.config import settings
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitOpen(Exception):
+    def __init__(self, reason: str, retry_after: float) -> None:
+        super().__init__(f"circuit open: {reason}")
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class CircuitBreaker:
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._state = CLOSED
+        self._reason = ""
+        self._opened_at = 0.0
+        self._open_for = 0.0
+        self._probe_in_flight = False
+        self._window: Deque[Tuple[float, bool]] = deque()
+        self._consecutive_timeouts = 0
+        self._stats = {"opened": 0, "rejected": 0, "probes": 0}
+
+    # -------------------------
+    # iç yardımcılar (lock altında)
+    # -------------------------
+    def _trim_locked(self, now: float) -> None:
+        horizon = now - float(settings.openai_circuit_window_seconds)
+        while self._window and self._window[0][0] < horizon:
+            self._window.popleft()
+
+    def _error_rate_locked(self) -> float:
+        if not self._window:
+            return 0.0
+        failures = sum(1 for _, ok in self._window if not ok)
+        return failures / len(self._window)
+
+    def _open_locked(self, now: float, reason: str, seconds: float) -> None:
+        self._state = OPEN
+        self._reason = reason
+        self._opened_at = now
+        self._open_for = float(seconds)
+        self._probe_in_flight = False
+        self._stats["opened"] += 1
+
+    def _close_locked(self) -> None:
+        self._state = CLOSED
+        self._reason = ""
+        self._probe_in_flight = False
+        self._window.clear()
+        self._consecutive_timeouts = 0
+
+    # -------------------------
+    # çağrı yaşam döngüsü
+    # -------------------------
+    def before_call(self) -> None:
+        now = time.monotonic()
+        with self._lock:
+            if self._state == OPEN:
+                remaining = self._opened_at + self._open_for - now
+                if remaining > 0:
+                    self._stats["rejected"] += 1
+                    raise CircuitOpen(self._reason, remaining)
+                self._state = HALF_OPEN
+                self._probe_in_flight = False
+
+            if self._state == HALF_OPEN:
+                if self._probe_in_flight:
+                    self._stats["rejected"] += 1
+                    raise CircuitOpen(f"{self._reason} (half-open probe in flight)", 1.0)
+                self._probe_in_flight = True
+                self._stats["probes"] += 1
+
+    def on_success(self) -> None:
+        now = time.monotonic()
+        with self._lock:
+            if self._state == HALF_OPEN:
+                self._close_locked()
+                return
+            self._consecutive_timeouts = 0
+            self._window.append((now, True))
+            self._trim_locked(now)
+
+    def on_neutral(self) -> None:
+        """Devreyi etkilemeyen sonuç (429, 4xx): half_open deneme hakkını geri ver."""
+        with self._lock:
+            if self._state == HALF_OPEN:
+                self._probe_in_flight = False
+
+    def on_failure(self, kind: str) -> None:
+        """kind: 'timeout' | 'unavailable' | 'quota'"""
+        now = time.monotonic()
+        with self._lock:
+            if kind == "quota":
+                self._open_locked(now, "insufficient_quota", float(settings.openai_circuit_quota_open_seconds))
+                return
+            if self._state == HALF_OPEN:
+                self._open_locked(now, f"half-open probe failed ({kind})", float(settings.openai_circuit_open_seconds))
+                return
+
+            self._window.append((now, False))
+            self._trim_locked(now)
+            self._consecutive_timeouts = self._consecutive_timeouts + 1 if kind == "timeout" else 0
+
+            if self._state != CLOSED:
+                return
+            if self._consecutive_timeouts >= int(settings.openai_circuit_consecutive_timeouts):
+                self._open_locked(
+                    now,
+                    f"{self._consecutive_timeouts} consecutive timeouts",
+                    float(settings.openai_circuit_open_seconds),
+                )
+            elif len(self._window) >= int(settings.openai_circuit_min_calls) and self._error_rate_locked() >= float(
+                settings.openai_circuit_error_rate
+            ):
+                self._open_locked(
+                    now,
+                    f"error rate {self._error_rate_locked():.0%}",
+                    float(settings.openai_circuit_open_seconds),
+                )
+
+    def state(self) -> str:
+        with self._lock:
+            if self._state == OPEN and time.monotonic() >= self._opened_at + self._open_for:
+                return HALF_OPEN
+            return self._state
+
+    def stats(self) -> Dict[str, Any]:
+        now = time.monotonic()
+        with self._lock:
+            self._trim_locked(now)
+            open_remaining = max(0.0, self._opened_at + self._open_for - now) if self._state == OPEN else 0.0
+            return {
+                "state": self._state if not (self._state == OPEN and open_remaining == 0) else HALF_OPEN,
+                "reason": self._reason,
+                "open_remaining_seconds": round(open_remaining, 1),
+                "window_calls": len(self._window),
+                "window_error_rate": round(self._error_rate_locked(), 3),
+                "consecutive_timeouts": self._consecutive_timeouts,
+                **self._stats,
+            }
+
+
+breaker = CircuitBreaker()
@@ -0,0 +1,261 @@
+# app/services/ai_ledger.py
+"""
+OpenAI çağrı defteri (ai_calls tablosu): okuma başına maliyet ve aşama bazında gecikme.
+
+- record() sıcak yolda sadece bellekteki tampona ekler; flush thread'i AI_LEDGER_FLUSH_SECONDS'ta bir
+  (ya da tampon AI_LEDGER_BATCH_SIZE'a ulaşınca) tek executemany ile yazar.
+- Tampon AI_LEDGER_BUFFER_MAX'ı aşarsa en eski satırlar düşürülür (DB yavaşsa üretim beklemez).
+- Okuma bağlamı (ürün, reading_id) reading() ile, devam hop numarası hop() ile contextvar'da taşınır.
+- daily_stats(): ürün / gün (ve aşama) bazında p50/p95 gecikme ve token. Postgres'te toplama ve yüzdelikler
+  SQL'de yapılır; SQLite yedek yolu en yeni AI_LEDGER_STATS_MAX_ROWS satırı Python'da özetler (truncated).
+"""
+from __future__ import annotations
+
+import contextvars
+import logging
+import threading
+from collections import deque
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from typing import Any, Deque, Dict, Iterator, List, Optional, Tuple
+
+from sqlmodel import Session
+
+from app.core.config import settings
+from app.db import engine
+from app.repositories import ai_call_repo
+
+log = logging.getLogger("lunaura.ledger")
+
+_reading: contextvars.ContextVar[Optional[Tuple[str, str]]] = contextvars.ContextVar("ai_ledger_reading", default=None)
+_hop: contextvars.ContextVar[int] = contextvars.ContextVar("ai_ledger_hop", default=0)
+
+
+@contextmanager
+def reading(product: str, reading_id: str) -> Iterator[None]:
+    """Bu bloktaki OpenAI çağrıları (product, reading_id) ile deftere yazılır."""
+    token = _reading.set((product, reading_id))
+    try:
+        yield
+    finally:
+        _reading.reset(token)
+
+
+@contextmanager
+def hop(n: int) -> Iterator[None]:
+    """previous_response_id ile devam çağrısı: aşama "<aşama>.continue_<n>" olarak yazılır."""
+    token = _hop.set(int(n))
+    try:
+        yield
+    finally:
+        _hop.reset(token)
+
+
+def current_hop() -> int:
+    return _hop.get()
+
+
+# -------------------------
+# Tampon + flush
+# -------------------------
+_buffer_lock = threading.Lock()
+_buffer: Deque[Dict[str, Any]] = deque()
+_flush_wakeup = threading.Event()
+_counters = {"recorded": 0, "written": 0, "dropped": 0, "flush_errors": 0}
+
+
+def _stage_name(label: str, hop_n: int) -> str:
+    # ai_retry aşama etiketi: "coffee" -> initial, "coffee.validate" -> validate, "personality.fusion" -> fusion
+    stage = label.split(".", 1)[1] if "." in label else "initial"
+    if hop_n:
+        return f"continue_{hop_n}" if stage == "initial" else f"{stage}.continue_{hop_n}"
+    return stage
+
+
+def record(
+    *,
+    label: str,
+    model: str,
+    latency_seconds: float,
+    outcome: str,
+    usage: Any = None,
+    response_id: Optional[str] = None,
+    hop_n: Optional[int] = None,
+) -> None:
+    if not settings.ai_ledger_enabled:
+        return
+    ctx = _reading.get()
+    details = getattr(usage, "input_tokens_details", None)
+    row = {
+        "product": (ctx[0] if ctx else (label or "openai").split(".", 1)[0])[:20],
+        "reading_id": ctx[1] if ctx else None,
+        "stage": _stage_name(label or "openai", _hop.get() if hop_n is None else hop_n)[:40],
+        "model": (model or "")[:60],
+        "input_tokens": int(getattr(usage, "input_tokens", 0) or 0),
+        "cached_tokens": int(getattr(details, "cached_tokens", 0) or 0),
+        "output_tokens": int(getattr(usage, "output_tokens", 0) or 0),
+        "latency_ms": int(max(0.0, latency_seconds) * 1000),
+        "outcome": outcome[:20],
+        "response_id": (response_id or None) and str(response_id)[:80],
+        "created_at": datetime.utcnow(),
+    }
+    limit = max(1, int(settings.ai_ledger_buffer_max))
+    with _buffer_lock:
+        _buffer.append(row)
+        _counters["recorded"] += 1
+        while len(_buffer) > limit:
+            _buffer.popleft()
+            _counters["dropped"] += 1
+        full = len(_buffer) >= int(settings.ai_ledger_batch_size)
+    if full:
+        _flush_wakeup.set()
+
+
+def flush() -> int:
+    """Tamponu tek toplu INSERT ile yazar; hata olursa satırlar kaybedilir (defter en iyi çaba)."""
+    with _buffer_lock:
+        rows = list(_buffer)
+        _buffer.clear()
+    if not rows:
+        return 0
+    try:
+        with Session(engine) as session:
+            written = ai_call_repo.insert_many(session, rows)
+    except Exception:
+        with _buffer_lock:
+            _counters["flush_errors"] += 1
+            _counters["dropped"] += len(rows)
+        log.exception("AI ledger flush failed (%d rows dropped)", len(rows))
+        return 0
+    with _buffer_lock:
+        _counters["written"] += written
+    return written
+
+
+def _run_flusher(stop: threading.Event) -> None:
+    interval = max(0.1, float(settings.ai_ledger_flush_seconds))
+    while not stop.is_set():
+        _flush_wakeup.wait(timeout=interval)
+        _flush_wakeup.clear()
+        flush()
+    flush()
+
+
+_flusher_stop = threading.Event()
+_flusher_thread: Optional[threading.Thread] = None
+
+
+def start_ledger() -> bool:
+    global _flusher_thread
+    if _flusher_thread is not None or not settings.ai_ledger_enabled:
+        return False
+    _flusher_stop.clear()
+    _flusher_thread = threading.Thread(target=_run_flusher, args=(_flusher_stop,), name="ai-ledger", daemon=True)
+    _flusher_thread.start()
+    return True
+
+
+def stop_ledger(timeout: float = 5.0) -> None:
+    """Kapanış: flush thread'i son tamponu yazıp çıkar."""
+    global _flusher_thread
+    _flusher_stop.set()
+    _flush_wakeup.set()
+    if _flusher_thread is not None:
+        _flusher_thread.join(timeout=timeout)
+        _flusher_thread = None
+
+
+def ledger_counters() -> Dict[str, int]:
+    with _buffer_lock:
+        return {**_counters, "buffered": len(_buffer)}
+
+
+# -------------------------
+# Toplama (admin)
+# -------------------------
+def _percentile(values: List[float], q: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(q * (len(ordered) - 1))))]
+
+
+def _summarize(rows: List[Any]) -> Dict[str, Any]:
+    latency = [float(r.latency_ms) for r in rows]
+    total_tokens = [float(r.input_tokens + r.output_tokens) for r in rows]
+    input_tokens = sum(r.input_tokens for r in rows)
+    cached_tokens = sum(r.cached_tokens for r in rows)
+    return {
+        "calls": len(rows),
+        "errors": sum(1 for r in rows if r.outcome not in ("ok", "incomplete")),
+        "latency_ms_p50": int(_percentile(latency, 0.50)),
+        "latency_ms_p95": int(_percentile(latency, 0.95)),
+        "tokens_p50": int(_percentile(total_tokens, 0.50)),
+        "tokens_p95": int(_percentile(total_tokens, 0.95)),
+        "input_tokens": input_tokens,
+        "cached_tokens": cached_tokens,
+        "output_tokens": sum(r.output_tokens for r in rows),
+        "cached_ratio": round(cached_tokens / input_tokens, 3) if input_tokens else 0.0,
+    }
+
+
+def _with_ratio(summary: Dict[str, Any]) -> Dict[str, Any]:
+    for key in ("latency_ms_p50", "latency_ms_p95", "tokens_p50", "tokens_p95"):
+        summary[key] = int(summary[key] or 0)
+    for key in ("input_tokens", "cached_tokens", "output_tokens"):
+        summary[key] = int(summary[key] or 0)
+    summary["cached_ratio"] = (
+        round(summary["cached_tokens"] / summary["input_tokens"], 3) if summary["input_tokens"] else 0.0
+    )
+    return summary
+
+
+def _daily_stats_sql(session: Session, since: datetime, product: Optional[str]) -> Dict[str, Any]:
+    out: Dict[str, Any] = {}
+    stages: Dict[Tuple[str, str], Dict[str, Any]] = {}
+    for row in ai_call_repo.summarize_since(session, since, product=product):
+        day, prod, stage = row.pop("day").date().isoformat(), row.pop("product"), row.pop("stage")
+        summary = _with_ratio(row)
+        if stage is None:
+            out.setdefault(day, {})[prod] = summary
+        else:
+            stages.setdefault((day, prod), {})[stage] = summary
+    for (day, prod), by_stage in stages.items():
+        out[day][prod]["stages"] = dict(sorted(by_stage.items()))
+    return {day: dict(sorted(out[day].items())) for day in sorted(out, reverse=True)}
+
+
+def daily_stats(days: int = 7, product: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Son `days` gün: {"days": gün -> ürün -> özet (+ aşama kırılımı), "aggregated_in", "truncated"}.
+    Henüz yazılmamış tampon önce flush edilir.
+    """
+    flush()
+    since = datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0) - timedelta(days=max(1, days) - 1)
+    if engine.dialect.name == "postgresql":
+        with Session(engine) as session:
+            return {"days": _daily_stats_sql(session, since, product), "aggregated_in": "postgres", "truncated": False}
+
+    max_rows = max(1, int(settings.ai_ledger_stats_max_rows))
+    with Session(engine) as session:
+        rows = ai_call_repo.list_since(session, since, product=product, limit=max_rows)
+    truncated = len(rows) >= max_rows
+    if truncated:
+        log.warning("ai_calls stats capped at the newest %d rows; the oldest day is partial", max_rows)
+
+    grouped: Dict[str, Dict[str, List[Any]]] = {}
+    for r in rows:
+        grouped.setdefault(r.created_at.date().isoformat(), {}).setdefault(r.product, []).append(r)
+
+    out: Dict[str, Any] = {}
+    for day in sorted(grouped, reverse=True):
+        out[day] = {}
+        for prod, prod_rows in sorted(grouped[day].items()):
+            stages: Dict[str, List[Any]] = {}
+            for r in prod_rows:
+                stages.setdefault(r.stage, []).append(r)
+            out[day][prod] = {
+                **_summarize(prod_rows),
+                "stages": {stage: _summarize(stage_rows) for stage, stage_rows in sorted(stages.items())},
+            }
+    return {"days": out, "aggregated_in": "python", "truncated": truncated}
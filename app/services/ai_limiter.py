@@ -0,0 +1,255 @@
+# app/services/ai_limiter.py
+"""
+Model bazında OpenAI eşzamanlılık sınırlayıcı (thread + asyncio ortak).
+
+- Her model için ayrı limit; slot yoksa çağrı sınırlı bir kuyrukta en fazla queue_timeout bekler.
+- Kuyruk doluysa / süre dolarsa LimiterSaturated (openai_service bunu 503 + Retry-After'a çevirir).
+- AIMD: 429'da limit yarıya iner (cooldown ile), başarılı çağrıda yavaşça (+1/limit) artar.
+"""
+from __future__ import annotations
+
+import asyncio
+import math
+import threading
+import time
+from collections import deque
+from contextlib import asynccontextmanager, contextmanager
+from typing import Any, AsyncIterator, Deque, Dict, Iterator, Optional
+
+from app.core.config import settings
+
+
+class LimiterSaturated(Exception):
+    """Slot alınamadı (kuyruk dolu ya da kuyruk bekleme süresi doldu)."""
+
+    def __init__(self, model: str, reason: str, retry_after: float) -> None:
+        super().__init__(f"{model}: {reason}")
+        self.model = model
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class _Waiter:
+    __slots__ = ("event", "loop", "future", "granted")
+
+    def __init__(self, loop: Optional[asyncio.AbstractEventLoop] = None) -> None:
+        self.loop = loop
+        self.event = None if loop else threading.Event()
+        self.future = loop.create_future() if loop else None
+        self.granted = False
+
+    def grant(self) -> None:
+        self.granted = True
+        if self.event is not None:
+            self.event.set()
+        else:
+            self.loop.call_soon_threadsafe(_resolve, self.future)
+
+
+def _resolve(fut: "asyncio.Future[None]") -> None:
+    if not fut.done():
+        fut.set_result(None)
+
+
+class ModelLimiter:
+    def __init__(
+        self,
+        model: str,
+        *,
+        initial: int,
+        minimum: int,
+        maximum: int,
+        queue_max: int,
+        queue_timeout: float,
+        decrease_cooldown: float = 2.0,
+    ) -> None:
+        self.model = model
+        self._min = max(1, int(minimum))
+        self._max = max(self._min, int(maximum))
+        self._limit = float(min(self._max, max(self._min, int(initial))))
+        self._queue_max = max(0, int(queue_max))
+        self._queue_timeout = max(0.0, float(queue_timeout))
+        self._cooldown = float(decrease_cooldown)
+
+        self._lock = threading.Lock()
+        self._in_use = 0
+        self._waiters: Deque[_Waiter] = deque()
+        self._last_decrease = 0.0
+        self._call_seconds_ewma = 5.0
+        self._stats = {"acquired": 0, "queued": 0, "rejected_full": 0, "timed_out": 0, "throttled": 0}
+
+    # -------------------------
+    # slot yönetimi
+    # -------------------------
+    def _retry_after(self) -> float:
+        # Kabaca: kuyruktakilerin boşalması için gereken süre, 1..30 sn
+        waves = (len(self._waiters) + 1) / max(1.0, self._limit)
+        return float(min(30, max(1, math.ceil(self._call_seconds_ewma * waves))))
+
+    def _try_take_locked(self) -> bool:
+        if not self._waiters and self._in_use < int(self._limit):
+            self._in_use += 1
+            self._stats["acquired"] += 1
+            return True
+        return False
+
+    def _enqueue_locked(self, waiter: _Waiter) -> None:
+        if len(self._waiters) >= self._queue_max:
+            self._stats["rejected_full"] += 1
+            raise LimiterSaturated(self.model, "queue full", self._retry_after())
+        self._waiters.append(waiter)
+        self._stats["queued"] += 1
+
+    def _wake_locked(self) -> None:
+        while self._waiters and self._in_use < int(self._limit):
+            w = self._waiters.popleft()
+            self._in_use += 1
+            self._stats["acquired"] += 1
+            w.grant()
+
+    def _abandon_locked(self, waiter: _Waiter) -> bool:
+        """Bekleme bitti (timeout/iptal). Slot bu arada verildiyse True (slot çağıranda)."""
+        if waiter.granted:
+            return True
+        try:
+            self._waiters.remove(waiter)
+        except ValueError:
+            pass
+        return False
+
+    def acquire(self) -> None:
+        with self._lock:
+            if self._try_take_locked():
+                return
+            waiter = _Waiter()
+            self._enqueue_locked(waiter)
+
+        waiter.event.wait(timeout=self._queue_timeout)
+        with self._lock:
+            if self._abandon_locked(waiter):
+                return
+            self._stats["timed_out"] += 1
+            raise LimiterSaturated(self.model, "queue timeout", self._retry_after())
+
+    async def aacquire(self) -> None:
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            if self._try_take_locked():
+                return
+            waiter = _Waiter(loop)
+            self._enqueue_locked(waiter)
+
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter.future), timeout=self._queue_timeout)
+        except asyncio.TimeoutError:
+            pass
+        except asyncio.CancelledError:
+            with self._lock:
+                if self._abandon_locked(waiter):
+                    self._release_locked()
+            raise
+
+        with self._lock:
+            if self._abandon_locked(waiter):
+                return
+            self._stats["timed_out"] += 1
+            raise LimiterSaturated(self.model, "queue timeout", self._retry_after())
+
+    def _release_locked(self) -> None:
+        self._in_use = max(0, self._in_use - 1)
+        self._wake_locked()
+
+    def release(self, held_seconds: Optional[float] = None) -> None:
+        with self._lock:
+            if held_seconds is not None:
+                self._call_seconds_ewma = 0.8 * self._call_seconds_ewma + 0.2 * float(held_seconds)
+            self._release_locked()
+
+    @contextmanager
+    def slot(self) -> Iterator[None]:
+        self.acquire()
+        started = time.monotonic()
+        try:
+            yield
+        finally:
+            self.release(time.monotonic() - started)
+
+    @asynccontextmanager
+    async def aslot(self) -> AsyncIterator[None]:
+        await self.aacquire()
+        started = time.monotonic()
+        try:
+            yield
+        finally:
+            self.release(time.monotonic() - started)
+
+    # -------------------------
+    # AIMD
+    # -------------------------
+    def on_success(self) -> None:
+        with self._lock:
+            if self._limit < self._max:
+                self._limit = min(float(self._max), self._limit + 1.0 / self._limit)
+                self._wake_locked()
+
+    def on_throttle(self) -> None:
+        now = time.monotonic()
+        with self._lock:
+            self._stats["throttled"] += 1
+            # Aynı patlamadaki 429'lar limiti tekrar tekrar yarılamasın
+            if now - self._last_decrease < self._cooldown:
+                return
+            self._last_decrease = now
+            self._limit = max(float(self._min), self._limit / 2.0)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "limit": round(self._limit, 2),
+                "in_use": self._in_use,
+                "waiting": len(self._waiters),
+                "min": self._min,
+                "max": self._max,
+                "queue_max": self._queue_max,
+                "queue_timeout_seconds": self._queue_timeout,
+                "avg_call_seconds": round(self._call_seconds_ewma, 2),
+                **self._stats,
+            }
+
+
+# -------------------------
+# Registry
+# -------------------------
+_registry_lock = threading.Lock()
+_limiters: Dict[str, ModelLimiter] = {}
+
+
+def _initial_for(model: str) -> int:
+    for part in (settings.openai_concurrency_per_model or "").split(","):
+        key, _, value = part.partition("=")
+        if key.strip() == model and value.strip().isdigit():
+            return int(value.strip())
+    return int(settings.openai_concurrency_initial)
+
+
+def get_limiter(model: str) -> ModelLimiter:
+    model = (model or "").strip() or "default"
+    with _registry_lock:
+        limiter = _limiters.get(model)
+        if limiter is None:
+            limiter = ModelLimiter(
+                model,
+                initial=_initial_for(model),
+                minimum=int(settings.openai_concurrency_min),
+                maximum=int(settings.openai_concurrency_max),
+                queue_max=int(settings.openai_queue_max),
+                queue_timeout=float(settings.openai_queue_timeout_seconds),
+            )
+            _limiters[model] = limiter
+        return limiter
+
+
+def limiter_stats() -> Dict[str, Dict[str, Any]]:
+    with _registry_lock:
+        limiters = dict(_limiters)
+    return {model: lim.stats() for model, lim in limiters.items()}
@@ -0,0 +1,290 @@
+# app/services/ai_retry.py
+"""
+Tüm üretim yolları için tek retry politikası.
+
+- Gecikme: decorrelated jitter -> min(cap, uniform(base, önceki * 3)).
+- 429 / 503 yanıtındaki Retry-After, retry-after-ms ve x-ratelimit-reset-* başlıkları alt sınırdır.
+- Okuma başına toplam bütçe (reading_budget): yeniden deneme sayısı + toplam bekleme süresi;
+  fan-out aşamaları aynı bütçeyi paylaşır. Bütçe bitince hata yukarı çıkar (iş kuyrukta ertelenir).
+- Sadece başarısız çağrı tekrar edilir; önceki aşamalar / devam hop'ları tekrar üretilmez.
+- OpenAI SDK'nın kendi max_retries'i varsayılan 0: tekrarlar burada, limiter + breaker'dan geçerek yapılır.
+"""
+from __future__ import annotations
+
+import asyncio
+import contextvars
+import email.utils
+import logging
+import random
+import re
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Dict, Iterator, Optional, TypeVar
+
+from app.core.config import settings
+
+log = logging.getLogger("lunaura.retry")
+
+T = TypeVar("T")
+
+
+# -------------------------
+# Sunucu ipuçları (Retry-After / x-ratelimit-reset-*)
+# -------------------------
+_DURATION_PART_RE = re.compile(r"(\d+(?:\.\d+)?)(ms|h|m|s)")
+_DURATION_UNITS = {"ms": 0.001, "s": 1.0, "m": 60.0, "h": 3600.0}
+
+
+def _parse_duration(value: str) -> Optional[float]:
+    """'20ms', '1s', '6m0s', '1h2m3.5s' ya da düz saniye."""
+    value = (value or "").strip().lower()
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    parts = _DURATION_PART_RE.findall(value)
+    if not parts or "".join(n + u for n, u in parts) != value:
+        return None
+    return sum(float(n) * _DURATION_UNITS[u] for n, u in parts)
+
+
+def _parse_retry_after(value: str) -> Optional[float]:
+    value = (value or "").strip()
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        when = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if when is None:
+        return None
+    return max(0.0, when.timestamp() - time.time())
+
+
+def server_delay(exc: BaseException) -> Optional[float]:
+    """OpenAI hata yanıtının başlıklarından önerilen bekleme (saniye); yoksa None."""
+    headers = None
+    seen = set()
+    e: Optional[BaseException] = exc
+    # Domain hatasına çevrilmişse asıl SDK hatası __cause__'da
+    while e is not None and id(e) not in seen:
+        seen.add(id(e))
+        headers = getattr(getattr(e, "response", None), "headers", None)
+        if headers is not None:
+            break
+        e = e.__cause__
+    if headers is None:
+        return None
+
+    ms = headers.get("retry-after-ms")
+    if ms:
+        try:
+            return max(0.0, float(ms) / 1000.0)
+        except ValueError:
+            pass
+    ra = _parse_retry_after(headers.get("retry-after") or "")
+    if ra is not None:
+        return ra
+    resets = [
+        d
+        for d in (
+            _parse_duration(headers.get("x-ratelimit-reset-requests") or ""),
+            _parse_duration(headers.get("x-ratelimit-reset-tokens") or ""),
+        )
+        if d is not None
+    ]
+    return max(resets) if resets else None
+
+
+# -------------------------
+# Politika
+# -------------------------
+@dataclass(frozen=True)
+class RetryPolicy:
+    base_seconds: float
+    cap_seconds: float
+    max_attempts: int
+
+    def delay(self, previous: Optional[float], hint: Optional[float] = None) -> float:
+        """Decorrelated jitter; sunucu ipucu varsa ondan kısa beklenmez."""
+        base = max(0.001, float(self.base_seconds))
+        prev = max(base, float(previous or base))
+        d = min(float(self.cap_seconds), random.uniform(base, prev * 3.0))
+        if hint is not None:
+            d = max(d, float(hint))
+        return d
+
+    def delay_for_attempt(self, attempt: int, hint: Optional[float] = None) -> float:
+        """Önceki gecikme saklanmıyorsa (kuyruk işleri): attempt'e göre tahmini önceki gecikme."""
+        prev = min(float(self.cap_seconds), float(self.base_seconds) * (3.0 ** max(0, int(attempt) - 1)))
+        return self.delay(prev, hint)
+
+
+def call_policy() -> RetryPolicy:
+    """Tek OpenAI çağrısı (aşama / hop) için."""
+    return RetryPolicy(
+        base_seconds=float(settings.openai_retry_base_seconds),
+        cap_seconds=float(settings.openai_retry_cap_seconds),
+        max_attempts=max(1, int(settings.openai_retry_max_attempts)),
+    )
+
+
+def job_policy() -> RetryPolicy:
+    """generation_jobs tekrar kuyruğa alma gecikmesi için (deneme sayısını iş satırı tutar)."""
+    return RetryPolicy(
+        base_seconds=float(settings.generation_job_retry_base_seconds),
+        cap_seconds=float(settings.generation_job_retry_cap_seconds),
+        max_attempts=max(1, int(settings.generation_job_max_attempts)),
+    )
+
+
+# -------------------------
+# Okuma başına bütçe
+# -------------------------
+@dataclass
+class RetryBudget:
+    label: str
+    max_retries: int
+    max_sleep_seconds: float
+    retries: int = 0
+    slept_seconds: float = 0.0
+    _lock: threading.Lock = field(default_factory=threading.Lock, repr=False)
+
+    def take(self, delay: float) -> bool:
+        with self._lock:
+            if self.retries >= self.max_retries or self.slept_seconds + delay > self.max_sleep_seconds:
+                return False
+            self.retries += 1
+            self.slept_seconds += delay
+            return True
+
+
+_current_budget: contextvars.ContextVar[Optional[RetryBudget]] = contextvars.ContextVar("ai_retry_budget", default=None)
+
+
+@contextmanager
+def reading_budget(product: str, reading_id: str) -> Iterator[RetryBudget]:
+    """Bu blok (ve contextvars kopyalanarak açılan fan-out thread'leri) aynı bütçeyi paylaşır."""
+    budget = RetryBudget(
+        label=f"{product}/{reading_id}",
+        max_retries=max(0, int(settings.openai_retry_budget_per_reading)),
+        max_sleep_seconds=max(0.0, float(settings.openai_retry_budget_seconds)),
+    )
+    token = _current_budget.set(budget)
+    try:
+        yield budget
+    finally:
+        _current_budget.reset(token)
+
+
+def current_budget() -> Optional[RetryBudget]:
+    return _current_budget.get()
+
+
+_current_stage: contextvars.ContextVar[str] = contextvars.ContextVar("ai_retry_stage", default="openai")
+
+
+def current_stage() -> str:
+    return _current_stage.get()
+
+
+@contextmanager
+def stage(name: str) -> Iterator[None]:
+    """Metriklerde (retry, token kullanımı) çağrının hangi aşamaya yazılacağı (ürün / fan-out aşaması)."""
+    token = _current_stage.set(name)
+    try:
+        yield
+    finally:
+        _current_stage.reset(token)
+
+
+# -------------------------
+# Metrikler
+# -------------------------
+_stats_lock = threading.Lock()
+_stats: Dict[str, Dict[str, float]] = {}
+
+
+def _count(stage: str, key: str, amount: float = 1) -> None:
+    with _stats_lock:
+        bucket = _stats.setdefault(
+            stage,
+            {"retried": 0, "server_hinted": 0, "slept_seconds": 0.0, "gave_up_attempts": 0, "gave_up_budget": 0},
+        )
+        bucket[key] += amount
+
+
+def retry_stats() -> Dict[str, Dict[str, float]]:
+    with _stats_lock:
+        return {k: {kk: round(vv, 2) for kk, vv in v.items()} for k, v in _stats.items()}
+
+
+# -------------------------
+# Deneme durumu
+# -------------------------
+class RetryState:
+    """Tek çağrının deneme sayacı; backoff() bekleme süresini ya da None (vazgeç) döner."""
+
+    def __init__(self, stage: Optional[str] = None, policy: Optional[RetryPolicy] = None) -> None:
+        self.stage = stage or _current_stage.get()
+        self.policy = policy or call_policy()
+        self.attempt = 1
+        self._previous: Optional[float] = None
+
+    def backoff(self, exc: BaseException) -> Optional[float]:
+        if self.attempt >= self.policy.max_attempts:
+            _count(self.stage, "gave_up_attempts")
+            return None
+        hint = server_delay(exc)
+        delay = self.policy.delay(self._previous, hint)
+        budget = current_budget()
+        if budget is not None and not budget.take(delay):
+            _count(self.stage, "gave_up_budget")
+            log.warning("Retry budget exhausted for %s (stage=%s): %s", budget.label, self.stage, exc)
+            return None
+        self.attempt += 1
+        self._previous = delay
+        _count(self.stage, "retried")
+        _count(self.stage, "slept_seconds", delay)
+        if hint is not None:
+            _count(self.stage, "server_hinted")
+        log.info("Retrying %s in %.2fs (attempt %d): %s", self.stage, delay, self.attempt, exc)
+        return delay
+
+
+def call(fn: Callable[[], T], *, retryable: Callable[[BaseException], bool]) -> T:
+    state = RetryState()
+    while True:
+        try:
+            return fn()
+        except Exception as e:
+            delay = state.backoff(e) if retryable(e) else None
+            if delay is None:
+                raise
+        time.sleep(delay)
+
+
+async def acall(fn: Callable[[], Awaitable[T]], *, retryable: Callable[[BaseException], bool]) -> T:
+    state = RetryState()
+    while True:
+        try:
+            return await fn()
+        except Exception as e:
+            delay = state.backoff(e) if retryable(e) else None
+            if delay is None:
+                raise
+        await asyncio.sleep(delay)
+
+
+def submit(executor: Any, fn: Callable[..., T], *args: Any) -> Any:
+    """ThreadPoolExecutor.submit; çağıranın contextvars'ı (retry bütçesi) thread'e taşınır."""
+    ctx = contextvars.copy_context()
+    return executor.submit(ctx.run, fn, *args)
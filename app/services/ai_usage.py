@@ -0,0 +1,77 @@
+# app/services/ai_usage.py
+"""
+OpenAI token kullanımı (süreç içi): aşama / ürün bazında input, cached ve output token.
+
+- Etiket ai_retry.stage ile gelir (iş: ürün adı, fan-out: "personality.numerology", doğrulama: "coffee.validate").
+- cached_tokens = usage.input_tokens_details.cached_tokens (otomatik prompt cache isabeti).
+- input_cost_saved: cached tokenların indirimli fiyatından (OPENAI_CACHED_INPUT_DISCOUNT) gelen tahmini oran.
+- OpenAI cache'i sadece >= PROMPT_CACHE_MIN_TOKENS input'lu çağrılarda devreye girer; eligible_calls bunları sayar,
+  eligible_hit_rate sadece cache'lenebilir çağrılar içindeki isabet oranıdır.
+"""
+from __future__ import annotations
+
+import threading
+from typing import Any, Dict
+
+from app.core.config import settings
+
+PROMPT_CACHE_MIN_TOKENS = 1024
+
+_lock = threading.Lock()
+_stats: Dict[str, Dict[str, int]] = {}
+
+
+def _usage_numbers(usage: Any) -> Dict[str, int]:
+    details = getattr(usage, "input_tokens_details", None)
+    return {
+        "input_tokens": int(getattr(usage, "input_tokens", 0) or 0),
+        "cached_tokens": int(getattr(details, "cached_tokens", 0) or 0),
+        "output_tokens": int(getattr(usage, "output_tokens", 0) or 0),
+    }
+
+
+def record(label: str, resp: Any) -> None:
+    """Başarılı Responses yanıtının usage'ını label altına ekler (usage yoksa sadece çağrı sayılır)."""
+    usage = getattr(resp, "usage", None)
+    nums = _usage_numbers(usage) if usage is not None else {}
+    with _lock:
+        bucket = _stats.setdefault(
+            label or "openai",
+            {"calls": 0, "eligible_calls": 0, "cache_hits": 0, "input_tokens": 0, "cached_tokens": 0, "output_tokens": 0},
+        )
+        bucket["calls"] += 1
+        if nums.get("input_tokens", 0) >= PROMPT_CACHE_MIN_TOKENS:
+            bucket["eligible_calls"] += 1
+        if nums.get("cached_tokens"):
+            bucket["cache_hits"] += 1
+        for k, v in nums.items():
+            bucket[k] += v
+
+
+def _summary(bucket: Dict[str, int]) -> Dict[str, Any]:
+    inp = bucket["input_tokens"]
+    cached = bucket["cached_tokens"]
+    discount = float(settings.openai_cached_input_discount)
+    return {
+        **bucket,
+        "cached_ratio": round(cached / inp, 3) if inp else 0.0,
+        "call_hit_rate": round(bucket["cache_hits"] / bucket["calls"], 3) if bucket["calls"] else 0.0,
+        "eligible_hit_rate": round(bucket["cache_hits"] / bucket["eligible_calls"], 3) if bucket["eligible_calls"] else 0.0,
+        "input_cost_saved": round(cached * discount / inp, 3) if inp else 0.0,
+    }
+
+
+def usage_stats() -> Dict[str, Any]:
+    with _lock:
+        stages = {k: dict(v) for k, v in _stats.items()}
+
+    products: Dict[str, Dict[str, int]] = {}
+    for label, bucket in stages.items():
+        total = products.setdefault(label.split(".", 1)[0], {k: 0 for k in bucket})
+        for k, v in bucket.items():
+            total[k] += v
+
+    return {
+        "products": {k: _summary(v) for k, v in products.items()},
+        "stages": {k: _summary(v) for k, v in stages.items()},
+    }
@@ -0,0 +1,691 @@
+# app/services/generation_jobs.py
+"""
+Kalıcı yorum üretim kuyruğu (generation_jobs tablosu).
+
+- /generate endpoint'leri okumayı processing'e çeker, enqueue_generation ile iş bırakır ve hemen döner.
+- İşleri tüketici döngüsü (run_consumer) alır; ürün handler'ı yorumu üretir, repo ile yazar, FCM gönderir.
+- Hata: iş ai_retry politikasıyla (jitter + Retry-After) tekrar kuyruğa girer; deneme hakkı bitince okuma tekrar denenebilir duruma çekilir.
+- Web süreci içinde GENERATION_INLINE_WORKERS kadar tüketici thread'i çalışır (0 = sadece ayrı worker).
+- Kapanışta drain_consumers süren işleri GENERATION_DRAIN_SECONDS kadar bekler, bitmeyenleri kuyruğa geri verir.
+- SSE stream, /generate'in bıraktığı ve henüz başlamamış işi take_over ile devralıp kendisi üretebilir;
+  sonuç / hata yine bu modülün iş muhasebesinden geçer (finish_taken_over / fail_taken_over).
+"""
+from __future__ import annotations
+
+import logging
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict, deque
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any, Callable, Deque, Dict, List, Optional, Tuple, Type
+
+from sqlmodel import Session
+
+from app.core.config import settings
+from app.db import engine
+from app.models.birthchart_db import BirthChartReadingDB
+from app.models.coffee_db import CoffeeReadingDB
+from app.models.generation_job_db import GenerationJobDB
+from app.models.hand_db import HandReadingDB
+from app.models.numerology_db import NumerologyReadingDB
+from app.models.personality_db import PersonalityReadingDB
+from app.models.synastry_db import SynastryReadingDB
+from app.models.tarot_db import TarotReadingDB
+from app.repositories import coffee_repo, generation_job_repo, hand_repo, tarot_repo
+from app.repositories.birthchart_repo import birthchart_repo
+from app.repositories.numerology_repo import numerology_repo
+from app.repositories.personality_repo import personality_repo
+from app.repositories.synastry_repo import synastry_repo
+from app.services import ai_ledger, ai_retry, openai_service, single_flight
+from app.services.personality_service import find_reusable_subreadings, generate_personality_reading
+from app.services.storage import delete_uploads
+
+log = logging.getLogger("lunaura.jobs")
+
+
+class JobRejected(Exception):
+    """Tekrar denemesi anlamsız ret (ör. görseller uygun değil); iş hemen failed olur."""
+
+
+@dataclass(frozen=True)
+class _JobHandler:
+    # Yorumu üretip yazar; bildirim gidecek device_id döner (iş yoksa / zaten bittiyse None)
+    run: Callable[[Session, str], Optional[str]]
+    # Kalıcı hata: okumayı kullanıcının tekrar deneyebileceği duruma çeker
+    release: Callable[[Session, str], None]
+    # JobRejected: reddi okumaya yazar (yoksa release çağrılır)
+    reject: Optional[Callable[[Session, str], None]] = None
+
+
+def _require_text(text: Optional[str]) -> str:
+    out = (text or "").strip()
+    if not out:
+        raise RuntimeError("Boş sonuç")
+    return out
+
+
+# -------------------------
+# Coffee / Hand
+# -------------------------
+def _run_coffee(session: Session, reading_id: str) -> Optional[str]:
+    r = coffee_repo.get_reading(session, reading_id)
+    if not r or (r.result_text or "").strip():
+        return None
+    photos = coffee_repo.list_photos(r)
+
+    if settings.coffee_single_pass:
+        res = openai_service.validate_and_generate_fortune(
+            name=r.name,
+            topic=r.topic,
+            question=r.question,
+            image_paths=photos,
+        )
+        if not res.get("ok"):
+            raise JobRejected(res.get("reason") or "Görseller kahve fincanı içi değil.")
+        text = res.get("reading")
+    else:
+        text = openai_service.generate_fortune(
+            name=r.name,
+            topic=r.topic,
+            question=r.question,
+            image_paths=photos,
+        )
+
+    coffee_repo.set_status(session, reading_id, "completed", comment=_require_text(text))
+    return r.device_id
+
+
+def _release_coffee(session: Session, reading_id: str) -> None:
+    r = coffee_repo.get_reading(session, reading_id)
+    if r:
+        coffee_repo.set_status(session, reading_id, "paid" if r.is_paid else "photos_uploaded")
+
+
+def _reject_coffee(session: Session, reading_id: str) -> None:
+    # Upload'daki retle aynı: görseller silinir, kullanıcı yeniden yükler (/generate 400 döner)
+    r = coffee_repo.get_reading(session, reading_id)
+    if not r:
+        return
+    delete_uploads(coffee_repo.list_photos(r))
+    coffee_repo.set_photos(session, reading_id, [])
+    coffee_repo.set_status(session, reading_id, "rejected")
+
+
+def _run_hand(session: Session, reading_id: str) -> Optional[str]:
+    r = hand_repo.get_reading(session, reading_id)
+    if not r or (r.result_text or "").strip():
+        return None
+    text = openai_service.generate_hand_fortune(
+        name=r.name,
+        topic=r.topic,
+        question=r.question,
+        image_paths=hand_repo.list_photos(r),
+    )
+    hand_repo.set_status(session, reading_id, "completed", comment=_require_text(text))
+    return r.device_id
+
+
+def _release_hand(session: Session, reading_id: str) -> None:
+    r = hand_repo.get_reading(session, reading_id)
+    if r:
+        hand_repo.set_status(session, reading_id, "paid" if r.is_paid else "photos_uploaded", comment=None)
+
+
+# -------------------------
+# Tarot
+# -------------------------
+def _run_tarot(session: Session, reading_id: str) -> Optional[str]:
+    r = tarot_repo.get_reading(session, reading_id)
+    if not r or (r.status == "completed" and (r.result_text or "").strip()):
+        return None
+    cards = r.get_cards()
+    if not cards:
+        raise JobRejected("Kart seçilmemiş")
+    text = openai_service.generate_tarot_reading(
+        name=r.name,
+        age=r.age,
+        topic=r.topic,
+        question=r.question,
+        spread_type=r.spread_type,
+        selected_cards=cards,
+    )
+    tarot_repo.set_status(session, reading_id, "completed", result_text=_require_text(text))
+    return r.device_id
+
+
+def _release_tarot(session: Session, reading_id: str) -> None:
+    r = tarot_repo.get_reading(session, reading_id)
+    if r:
+        tarot_repo.set_status(session, reading_id, "paid" if r.is_paid else "pending_payment")
+
+
+# -------------------------
+# Numerology / BirthChart / Personality / Synastry
+# -------------------------
+def _run_numerology(session: Session, reading_id: str) -> Optional[str]:
+    d = numerology_repo.get(session=session, reading_id=reading_id)
+    if not d or (d.get("result_text") or "").strip():
+        return None
+    text = openai_service.generate_numerology_reading(
+        name=d.get("name", ""),
+        birth_date=d.get("birth_date", ""),
+        topic=d.get("topic", "genel"),
+        question=d.get("question"),
+    )
+    if not numerology_repo.set_result(session=session, reading_id=reading_id, result_text=_require_text(text)):
+        raise RuntimeError("AI sonucu DB'ye yazılamadı.")
+    return d.get("device_id")
+
+
+def _release_numerology(session: Session, reading_id: str) -> None:
+    d = numerology_repo.get(session=session, reading_id=reading_id)
+    status = "paid" if d and d.get("is_paid") else "started"
+    numerology_repo.set_status(session=session, reading_id=reading_id, status=status)
+
+
+def _run_birthchart(session: Session, reading_id: str) -> Optional[str]:
+    d = birthchart_repo.get(session=session, reading_id=reading_id)
+    if not d or (d.get("result_text") or "").strip():
+        return None
+    text = openai_service.generate_birthchart_reading(
+        name=d.get("name") or "",
+        birth_date=d.get("birth_date") or "",
+        birth_time=d.get("birth_time"),
+        birth_city=d.get("birth_city") or "",
+        birth_country=d.get("birth_country") or "TR",
+        topic=d.get("topic") or "genel",
+        question=d.get("question"),
+    )
+    birthchart_repo.set_result(session=session, reading_id=reading_id, result_text=_require_text(text))
+    return d.get("device_id")
+
+
+def _release_birthchart(session: Session, reading_id: str) -> None:
+    d = birthchart_repo.get(session=session, reading_id=reading_id)
+    status = "paid" if d and d.get("is_paid") else "started"
+    birthchart_repo.set_status(session=session, reading_id=reading_id, status=status)
+
+
+# reading_id -> biten alt aşamalar (numerology / birthchart); iş tekrar denenirse sadece eksik aşama üretilir
+_personality_stages_lock = threading.Lock()
+_personality_stages: "OrderedDict[str, Dict[str, str]]" = OrderedDict()
+_PERSONALITY_STAGES_MAX = 256
+
+
+def _personality_stage_results(reading_id: str) -> Dict[str, str]:
+    with _personality_stages_lock:
+        stages = _personality_stages.get(reading_id)
+        if stages is None:
+            stages = _personality_stages[reading_id] = {}
+            while len(_personality_stages) > _PERSONALITY_STAGES_MAX:
+                _personality_stages.popitem(last=False)
+        return stages
+
+
+def _forget_personality_stages(reading_id: str) -> None:
+    with _personality_stages_lock:
+        _personality_stages.pop(reading_id, None)
+
+
+def _run_personality(session: Session, reading_id: str) -> Optional[str]:
+    d = personality_repo.get(session=session, reading_id=reading_id)
+    if not d or (d.get("result_text") or "").strip():
+        _forget_personality_stages(reading_id)
+        return None
+    text = generate_personality_reading(
+        name=d.get("name") or "",
+        birth_date=d.get("birth_date") or "",
+        birth_time=d.get("birth_time"),
+        birth_city=d.get("birth_city") or "",
+        birth_country=d.get("birth_country") or "TR",
+        topic=d.get("topic") or "genel",
+        question=d.get("question"),
+        stage_results=_personality_stage_results(reading_id),
+        **find_reusable_subreadings(session, d),
+    )
+    personality_repo.set_result(session=session, reading_id=reading_id, result_text=_require_text(text))
+    _forget_personality_stages(reading_id)
+    return d.get("device_id")
+
+
+def _release_personality(session: Session, reading_id: str) -> None:
+    _forget_personality_stages(reading_id)
+    d = personality_repo.get(session=session, reading_id=reading_id)
+    status = "paid" if d and d.get("is_paid") else "created"
+    personality_repo.set_status(session=session, reading_id=reading_id, status=status)
+
+
+def _run_synastry(session: Session, reading_id: str) -> Optional[str]:
+    d = synastry_repo.get(session=session, reading_id=reading_id)
+    if not d or (d.get("result_text") or "").strip():
+        return None
+    text = openai_service.generate_synastry_reading(
+        name_a=d.get("name_a") or "",
+        birth_date_a=d.get("birth_date_a") or "",
+        birth_time_a=d.get("birth_time_a"),
+        birth_city_a=d.get("birth_city_a") or "",
+        birth_country_a=d.get("birth_country_a") or "TR",
+        name_b=d.get("name_b") or "",
+        birth_date_b=d.get("birth_date_b") or "",
+        birth_time_b=d.get("birth_time_b"),
+        birth_city_b=d.get("birth_city_b") or "",
+        birth_country_b=d.get("birth_country_b") or "TR",
+        topic=d.get("topic") or "Genel",
+        question=d.get("question"),
+    )
+    synastry_repo.set_result(session=session, reading_id=reading_id, result_text=_require_text(text))
+    return d.get("device_id")
+
+
+def _release_synastry(session: Session, reading_id: str) -> None:
+    d = synastry_repo.get(session=session, reading_id=reading_id)
+    status = "paid" if d and d.get("is_paid") else "started"
+    synastry_repo.set_status(session=session, reading_id=reading_id, status=status)
+
+
+READING_MODELS: Dict[str, Type[Any]] = {
+    "coffee": CoffeeReadingDB,
+    "hand": HandReadingDB,
+    "tarot": TarotReadingDB,
+    "numerology": NumerologyReadingDB,
+    "birthchart": BirthChartReadingDB,
+    "personality": PersonalityReadingDB,
+    "synastry": SynastryReadingDB,
+}
+
+_HANDLERS: Dict[str, _JobHandler] = {
+    "coffee": _JobHandler(_run_coffee, _release_coffee, _reject_coffee),
+    "hand": _JobHandler(_run_hand, _release_hand),
+    "tarot": _JobHandler(_run_tarot, _release_tarot),
+    "numerology": _JobHandler(_run_numerology, _release_numerology),
+    "birthchart": _JobHandler(_run_birthchart, _release_birthchart),
+    "personality": _JobHandler(_run_personality, _release_personality),
+    "synastry": _JobHandler(_run_synastry, _release_synastry),
+}
+
+
+# -------------------------
+# Kuyruk API
+# -------------------------
+_wakeup = threading.Event()
+
+
+def _default_priority(session: Session, product: str, reading_id: str) -> int:
+    model = READING_MODELS.get(product)
+    row = session.get(model, reading_id) if model is not None else None
+    if row is not None and bool(getattr(row, "is_paid", False)):
+        return generation_job_repo.PRIORITY_PAID
+    return generation_job_repo.PRIORITY_PREPAY
+
+
+def enqueue_generation(
+    session: Session,
+    product: str,
+    reading_id: str,
+    *,
+    priority: Optional[int] = None,
+) -> GenerationJobDB:
+    """
+    Okuma zaten processing'e çekilmiş olmalı; aynı okuma için aktif iş varsa yenisi açılmaz.
+    priority verilmezse okumaya göre seçilir: ödenmiş -> PRIORITY_PAID, değilse PRIORITY_PREPAY.
+    Toplu/backfill üretimler PRIORITY_BACKFILL ile bırakılmalı.
+    """
+    if product not in _HANDLERS:
+        raise ValueError(f"Unknown product: {product}")
+    if priority is None:
+        priority = _default_priority(session, product, reading_id)
+    job = generation_job_repo.enqueue(
+        session,
+        product,
+        reading_id,
+        max_attempts=int(settings.generation_job_max_attempts),
+        priority=priority,
+    )
+    _wakeup.set()
+    return job
+
+
+def release_reading(session: Session, product: str, reading_id: str) -> None:
+    """Üretim kalıcı olarak başarısız: okumayı kullanıcının tekrar deneyebileceği duruma çeker (worker ve stream ortak)."""
+    _HANDLERS[product].release(session, reading_id)
+
+
+def promote_generation(session: Session, product: str, reading_id: str) -> bool:
+    """Ödeme geldi: kuyrukta bekleyen ödeme öncesi işi ödenmiş sınıfına taşı."""
+    promoted = generation_job_repo.promote(session, product, reading_id, priority=generation_job_repo.PRIORITY_PAID)
+    if promoted:
+        with _wait_lock:
+            _promotions[product] = _promotions.get(product, 0) + 1
+        _wakeup.set()
+    return bool(promoted)
+
+
+# -------------------------
+# Öncelik sınıfı başına bekleme süresi (next_run_at -> claim)
+# -------------------------
+_wait_lock = threading.Lock()
+_wait_samples: Dict[str, Deque[float]] = {}
+_wait_totals: Dict[str, Dict[str, float]] = {}
+_promotions: Dict[str, int] = {}
+
+
+def _record_wait(job: GenerationJobDB) -> None:
+    claimed_at = job.locked_at or datetime.utcnow()
+    wait = max(0.0, (claimed_at - job.next_run_at).total_seconds())
+    cls = generation_job_repo.PRIORITY_CLASSES.get(job.priority, str(job.priority))
+    with _wait_lock:
+        _wait_samples.setdefault(cls, deque(maxlen=1000)).append(wait)
+        t = _wait_totals.setdefault(cls, {"claimed": 0, "wait_seconds_total": 0.0, "wait_seconds_max": 0.0})
+        t["claimed"] += 1
+        t["wait_seconds_total"] += wait
+        t["wait_seconds_max"] = max(t["wait_seconds_max"], wait)
+
+
+def _percentile(values: List[float], q: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(q * (len(ordered) - 1))))]
+
+
+def queue_stats() -> Dict[str, object]:
+    with _wait_lock:
+        classes = {}
+        for cls, t in _wait_totals.items():
+            samples = list(_wait_samples.get(cls, ()))
+            classes[cls] = {
+                "claimed": int(t["claimed"]),
+                "wait_seconds_avg": round(t["wait_seconds_total"] / max(1, t["claimed"]), 3),
+                "wait_seconds_max": round(t["wait_seconds_max"], 3),
+                "wait_seconds_p50": round(_percentile(samples, 0.50), 3),
+                "wait_seconds_p95": round(_percentile(samples, 0.95), 3),
+            }
+        promotions = dict(_promotions)
+    with Session(engine) as session:
+        queued = generation_job_repo.queued_counts(session)
+    return {"queued": queued, "wait_by_class": classes, "promotions": promotions}
+
+
+BUSY_RETRY_SECONDS = 30.0
+
+
+def _retry_delay(attempts: int, error: BaseException) -> float:
+    # Ortak politika: decorrelated jitter; OpenAI Retry-After / x-ratelimit-reset-* varsa alt sınır
+    return ai_retry.job_policy().delay_for_attempt(attempts, ai_retry.server_delay(error))
+
+
+def _notify(device_id: Optional[str]) -> None:
+    did = (device_id or "").strip()
+    if not did:
+        return
+    try:
+        from app.services.fcm_service import send_reading_ready_notification
+        send_reading_ready_notification(did)
+    except Exception:
+        pass
+
+
+def process_job(job: GenerationJobDB) -> None:
+    handler = _HANDLERS.get(job.product)
+    with Session(engine) as session:
+        if handler is None:
+            generation_job_repo.mark_failed(
+                session, job.id, job.locked_by, f"Unknown product: {job.product}", retry_in_seconds=None
+            )
+            return
+
+        try:
+            # Aynı okuma bu süreçte zaten üretiliyorsa lider'in sonucunu bekle (ikinci OpenAI çağrısı yok)
+            # Okuma başına retry bütçesi: bu denemedeki tüm OpenAI çağrıları (fan-out dahil) paylaşır;
+            # çağrılar ai_calls defterine bu okuma adına yazılır
+            with (
+                ai_retry.reading_budget(job.product, job.reading_id),
+                ai_retry.stage(job.product),
+                ai_ledger.reading(job.product, job.reading_id),
+            ):
+                device_id, leader = single_flight.run(
+                    job.product,
+                    job.reading_id,
+                    lambda: handler.run(session, job.reading_id),
+                )
+        except openai_service.AIServiceSaturatedError as e:
+            session.rollback()
+            # Backpressure, hata değil: deneme hakkı yakmadan limiter'ın önerdiği kadar ertele
+            generation_job_repo.defer(session, job.id, str(e), delay_seconds=max(1.0, e.retry_after))
+            log.info("Job %s %s/%s deferred %.0fs: OpenAI limiter saturated", job.id, job.product, job.reading_id, e.retry_after)
+            return
+        except single_flight.SingleFlightBusy as e:
+            session.rollback()
+            # Başka worker üretiyor; sonuç yazılınca bu iş "zaten tamam" olarak kapanır
+            generation_job_repo.defer(session, job.id, str(e), delay_seconds=BUSY_RETRY_SECONDS)
+            log.info("Job %s %s/%s deferred: generation in progress elsewhere", job.id, job.product, job.reading_id)
+            return
+        except Exception as e:
+            session.rollback()
+            _fail_job(session, job, handler, e)
+            return
+
+        if not generation_job_repo.mark_done(session, job.id, job.locked_by):
+            # Sonuç yazıldı; iş satırı artık yeni sahibinde, o "zaten tamam" olarak kapatır
+            _lease_lost(job, "done")
+
+    # Bildirimi sadece üretimi yapan gönderir
+    if leader:
+        _notify(device_id)
+
+
+def _lease_lost(job: GenerationJobDB, outcome: str) -> None:
+    log.warning(
+        "Job %s %s/%s lease lost before %s (locked_by=%s); leaving the row to its new owner",
+        job.id,
+        job.product,
+        job.reading_id,
+        outcome,
+        job.locked_by,
+    )
+
+
+def _fail_job(session: Session, job: GenerationJobDB, handler: _JobHandler, e: BaseException) -> str:
+    """
+    Deneme hakkı kaldıysa retry politikasıyla tekrar kuyruğa, yoksa failed + okumayı bırak.
+    Yeni iş durumu; lease başka worker'a geçtiyse "lost" (iş de okuma da yeni sahibinde).
+    """
+    retry = None if isinstance(e, JobRejected) else _retry_delay(job.attempts, e)
+    status = generation_job_repo.mark_failed(
+        session, job.id, job.locked_by, f"{type(e).__name__}: {e}", retry_in_seconds=retry
+    )
+    if status is None:
+        _lease_lost(job, f"failure ({type(e).__name__}: {e})")
+        return "lost"
+    if status == "failed":
+        rejected = isinstance(e, JobRejected) and handler.reject is not None
+        if rejected:
+            log.info("Job %s %s/%s rejected: %s", job.id, job.product, job.reading_id, e)
+        else:
+            log.error("Job %s %s/%s failed permanently: %s", job.id, job.product, job.reading_id, e, exc_info=e)
+        try:
+            (handler.reject if rejected else handler.release)(session, job.reading_id)
+        except Exception:
+            log.exception("Job %s release failed", job.id)
+    else:
+        log.warning(
+            "Job %s %s/%s attempt %s failed, retry in %.0fs: %s",
+            job.id,
+            job.product,
+            job.reading_id,
+            job.attempts,
+            retry or 0,
+            e,
+        )
+    return status
+
+
+# -------------------------
+# SSE stream devralması
+# -------------------------
+def take_over(product: str, reading_id: str, worker_id: str) -> Optional[GenerationJobDB]:
+    """
+    /generate'in bıraktığı, henüz hiçbir worker'ın almadığı işi stream için alır (status=running, lease stream'de).
+    Yoksa None: iş zaten bir worker'da ya da zamanı gelmemiş bir retry bekliyor.
+    """
+    if product not in _HANDLERS:
+        return None
+    with Session(engine) as session:
+        job = generation_job_repo.claim_queued(session, product, reading_id, worker_id)
+        if job is not None:
+            session.expunge(job)
+            _record_wait(job)
+        return job
+
+
+def finish_taken_over(job: GenerationJobDB) -> None:
+    """Stream sonucu yazdı (bildirimi de stream gönderdi)."""
+    with Session(engine) as session:
+        if not generation_job_repo.mark_done(session, job.id, job.locked_by):
+            _lease_lost(job, "done")
+
+
+def fail_taken_over(job: GenerationJobDB, error: BaseException) -> str:
+    """Stream üretimi başarısız: worker ile aynı retry / kalıcı hata muhasebesi. Yeni iş durumu."""
+    with Session(engine) as session:
+        return _fail_job(session, job, _HANDLERS[job.product], error)
+
+
+def return_taken_over(job: GenerationJobDB, reason: str, *, delay_seconds: float = 0.0) -> None:
+    """Stream işi üretmeden bıraktı (başka yerde üretiliyor / kapanış): deneme hakkı yakmadan kuyruğa."""
+    with Session(engine) as session:
+        if delay_seconds > 0:
+            generation_job_repo.defer(session, job.id, reason, delay_seconds=delay_seconds)
+        else:
+            generation_job_repo.hand_back(session, job.id, reason)
+
+
+def claim_next(worker_id: str) -> Optional[GenerationJobDB]:
+    with Session(engine) as session:
+        job = generation_job_repo.claim_next(
+            session,
+            worker_id,
+            lease_seconds=int(settings.generation_job_lease_seconds),
+        )
+        if job is not None:
+            session.expunge(job)
+            _record_wait(job)
+        return job
+
+
+# worker_id -> şu an işlenen iş (drain sırasında bitmeyenleri kuyruğa geri vermek için)
+_current_lock = threading.Lock()
+_current_jobs: Dict[str, GenerationJobDB] = {}
+
+
+def run_consumer(stop: threading.Event, worker_id: str, *, poll_seconds: float = 1.0) -> None:
+    """Tek tüketici döngüsü: iş al -> işle; iş yoksa poll_seconds bekle (enqueue uyandırır)."""
+    while not stop.is_set():
+        try:
+            job = claim_next(worker_id)
+        except Exception:
+            log.exception("Job claim failed (%s)", worker_id)
+            job = None
+
+        if job is None:
+            _wakeup.wait(timeout=poll_seconds)
+            _wakeup.clear()
+            continue
+
+        with _current_lock:
+            _current_jobs[worker_id] = job
+        try:
+            process_job(job)
+        except Exception:
+            log.exception("Job %s crashed", job.id)
+        finally:
+            with _current_lock:
+                _current_jobs.pop(worker_id, None)
+
+
+def drain_consumers(
+    stop: threading.Event,
+    consumers: List[Tuple[threading.Thread, str]],
+    *,
+    deadline_seconds: float,
+    label: str,
+) -> Dict[str, int]:
+    """
+    Yeni iş almayı durdurur, süren işleri deadline_seconds'a kadar bekler;
+    bitmeyenleri kuyruğa geri verir (başka worker lease beklemeden devralır).
+    """
+    stop.set()
+    _wakeup.set()
+    started = time.monotonic()
+    ids = {wid for _, wid in consumers}
+    with _current_lock:
+        in_flight = sum(1 for wid in _current_jobs if wid in ids)
+
+    end = started + max(0.0, float(deadline_seconds))
+    for t, _ in consumers:
+        t.join(timeout=max(0.0, end - time.monotonic()))
+
+    with _current_lock:
+        unfinished = [job for wid, job in _current_jobs.items() if wid in ids]
+
+    handed_back = 0
+    if unfinished:
+        with Session(engine) as session:
+            for job in unfinished:
+                try:
+                    if generation_job_repo.hand_back(session, job.id, f"drained on shutdown ({label})"):
+                        handed_back += 1
+                except Exception:
+                    log.exception("Job %s hand back failed", job.id)
+
+    counts = {
+        "in_flight": in_flight,
+        "completed": in_flight - len(unfinished),
+        "handed_back": handed_back,
+    }
+    log.info(
+        "Generation drain (%s): in_flight=%d completed=%d handed_back=%d waited=%.1fs",
+        label,
+        counts["in_flight"],
+        counts["completed"],
+        counts["handed_back"],
+        time.monotonic() - started,
+    )
+    return counts
+
+
+def worker_id_prefix() -> str:
+    return f"{os.uname().nodename if hasattr(os, 'uname') else 'host'}:{os.getpid()}"
+
+
+# -------------------------
+# Web süreci içi tüketiciler
+# -------------------------
+_inline_stop = threading.Event()
+_inline_consumers: List[Tuple[threading.Thread, str]] = []
+
+
+def start_inline_consumers() -> int:
+    n = max(0, int(settings.generation_inline_workers or 0))
+    if n == 0 or _inline_consumers:
+        return 0
+    _inline_stop.clear()
+    prefix = worker_id_prefix()
+    for i in range(n):
+        wid = f"{prefix}:web-{i}-{uuid.uuid4().hex[:6]}"
+        t = threading.Thread(target=run_consumer, args=(_inline_stop, wid), name=f"gen-consumer-{i}", daemon=True)
+        t.start()
+        _inline_consumers.append((t, wid))
+    log.info("Started %d inline generation consumers", n)
+    return n
+
+
+def stop_inline_consumers(deadline_seconds: Optional[float] = None) -> Dict[str, int]:
+    if deadline_seconds is None:
+        deadline_seconds = float(settings.generation_drain_seconds)
+    counts = drain_consumers(_inline_stop, list(_inline_consumers), deadline_seconds=deadline_seconds, label="web")
+    _inline_consumers.clear()
+    return counts
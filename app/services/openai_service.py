@@ -1,14 +1,24 @@
 # app/services/openai_service.py
 from __future__ import annotations
 
+import asyncio
 import base64
 import json
+import logging
 import os
 import re
+import threading
+import time
+import weakref
+from collections import OrderedDict
+from contextlib import asynccontextmanager, contextmanager
+from concurrent.futures import FIRST_EXCEPTION, ThreadPoolExecutor, wait
+from dataclasses import dataclass, field
 from datetime import date, timedelta
-from typing import List, Dict, Any, Optional, Callable, TypeVar, cast
+from typing import List, Dict, Any, Optional, Callable, Awaitable, AsyncIterator, Iterator, Tuple, TypeVar, cast
 
-from openai import OpenAI
+import httpx
+from openai import OpenAI, AsyncOpenAI, DefaultHttpxClient, DefaultAsyncHttpxClient
 
 # ✅ OpenAI error types (SDK v1)
 try:
@@ -39,6 +49,10 @@ except Exception:  # pragma: no cover
     InternalServerError = Exception
 
 from app.core.config import settings
+from app.services import ai_circuit, ai_ledger, ai_limiter, ai_retry, ai_usage, token_budget, vision_verdict_cache
+from app.services.storage import FIDELITY_HIGH, FIDELITY_LOW, vision_path
+
+log = logging.getLogger("lunaura.openai")
 
 
 # ============================================================
@@ -57,6 +71,18 @@ class AIServiceUnavailableError(AIServiceError):
     """Geçici servis problemi (timeout, bağlantı, 5xx, rate-limit vb.)."""
 
 
+class AIServiceSaturatedError(AIServiceUnavailableError):
+    """Model eşzamanlılık limiti dolu (kuyruk dolu / kuyruk süresi aşıldı); retry_after saniye sonra tekrar dene."""
+
+    def __init__(self, message: str, *, retry_after: float = 5.0) -> None:
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class AICircuitOpenError(AIServiceSaturatedError):
+    """OpenAI circuit breaker açık (kesinti / quota); çağrı yapılmadan hemen reddedildi."""
+
+
 T = TypeVar("T")
 
 
@@ -87,42 +113,251 @@ def _extract_openai_error_code(err: Exception) -> str:
     return ""
 
 
-def _wrap_openai_errors(fn: Callable[[], T]) -> T:
+def _translate_openai_error(e: Exception) -> AIServiceError:
     """
-    OpenAI çağrılarını sarar:
+    OpenAI SDK hatasını domain hatasına çevirir:
     - insufficient_quota => AIInsufficientQuotaError
     - timeout/connection/5xx/429 => AIServiceUnavailableError
     - diğer => AIServiceError
+    Zaten domain hatasıysa (iç içe çağrı) olduğu gibi döner.
     """
-    try:
-        return fn()
+    if isinstance(e, AIServiceError):
+        return e
 
-    except RateLimitError as e:
+    if isinstance(e, ai_circuit.CircuitOpen):
+        return AICircuitOpenError(f"OpenAI geçici olarak devre dışı ({e.reason}).", retry_after=e.retry_after)
+
+    if isinstance(e, ai_limiter.LimiterSaturated):
+        return AIServiceSaturatedError(
+            f"OpenAI eşzamanlılık limiti dolu ({e.model}, {e.reason}).",
+            retry_after=e.retry_after,
+        )
+
+    if isinstance(e, RateLimitError):
         code = _extract_openai_error_code(e)
         if code == "insufficient_quota":
-            raise AIInsufficientQuotaError("OpenAI quota/billing yetersiz.") from e
-        raise AIServiceUnavailableError("OpenAI rate limit / geçici yoğunluk.") from e
+            return AIInsufficientQuotaError("OpenAI quota/billing yetersiz.")
+        return AIServiceUnavailableError("OpenAI rate limit / geçici yoğunluk.")
 
-    except (APITimeoutError, APIConnectionError) as e:
-        raise AIServiceUnavailableError("OpenAI bağlantı/timeout.") from e
+    if isinstance(e, (APITimeoutError, APIConnectionError)):
+        return AIServiceUnavailableError("OpenAI bağlantı/timeout.")
 
-    except APIStatusError as e:
+    if isinstance(e, APIStatusError):
         status = getattr(e, "status_code", None)
         if status in (500, 502, 503, 504):
-            raise AIServiceUnavailableError(f"OpenAI geçici servis hatası ({status}).") from e
-        raise AIServiceError(f"OpenAI status error ({status}).") from e
+            return AIServiceUnavailableError(f"OpenAI geçici servis hatası ({status}).")
+        return AIServiceError(f"OpenAI status error ({status}).")
+
+    if isinstance(e, (AuthenticationError, PermissionDeniedError)):
+        return AIServiceError("OpenAI authentication/permission hatası (API key/izin).")
+
+    if isinstance(e, (BadRequestError, UnprocessableEntityError, NotFoundError, ConflictError)):
+        return AIServiceError(f"OpenAI request hatası: {e}")
 
-    except (AuthenticationError, PermissionDeniedError) as e:
-        raise AIServiceError("OpenAI authentication/permission hatası (API key/izin).") from e
+    if isinstance(e, InternalServerError):
+        return AIServiceUnavailableError("OpenAI internal server error.")
 
-    except (BadRequestError, UnprocessableEntityError, NotFoundError, ConflictError) as e:
-        raise AIServiceError(f"OpenAI request hatası: {e}") from e
+    return AIServiceError(f"OpenAI beklenmeyen hata: {e}")
 
-    except InternalServerError as e:
-        raise AIServiceUnavailableError("OpenAI internal server error.") from e
 
+def _wrap_openai_errors(fn: Callable[[], T]) -> T:
+    """OpenAI çağrılarını sarar; hataları _translate_openai_error ile domain hatasına çevirir."""
+    try:
+        return fn()
+    except Exception as e:
+        err = _translate_openai_error(e)
+        if err is e:
+            raise
+        raise err from e
+
+
+async def _awrap_openai_errors(fn: Callable[[], Awaitable[T]]) -> T:
+    """_wrap_openai_errors'un async ikizi (AsyncOpenAI çağrıları için)."""
+    try:
+        return await fn()
     except Exception as e:
-        raise AIServiceError(f"OpenAI beklenmeyen hata: {e}") from e
+        err = _translate_openai_error(e)
+        if err is e:
+            raise
+        raise err from e
+
+
+def _is_throttle(e: Exception) -> bool:
+    return isinstance(e, RateLimitError) and _extract_openai_error_code(e) != "insufficient_quota"
+
+
+def _call_failed(limiter: ai_limiter.ModelLimiter, e: BaseException) -> None:
+    """Başarısız çağrıyı limiter'a (AIMD) ve circuit breaker'a bildirir."""
+    breaker = ai_circuit.breaker
+    if not isinstance(e, Exception):
+        breaker.on_neutral()
+        return
+    # Stream içinde hata domain hatasına çevrilmiş olabilir: asıl SDK hatasına bak
+    raw = e.__cause__ if isinstance(e, AIServiceError) and isinstance(e.__cause__, Exception) else e
+    if _is_throttle(raw):
+        limiter.on_throttle()
+        breaker.on_neutral()
+        return
+    err = _translate_openai_error(raw)
+    if isinstance(err, AIInsufficientQuotaError):
+        breaker.on_failure("quota")
+    elif isinstance(raw, APITimeoutError):
+        breaker.on_failure("timeout")
+    elif isinstance(err, AIServiceUnavailableError):
+        breaker.on_failure("unavailable")
+    else:
+        breaker.on_neutral()
+
+
+@contextmanager
+def _guarded_call(model: str) -> Iterator[None]:
+    """Circuit breaker (açıksa ms'de red) + model limiter slotu; sonuç ikisine de bildirilir."""
+    _wrap_openai_errors(ai_circuit.breaker.before_call)
+    limiter = ai_limiter.get_limiter(model)
+    try:
+        _wrap_openai_errors(limiter.acquire)
+    except BaseException:
+        ai_circuit.breaker.on_neutral()
+        raise
+    started = time.monotonic()
+    try:
+        yield
+    except BaseException as e:
+        _call_failed(limiter, e)
+        raise
+    else:
+        limiter.on_success()
+        ai_circuit.breaker.on_success()
+    finally:
+        limiter.release(time.monotonic() - started)
+
+
+@asynccontextmanager
+async def _aguarded_call(model: str) -> AsyncIterator[None]:
+    """_guarded_call'un async ikizi."""
+    _wrap_openai_errors(ai_circuit.breaker.before_call)
+    limiter = ai_limiter.get_limiter(model)
+    try:
+        await _awrap_openai_errors(limiter.aacquire)
+    except BaseException:
+        ai_circuit.breaker.on_neutral()
+        raise
+    started = time.monotonic()
+    try:
+        yield
+    except BaseException as e:
+        _call_failed(limiter, e)
+        raise
+    else:
+        limiter.on_success()
+        ai_circuit.breaker.on_success()
+    finally:
+        limiter.release(time.monotonic() - started)
+
+
+def _is_retryable(e: BaseException) -> bool:
+    """Geçici hata (timeout, bağlantı, 5xx, 429) tekrar denenir; limiter / breaker reddi ve quota denenmez."""
+    if isinstance(e, AIServiceSaturatedError):
+        return False
+    raw = e.__cause__ if isinstance(e, AIServiceError) and isinstance(e.__cause__, Exception) else e
+    if not isinstance(raw, Exception) or isinstance(raw, (ai_limiter.LimiterSaturated, ai_circuit.CircuitOpen)):
+        return False
+    err = _translate_openai_error(raw)
+    return isinstance(err, AIServiceUnavailableError) and not isinstance(err, AIServiceSaturatedError)
+
+
+def _call_outcome(e: BaseException) -> str:
+    if not isinstance(e, Exception):
+        return "cancelled"
+    raw = e.__cause__ if isinstance(e, AIServiceError) and isinstance(e.__cause__, Exception) else e
+    if isinstance(raw, APITimeoutError):
+        return "timeout"
+    if _is_throttle(raw):
+        return "rate_limited"
+    err = _translate_openai_error(raw)
+    if isinstance(err, AIInsufficientQuotaError):
+        return "quota"
+    if isinstance(err, AIServiceUnavailableError):
+        return "unavailable"
+    return "error"
+
+
+def _record_call(
+    model: str,
+    started: float,
+    *,
+    resp: Any = None,
+    error: Optional[BaseException] = None,
+    hop: Optional[int] = None,
+) -> None:
+    """Tek OpenAI çağrısı: aşama bazında token sayacı (ai_usage) + çağrı defteri (ai_ledger)."""
+    label = ai_retry.current_stage()
+    if error is None:
+        ai_usage.record(label, resp)
+        outcome = "incomplete" if getattr(resp, "status", None) == "incomplete" else "ok"
+    else:
+        outcome = _call_outcome(error)
+    ai_ledger.record(
+        label=label,
+        model=model,
+        latency_seconds=time.monotonic() - started,
+        outcome=outcome,
+        usage=getattr(resp, "usage", None),
+        response_id=getattr(resp, "id", None),
+        hop_n=hop,
+    )
+
+
+def _with_cache_key(kwargs: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    prompt_cache_key: aynı aşamanın istekleri aynı cache makinesine yönlendirilsin.
+    (SDK sürümünden bağımsız olsun diye extra_body ile gönderilir.)
+    """
+    extra = dict(kwargs.get("extra_body") or {})
+    extra.setdefault("prompt_cache_key", f"lunaura:{ai_retry.current_stage()}")
+    return {**kwargs, "extra_body": extra}
+
+
+def _create_response(client: OpenAI, **kwargs: Any) -> Any:
+    """
+    Tüm senkron responses.create çağrıları buradan geçer (circuit breaker + model limiter + retry).
+    Sadece bu çağrı tekrar edilir; her deneme limiter / breaker'dan yeniden geçer.
+    """
+    model = str(kwargs.get("model") or "")
+    kwargs = _with_cache_key(kwargs)
+
+    def _once() -> Any:
+        with _guarded_call(model):
+            # Gecikme limiter kuyruğu hariç, sadece API çağrısı
+            started = time.monotonic()
+            try:
+                resp = client.responses.create(**kwargs)
+            except BaseException as e:
+                _record_call(model, started, error=e)
+                raise
+            _record_call(model, started, resp=resp)
+            return resp
+
+    return ai_retry.call(_once, retryable=_is_retryable)
+
+
+async def _acreate_response(client: AsyncOpenAI, **kwargs: Any) -> Any:
+    """_create_response'un async ikizi (stream=True çağrıları _astream_text'te ayrıca korunur)."""
+    model = str(kwargs.get("model") or "")
+    kwargs = _with_cache_key(kwargs)
+
+    async def _once() -> Any:
+        async with _aguarded_call(model):
+            started = time.monotonic()
+            try:
+                resp = await client.responses.create(**kwargs)
+            except BaseException as e:
+                _record_call(model, started, error=e)
+                raise
+            _record_call(model, started, resp=resp)
+            return resp
+
+    return await ai_retry.acall(_once, retryable=_is_retryable)
 
 
 # ============================================================
@@ -138,15 +373,15 @@ def _require_key() -> str:
     return key
 
 
-def _make_client() -> OpenAI:
+def _client_options() -> Dict[str, Any]:
     """
     ✅ Railway / prod ortamında uzun yanıt ve ağ gecikmelerinde kopmayı azaltır.
     Env:
       OPENAI_TIMEOUT_SECONDS=90
-      OPENAI_MAX_RETRIES=2
+      OPENAI_MAX_RETRIES=0   (tekrarlar ai_retry politikasında; SDK tekrarı limiter / breaker'ı atlar)
     """
     timeout = getattr(settings, "openai_timeout_seconds", 90)
-    max_retries = getattr(settings, "openai_max_retries", 2)
+    max_retries = getattr(settings, "openai_max_retries", 0)
 
     try:
         timeout = int(timeout)
@@ -156,15 +391,135 @@ def _make_client() -> OpenAI:
     try:
         max_retries = int(max_retries)
     except Exception:
-        max_retries = 2
+        max_retries = 0
+
+    return {"api_key": _require_key(), "timeout": timeout, "max_retries": max_retries}
+
+
+# ============================================================
+# ✅ Process-wide pooled clients
+# Her çağrıda yeni OpenAI(...) = yeni httpx pool + yeni TLS handshake.
+# Bunun yerine süreç başına tek (thread-safe) client; async client event loop başına tek.
+# ============================================================
 
-    return OpenAI(
-        api_key=_require_key(),
-        timeout=timeout,
-        max_retries=max_retries,
+_client_lock = threading.Lock()
+_client: Optional[OpenAI] = None
+_client_http: Optional[httpx.Client] = None
+_async_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, tuple[AsyncOpenAI, httpx.AsyncClient]]" = (
+    weakref.WeakKeyDictionary()
+)
+
+
+def _http_limits() -> httpx.Limits:
+    """
+    Env:
+      OPENAI_MAX_CONNECTIONS=20
+      OPENAI_MAX_KEEPALIVE_CONNECTIONS=10
+      OPENAI_KEEPALIVE_EXPIRY_SECONDS=120
+    """
+    return httpx.Limits(
+        max_connections=max(1, int(settings.openai_max_connections)),
+        max_keepalive_connections=max(0, int(settings.openai_max_keepalive_connections)),
+        keepalive_expiry=float(settings.openai_keepalive_expiry_seconds),
     )
 
 
+def _make_client() -> OpenAI:
+    global _client, _client_http
+    if _client is not None:
+        return _client
+
+    with _client_lock:
+        if _client is None:
+            opts = _client_options()
+            _client_http = DefaultHttpxClient(limits=_http_limits())
+            _client = OpenAI(**opts, http_client=_client_http)
+    return _client
+
+
+def _make_async_client() -> AsyncOpenAI:
+    """httpx.AsyncClient bağlantıları oluşturulduğu event loop'a bağlıdır; loop başına bir client tutulur."""
+    loop = asyncio.get_running_loop()
+    entry = _async_clients.get(loop)
+    if entry is not None:
+        return entry[0]
+
+    with _client_lock:
+        entry = _async_clients.get(loop)
+        if entry is None:
+            opts = _client_options()
+            http_client = DefaultAsyncHttpxClient(limits=_http_limits())
+            entry = (AsyncOpenAI(**opts, http_client=http_client), http_client)
+            _async_clients[loop] = entry
+    return entry[0]
+
+
+def _pool_stats(http_client: Any) -> Dict[str, int]:
+    """httpx transport'undaki httpcore pool'dan açık/boşta bağlantı sayısı (best-effort)."""
+    try:
+        pool = http_client._transport._pool
+        conns = list(getattr(pool, "connections", []) or [])
+    except Exception:
+        return {"open": 0, "idle": 0}
+
+    idle = 0
+    for c in conns:
+        try:
+            if c.is_idle():
+                idle += 1
+        except Exception:
+            pass
+    return {"open": len(conns), "idle": idle}
+
+
+def openai_pool_stats() -> Dict[str, Any]:
+    """Monitoring için pool durumu (admin endpoint'i kullanır)."""
+    limits = _http_limits()
+    sync_stats = _pool_stats(_client_http) if _client_http is not None else {"open": 0, "idle": 0}
+    async_stats = {"open": 0, "idle": 0}
+    for _, http_client in list(_async_clients.values()):
+        st = _pool_stats(http_client)
+        async_stats["open"] += st["open"]
+        async_stats["idle"] += st["idle"]
+
+    return {
+        "sync": {"initialized": _client is not None, **sync_stats},
+        "async": {"loops": len(_async_clients), **async_stats},
+        "limits": {
+            "max_connections": limits.max_connections,
+            "max_keepalive_connections": limits.max_keepalive_connections,
+            "keepalive_expiry": limits.keepalive_expiry,
+        },
+    }
+
+
+def _warmup_timeout() -> float:
+    return float(settings.openai_warmup_timeout_seconds)
+
+
+def warmup_openai_client() -> None:
+    """
+    Startup'ta sync client'ı oluşturur ve (OPENAI_WARMUP=true ise) ucuz bir istekle
+    TLS bağlantısını açar; ilk yorumda handshake beklenmez. Hata startup'ı bozmaz.
+    """
+    try:
+        client = _make_client()
+        if settings.openai_warmup:
+            client.with_options(max_retries=0, timeout=_warmup_timeout()).models.list()
+    except Exception as e:
+        log.warning("OpenAI sync client warmup failed: %s", e)
+
+
+async def awarmup_openai_client() -> None:
+    """warmup_openai_client'in async ikizi (server event loop'unda çalışmalı)."""
+    try:
+        client = _make_async_client()
+        if settings.openai_warmup:
+            await client.with_options(max_retries=0, timeout=_warmup_timeout()).models.list()
+    except Exception as e:
+        log.warning("OpenAI async client warmup failed: %s", e)
+
+
 def _text_model_name() -> str:
     m = (getattr(settings, "openai_model", "") or "").strip()
     if m:
@@ -182,15 +537,21 @@ def _vision_model_name() -> str:
 
 
 def _max_output_tokens(default: int = 2500) -> int:
+    """OPENAI_MAX_OUTPUT_TOKENS > 0 ise global override; değilse çağrı noktasının varsayılanı."""
     v = getattr(settings, "openai_max_output_tokens", None)
     try:
-        if v is None:
+        if v is None or int(v) <= 0:
             return int(default)
         return int(v)
     except Exception:
         return int(default)
 
 
+def _initial_tokens(product: str, variant: Optional[str], default: int) -> int:
+    """İlk çağrı bütçesi: override > öğrenilmiş dağılım (token_budget) > statik varsayılan."""
+    return token_budget.initial_tokens(product, variant, _max_output_tokens(default))
+
+
 def _clamp_tokens(x: int, lo: int = 256, hi: int = 6000) -> int:
     try:
         x = int(x)
@@ -206,11 +567,15 @@ def _normalize_path(p: str) -> str:
     return os.path.abspath(os.path.join(project_root, p))
 
 
-def _to_data_url(path: str) -> str:
-    abs_path = _normalize_path(path)
-    if not os.path.exists(abs_path):
-        raise FileNotFoundError(f"Image not found: {abs_path} (from: {path})")
+def _resolve_image_path(path: str, fidelity: str = FIDELITY_HIGH) -> str:
+    """Upload türevi (low: thumb, high: küçültülmüş) varsa onu, yoksa orijinali döndürür."""
+    p = vision_path(path, fidelity)
+    if p.exists():
+        return str(p)
+    return _normalize_path(path)
+
 
+def _encode_data_url(abs_path: str) -> str:
     lower = abs_path.lower()
     mime = "image/jpeg"
     if lower.endswith(".png"):
@@ -223,6 +588,84 @@ def _to_data_url(path: str) -> str:
     return f"data:{mime};base64,{b64}"
 
 
+# ✅ Encode edilmiş data URL LRU'su: aynı okumanın fotoğrafları süreç içinde bir kez okunup encode edilir.
+# Anahtar (disk path, mtime, size) -> dosya değişirse eski giriş kendiliğinden geçersizleşir;
+# thumb ve yüksek çözünürlüklü türev ayrı girişlerdir.
+_data_url_lock = threading.Lock()
+_data_url_cache: "OrderedDict[tuple[str, int, int], str]" = OrderedDict()
+_data_url_bytes = 0
+_data_url_stats: Dict[str, int] = {"hits": 0, "misses": 0, "evictions": 0}
+
+
+def _data_url_cache_limit() -> int:
+    try:
+        return max(0, int(getattr(settings, "vision_data_url_cache_bytes", 0) or 0))
+    except Exception:
+        return 0
+
+
+def _to_data_url(path: str, fidelity: str = FIDELITY_HIGH) -> str:
+    global _data_url_bytes
+
+    abs_path = _resolve_image_path(path, fidelity)
+    try:
+        st = os.stat(abs_path)
+    except FileNotFoundError:
+        raise FileNotFoundError(f"Image not found: {abs_path} (from: {path})")
+
+    key = (abs_path, st.st_mtime_ns, st.st_size)
+    with _data_url_lock:
+        cached = _data_url_cache.get(key)
+        if cached is not None:
+            _data_url_cache.move_to_end(key)
+            _data_url_stats["hits"] += 1
+            return cached
+        _data_url_stats["misses"] += 1
+
+    url = _encode_data_url(abs_path)
+
+    limit = _data_url_cache_limit()
+    if len(url) > limit:
+        return url
+
+    with _data_url_lock:
+        if key not in _data_url_cache:
+            _data_url_cache[key] = url
+            _data_url_bytes += len(url)
+        while _data_url_bytes > limit and _data_url_cache:
+            _, old = _data_url_cache.popitem(last=False)
+            _data_url_bytes -= len(old)
+            _data_url_stats["evictions"] += 1
+    return url
+
+
+def image_cache_stats() -> Dict[str, Any]:
+    """Monitoring için data URL cache durumu (admin endpoint'i kullanır)."""
+    with _data_url_lock:
+        return {
+            **_data_url_stats,
+            "entries": len(_data_url_cache),
+            "bytes": _data_url_bytes,
+            "max_bytes": _data_url_cache_limit(),
+        }
+
+
+def _image_inputs(image_paths: List[str], fidelity: str = FIDELITY_HIGH) -> List[Dict[str, Any]]:
+    """
+    fidelity=low: doğrulama (thumb + detail=low, görsel başına sabit ~85 token).
+    fidelity=high: gözlem / yorum (vision türevi + detail=high).
+    """
+    return [
+        {"type": "input_image", "image_url": _to_data_url(p, fidelity), "detail": fidelity}
+        for p in (image_paths or [])[:5]
+    ]
+
+
+async def _aimage_inputs(image_paths: List[str], fidelity: str = FIDELITY_HIGH) -> List[Dict[str, Any]]:
+    # Disk okuma + base64 event loop'u bloklamasın
+    return await asyncio.to_thread(_image_inputs, image_paths, fidelity)
+
+
 def _parse_json_object(text: str) -> Optional[dict]:
     if not text:
         return None
@@ -249,6 +692,27 @@ def _parse_json_object(text: str) -> Optional[dict]:
     return None
 
 
+def _json_schema_format(name: str, schema: Dict[str, Any]) -> Dict[str, Any]:
+    """Responses API structured output (strict): model çıktısı şemaya birebir uyar, metin taraması gerekmez."""
+    return {"format": {"type": "json_schema", "name": name, "schema": schema, "strict": True}}
+
+
+def _structured_output(resp: Any) -> Optional[dict]:
+    """
+    Strict şemalı yanıtın JSON'u. Sadece token limitinde kesilme / refusal durumunda None döner;
+    o durumda da eski metin taraması denenir (log'da görünsün diye uyarı yazılır).
+    """
+    raw = (getattr(resp, "output_text", "") or "").strip()
+    try:
+        obj = json.loads(raw)
+        if isinstance(obj, dict):
+            return obj
+    except Exception:
+        pass
+    log.warning("Structured output unparsable (status=%s)", getattr(resp, "status", None))
+    return _parse_json_object(raw)
+
+
 def _infer_spread_count(spread_type: str, selected_cards: List[str]) -> int:
     st = (spread_type or "").lower().strip()
 
@@ -282,23 +746,32 @@ def _next_14_days_lines_tr() -> str:
 # ✅ Text-only OpenAI call
 # ============================================================
 
+def _text_input(system: str, user: str) -> List[Dict[str, Any]]:
+    return [
+        {"role": "system", "content": [{"type": "input_text", "text": system}]},
+        {"role": "user", "content": [{"type": "input_text", "text": user}]},
+    ]
+
+
+def _require_output_text(resp: Any) -> str:
+    out = (resp.output_text or "").strip()
+    if not out:
+        raise RuntimeError("OpenAI boş yanıt döndü. (output_text empty)")
+    return out
+
+
 def call_openai_text(*, system: str, user: str, max_output_tokens: Optional[int] = None) -> str:
     client = _make_client()
     mot = _clamp_tokens(int(max_output_tokens or _max_output_tokens()))
 
     def _do() -> str:
-        resp = client.responses.create(
+        resp = _create_response(
+            client,
             model=_text_model_name(),
             max_output_tokens=mot,
-            input=[
-                {"role": "system", "content": [{"type": "input_text", "text": system}]},
-                {"role": "user", "content": [{"type": "input_text", "text": user}]},
-            ],
+            input=_text_input(system, user),
         )
-        out = (resp.output_text or "").strip()
-        if not out:
-            raise RuntimeError("OpenAI boş yanıt döndü. (output_text empty)")
-        return out
+        return _require_output_text(resp)
 
     return _wrap_openai_errors(_do)
 
@@ -313,159 +786,374 @@ _QUALITY_RULE = (
     "Her zaman net, yapıcı ve danışana faydalı bir yorum ver; belirsizlik içeren cümleler yazma."
 )
 
+
 # ============================================================
-# ✅ Truncation Guard (Numerology fix)
+# ✅ Prompt cache: statik prefix önce, isteğe özel veri en sonda
+# ============================================================
+# OpenAI otomatik prompt cache'i byte-byte aynı prefix'te çalışır. Bu yüzden her ürünün system
+# promptu modül yüklenirken bir kez kurulan sabit bir metindir (kurallar, biçim, _QUALITY_RULE);
+# tarih, 14 gün şablonu, ad, soru, kartlar vb. sadece user mesajında ve en sonda yer alır.
+# DİKKAT: cache ancak prompt >= 1024 token ise devreye girer (sonra 128 token'lık adımlarla).
+# Statik system promptları ~300-500 token; ilk çağrılar bu yüzden cache'lenmez. Isabet beklenen
+# yerler: previous_response_id devam hop'ları (önceki girdi + çıktı prefix'tir) ve uzun
+# kişisel veri taşıyan istekler (fusion). ai_usage "eligible" sayacı eşiği geçen çağrıları ayırır.
+
+def _system_prompt(*sections: str) -> str:
+    """Tüm ürünlerde aynı kurulum: boş olmayan statik bölümler + _QUALITY_RULE (isteğe özel veri YOK)."""
+    return "\n\n".join(part.strip() for part in sections if part and part.strip()) + "\n\n" + _QUALITY_RULE
+
+
+def _request_prompt(*sections: str, plan_days: bool = False) -> str:
+    """User mesajı: önce gün bazında değişen tarih bloğu, sonra isteğe özel alanlar."""
+    head = f"Bugün: {_today_str_tr()}"
+    if plan_days:
+        head += f"\n14 gün şablonu:\n{_next_14_days_lines_tr()}"
+    return "\n\n".join([head, *(part.strip() for part in sections if part and part.strip())])
+
 # ============================================================
+# ✅ Continuation (Responses API conversation state)
+# ============================================================
+# Yarım kalan yanıt, önceki metni tekrar göndermek yerine previous_response_id ile
+# sunucu tarafında devam ettirilir; devam hop'u sadece kısa bir talimat taşır.
+
+_NUMEROLOGY_CONTINUE_INSTRUCTION = (
+    "Metin yarım kaldı. KALDIĞIN YERDEN devam et; önceki cümleleri tekrar ETME. "
+    "14 günlük plan yazılmadıysa ekle, yazıldıysa tekrar yazma. "
+    "Düzgün bir sonuç paragrafı ile ve tamamlanmış bir cümle ile bitir."
+)
+
+_GENERIC_CONTINUE_INSTRUCTION = (
+    "Metin yarım kaldı. KALDIĞIN YERDEN devam et; önceki cümleleri tekrarlama. "
+    "Belirsizlik ifadesi ekleme. Metni tamamlanmış bir cümle ile bitir."
+)
 
 _SENTENCE_END_RE = re.compile(r"[.!?…][\"')\]]?\s*$")
 
 
-def _looks_truncated(text: str) -> bool:
-    t = (text or "").strip()
-    if not t:
-        return True
-    if len(t) < 300:
-        return True
-    last = t[-1]
-    if last in {",", ":", ";", "-", "(", "[", "—"}:
-        return True
-    if not _SENTENCE_END_RE.search(t):
-        return True
-    # Son satÄ±r kÄ±sa veya bitmemiÅŸse devam ettir.
-    last_line = t.splitlines()[-1].strip()
-    if len(last_line) < 20:
-        return True
-    if not _SENTENCE_END_RE.search(last_line):
-        return True
-    return False
-
-
-def _numerology_continue_user(prev_text: str) -> str:
-    return f"""
-Aşağıdaki numeroloji metni daha önce üretildi ancak muhtemelen YARIM kaldı.
-Görev:
-- KALDIĞIN YERDEN devam et.
-- Önceki cümleleri tekrar ETME.
-- Metni düzgün bir sonuç paragrafı ile bitir.
-- En sonda 14 günlük plan zaten yazıldıysa tekrar yazma; yazılmadıysa ekle.
-- Mutlaka TAMAMLanmış cümle ile bitir (sonu nokta olsun).
-
-[ŞU ANA KADARKİ METİN]
-{prev_text}
-
-DEVAM:
-""".strip()
-
-
-def _reading_continue_user_generic(prev_text: str) -> str:
-    """Genel yorum metni yarım kaldıysa devam ettirmek için (tarot, birthchart, synastry, el falı vb.)."""
-    return f"""
-Aşağıdaki yorum metni yarım kalmış. Görev:
-- KALDIĞIN YERDEN devam et; önceki cümleleri tekrarlama.
-- Metni mutlaka tamamlanmış bir cümle ile bitir (sonu nokta olsun).
-- Belirsizlik ifadesi ekleme ("net yorum yapılamayabilir" vb. yasak).
-
-[ŞU ANA KADARKİ METİN]
-{prev_text}
-
-DEVAM:
-""".strip()
+def _is_truncated(resp: Any) -> bool:
+    """Yanıt token limiti yüzünden kesildiyse True (içerik filtresi devam ettirilmez)."""
+    if getattr(resp, "status", None) != "incomplete":
+        return False
+    details = getattr(resp, "incomplete_details", None)
+    return getattr(details, "reason", None) != "content_filter"
 
 
-def _stitch_with_guard(
+def _continue_input(instruction: str) -> List[Dict[str, Any]]:
+    return [{"role": "user", "content": [{"type": "input_text", "text": instruction}]}]
+
+
+def _log_hop(hop: int, resp: Any) -> None:
+    usage = getattr(resp, "usage", None)
+    details = getattr(resp, "incomplete_details", None)
+    log.info(
+        "openai hop=%d id=%s status=%s reason=%s input_tokens=%s cached_tokens=%s output_tokens=%s",
+        hop,
+        getattr(resp, "id", None),
+        getattr(resp, "status", None),
+        getattr(details, "reason", None),
+        getattr(usage, "input_tokens", None),
+        getattr(getattr(usage, "input_tokens_details", None), "cached_tokens", None),
+        getattr(usage, "output_tokens", None),
+    )
+
+
+def _append_continuation(out: str, nxt: str) -> str:
+    """Cümle bitmişse paragraf arası; cümle ortasında kesildiyse ham metin olduğu gibi eklenir."""
+    if _SENTENCE_END_RE.search(out):
+        return out.rstrip() + "\n\n" + nxt.lstrip()
+    return out + nxt
+
+
+def _finalize_stitched(out: str) -> str:
+    return re.sub(r"\n{3,}", "\n\n", out).strip()
+
+
+@dataclass
+class CallBudget:
+    """Paralel aşamaların paylaştığı son tarih (time.monotonic) + iptal bayrağı."""
+
+    deadline: float
+    cancel: threading.Event = field(default_factory=threading.Event)
+
+    def request_options(self) -> Dict[str, Any]:
+        """Her çağrıdan önce: iptal/süre dolduysa hata, değilse kalan süreyle sınırlı timeout."""
+        if self.cancel.is_set():
+            raise AIServiceUnavailableError("İşlem iptal edildi.")
+        remaining = self.deadline - time.monotonic()
+        if remaining <= 0:
+            raise AIServiceUnavailableError("AI işlemi zaman aşımına uğradı.")
+        return {"timeout": min(float(_client_options()["timeout"]), remaining)}
+
+
+def _budget_options(budget: Optional[CallBudget]) -> Dict[str, Any]:
+    return budget.request_options() if budget is not None else {}
+
+
+def _output_tokens(resp: Any) -> int:
+    return int(getattr(getattr(resp, "usage", None), "output_tokens", 0) or 0)
+
+
+def _observe_budget(budget_key: Optional[Tuple[str, str]], produced: int, hops: int) -> None:
+    """Yorumun toplam output token'ı ve devam hop sayısı token_budget controller'ına."""
+    if budget_key is not None:
+        token_budget.observe(budget_key[0], budget_key[1], output_tokens=produced, hops=hops)
+
+
+def _continue_response(
+    client: OpenAI,
+    resp: Any,
     *,
-    system: str,
-    initial_user: str,
-    initial_tokens: int,
+    model: str,
+    instruction: str,
     continue_tokens: int,
-    max_hops: int = 2,
+    max_hops: int,
+    budget: Optional[CallBudget] = None,
+    budget_key: Optional[Tuple[str, str]] = None,
 ) -> str:
-    out = call_openai_text(system=system, user=initial_user, max_output_tokens=initial_tokens).strip()
+    _require_output_text(resp)
+    out = resp.output_text
+    _log_hop(0, resp)
+    produced, hops = _output_tokens(resp), 0
 
-    for _ in range(max_hops):
-        if not _looks_truncated(out):
+    for hop in range(1, max_hops + 1):
+        if not _is_truncated(resp):
             break
-
-        cont_user = _numerology_continue_user(out)
-        nxt = call_openai_text(system=system, user=cont_user, max_output_tokens=continue_tokens).strip()
-        if not nxt:
+        with ai_ledger.hop(hop):
+            resp = _create_response(
+                client,
+                model=model,
+                max_output_tokens=_clamp_tokens(continue_tokens),
+                previous_response_id=resp.id,
+                input=_continue_input(instruction),
+                **_budget_options(budget),
+            )
+        _log_hop(hop, resp)
+        produced, hops = produced + _output_tokens(resp), hop
+        nxt = resp.output_text or ""
+        if not nxt.strip():
             break
+        out = _append_continuation(out, nxt)
 
-        if not out.endswith("\n"):
-            out += "\n\n"
-        out += nxt
+    _observe_budget(budget_key, produced, hops)
+    return _finalize_stitched(out)
 
-    out = re.sub(r"\n{3,}", "\n\n", out).strip()
-    return out
 
-
-def _stitch_with_guard_generic(
+def _stitch_with_guard(
     *,
     system: str,
     initial_user: str,
     initial_tokens: int,
     continue_tokens: int,
     max_hops: int = 2,
+    instruction: str = _GENERIC_CONTINUE_INSTRUCTION,
+    budget_key: Optional[Tuple[str, str]] = None,
+    budget: Optional[CallBudget] = None,
 ) -> str:
-    """Yarım kalan genel yorumları (tarot, birthchart, synastry, el vb.) devam ettirir."""
-    out = call_openai_text(system=system, user=initial_user, max_output_tokens=initial_tokens).strip()
-    for _ in range(max_hops):
-        if not _looks_truncated(out):
-            break
-        cont_user = _reading_continue_user_generic(out)
-        nxt = call_openai_text(system=system, user=cont_user, max_output_tokens=continue_tokens).strip()
-        if not nxt:
-            break
-        if not out.endswith("\n"):
-            out += "\n\n"
-        out += nxt
-    out = re.sub(r"\n{3,}", "\n\n", out).strip()
-    return out
+    client = _make_client()
+    model = _text_model_name()
+
+    def _do() -> str:
+        resp = _create_response(
+            client,
+            model=model,
+            max_output_tokens=_clamp_tokens(initial_tokens),
+            input=_text_input(system, initial_user),
+            **_budget_options(budget),
+        )
+        return _continue_response(
+            client,
+            resp,
+            model=model,
+            instruction=instruction,
+            continue_tokens=continue_tokens,
+            max_hops=max_hops,
+            budget_key=budget_key,
+            budget=budget,
+        )
+
+    return _wrap_openai_errors(_do)
 
 
 # ============================================================
 # Coffee (vision)
 # ============================================================
 
+_COFFEE_IMAGE_CRITERIA = (
+    "Uygun (ok=true): kahve fincanının İÇİ görünür + telve izleri/lekeleri bariz.\n"
+    "Uygun değil (ok=false): kimlik, evrak, ekran görüntüsü, manzara, insan yüzü, yemek, ürün, fincan dışı görüntü vb.\n\n"
+    "Kural: Görsellerin en az 1 tanesi bile kahve fincanı içi değilse ok=false.\n"
+)
+
+_COFFEE_VALIDATION_PROMPT = (
+    "Sen bir görüntü doğrulama asistanısın.\n"
+    "Görev: YÜKLENEN GÖRSELLER kahve falı için uygun mu?\n\n"
+    f"{_COFFEE_IMAGE_CRITERIA}"
+    "reason: en fazla 12 kelimelik kısa açıklama. confidence: 0-1."
+)
+
+# ✅ Doğrulama kararı: strict JSON şeması (ok / reason / confidence); cevap ~30 token
+_VERDICT_SCHEMA: Dict[str, Any] = {
+    "type": "object",
+    "properties": {
+        "ok": {"type": "boolean"},
+        "reason": {"type": "string"},
+        "confidence": {"type": "number"},
+    },
+    "required": ["ok", "reason", "confidence"],
+    "additionalProperties": False,
+}
+_VERDICT_FORMAT = _json_schema_format("image_verdict", _VERDICT_SCHEMA)
+_VERDICT_MAX_TOKENS = 120
+
+
+def _parse_verdict(obj: Optional[dict], *, unparsed_reason: str, rejected_reason: str) -> Dict[str, Any]:
+    if not obj:
+        return {"ok": False, "reason": unparsed_reason, "confidence": 0.0}
+
+    ok = bool(obj.get("ok", False))
+    reason = str(obj.get("reason", "")).strip() or ("Uygun" if ok else rejected_reason)
+    conf = obj.get("confidence", 0.5)
+    try:
+        conf = float(conf)
+    except Exception:
+        conf = 0.5
+
+    return {"ok": ok, "reason": reason, "confidence": conf}
+
+
+def _parse_coffee_verdict(obj: Optional[dict]) -> Dict[str, Any]:
+    return _parse_verdict(
+        obj,
+        unparsed_reason="Görseller doğrulanamadı. Lütfen fincan içi fotoğraf yükleyin.",
+        rejected_reason="Görseller kahve fincanı içi değil.",
+    )
+
+
 def validate_coffee_images(image_paths: List[str]) -> Dict[str, Any]:
+    version = vision_verdict_cache.prompt_version(_COFFEE_VALIDATION_PROMPT, _vision_model_name())
+    key = vision_verdict_cache.verdict_key("coffee", version, (image_paths or [])[:5])
+    cached = vision_verdict_cache.get(key)
+    if cached is not None:
+        return cached
+
     client = _make_client()
-    images = [{"type": "input_image", "image_url": _to_data_url(p)} for p in (image_paths or [])[:5]]
-
-    prompt = (
-        "Sen bir görüntü doğrulama asistanısın.\n"
-        "Görev: YÜKLENEN GÖRSELLER kahve falı için uygun mu?\n\n"
-        "Uygun (ok=true): kahve fincanının İÇİ görünür + telve izleri/lekeleri bariz.\n"
-        "Uygun değil (ok=false): kimlik, evrak, ekran görüntüsü, manzara, insan yüzü, yemek, ürün, fincan dışı görüntü vb.\n\n"
-        "Kural: Görsellerin en az 1 tanesi bile kahve fincanı içi değilse ok=false.\n"
-        "Sadece JSON döndür:\n"
-        '{"ok": true/false, "reason": "kısa açıklama", "confidence": 0-1}\n'
-        "JSON DIŞINDA hiçbir şey yazma."
-    )
+    images = _image_inputs(image_paths, FIDELITY_LOW)
 
     def _do() -> Dict[str, Any]:
-        resp = client.responses.create(
+        resp = _create_response(
+            client,
             model=_vision_model_name(),
-            max_output_tokens=400,  # ✅ küçük yeter (JSON)
-            input=[{"role": "user", "content": [{"type": "input_text", "text": prompt}, *images]}],
+            max_output_tokens=_VERDICT_MAX_TOKENS,
+            input=[{"role": "user", "content": [{"type": "input_text", "text": _COFFEE_VALIDATION_PROMPT}, *images]}],
+            text=_VERDICT_FORMAT,
         )
+        return _parse_coffee_verdict(_structured_output(resp))
 
-        raw = (resp.output_text or "").strip()
-        obj = _parse_json_object(raw)
+    with ai_retry.stage("coffee.validate"):
+        verdict = cast(Dict[str, Any], _wrap_openai_errors(_do))
+    vision_verdict_cache.put(key, kind="coffee", version=version, verdict=verdict)
+    return verdict
 
-        if not obj:
-            return {"ok": False, "reason": "Görseller doğrulanamadı. Lütfen fincan içi fotoğraf yükleyin.", "confidence": 0.0}
 
-        ok = bool(obj.get("ok", False))
-        reason = str(obj.get("reason", "")).strip() or ("Uygun" if ok else "Görseller kahve fincanı içi değil.")
-        conf = obj.get("confidence", 0.5)
-        try:
-            conf = float(conf)
-        except Exception:
-            conf = 0.5
+async def avalidate_coffee_images(image_paths: List[str]) -> Dict[str, Any]:
+    version = vision_verdict_cache.prompt_version(_COFFEE_VALIDATION_PROMPT, _vision_model_name())
+    key = await asyncio.to_thread(vision_verdict_cache.verdict_key, "coffee", version, (image_paths or [])[:5])
+    cached = await asyncio.to_thread(vision_verdict_cache.get, key)
+    if cached is not None:
+        return cached
+
+    client = _make_async_client()
+    images = await _aimage_inputs(image_paths, FIDELITY_LOW)
+
+    async def _do() -> Dict[str, Any]:
+        resp = await _acreate_response(
+            client,
+            model=_vision_model_name(),
+            max_output_tokens=_VERDICT_MAX_TOKENS,
+            input=[{"role": "user", "content": [{"type": "input_text", "text": _COFFEE_VALIDATION_PROMPT}, *images]}],
+            text=_VERDICT_FORMAT,
+        )
+        return _parse_coffee_verdict(_structured_output(resp))
+
+    with ai_retry.stage("coffee.validate"):
+        verdict = cast(Dict[str, Any], await _awrap_openai_errors(_do))
+    await asyncio.to_thread(vision_verdict_cache.put, key, kind="coffee", version=version, verdict=verdict)
+    return verdict
+
+
+# ✅ Tek geçiş (doğrula + yorumla): görseller tek vision çağrısında hem doğrulanır hem yorumlanır.
+# Karar ilk satırda düz metin olarak gelir; yorum uzun olduğundan JSON yerine bu biçim seçildi
+# (kesilirse previous_response_id ile devam ettirilebilir, JSON bozulmaz).
+_COFFEE_SINGLE_PASS_GATE = (
+    "ÖNCE görselleri doğrula.\n"
+    f"{_COFFEE_IMAGE_CRITERIA}"
+    "Yanıtının İLK SATIRI mutlaka şu ikisinden biri olsun:\n"
+    "KARAR: UYGUN\n"
+    "KARAR: UYGUN DEĞİL | kısa gerekçe\n"
+    "UYGUN DEĞİL ise başka hiçbir şey yazma. UYGUN ise ikinci satırdan itibaren falı yaz.\n\n"
+)
+
+_COFFEE_SINGLE_PASS_RE = re.compile(
+    r"^\s*\**\s*KARAR\s*:\s*(UYGUN\s+DE[ĞG][İIi]L|UYGUN)\b\s*\**\s*(?:[|:\-–]\s*(.*))?$",
+    re.IGNORECASE,
+)
+
+
+def _parse_coffee_single_pass(text: str) -> Optional[Dict[str, Any]]:
+    """KARAR satırını ayırır; biçim tutmazsa None (çağıran ayrı doğrulamaya düşer)."""
+    head, _, rest = (text or "").strip().partition("\n")
+    m = _COFFEE_SINGLE_PASS_RE.match(head.strip().rstrip("*"))
+    if not m:
+        return None
+    ok = re.search(r"DE[ĞG]", m.group(1), re.IGNORECASE) is None
+    reading = rest.strip() if ok else ""
+    if ok and not reading:
+        return None
+    reason = (m.group(2) or "").strip() or ("Uygun" if ok else "Görseller kahve fincanı içi değil.")
+    return {"ok": ok, "reason": reason, "reading": reading}
+
+
+_COFFEE_FORTUNE_RULES = (
+    "Sen deneyimli bir kahve falcısısın.\n"
+    "Ton: samimi, sıcak, falcı edasında.\n"
+    "Biçim: KESİNLİKLE madde işareti/numara/başlık yok.\n"
+    "Sadece düz yazı: 6-9 paragraf.\n\n"
+    "Kural-1: UYDURMA YOK. Sadece görselde gerçekten seçilebilen telve izlerine dayan.\n"
+    "Belirsizse 'tam seçilmiyor' de.\n"
+    "Kural-2: Kesin hüküm yok; olasılık dili.\n"
+    "Kural-3: Konu ve soruya en az 2 paragraf direkt cevap ver.\n"
+    "Kural-4: Korkutma yok.\n\n"
+    "Uzunluk: en az 750 kelime.\n"
+    "Dil: Türkçe.\n\n"
+    "İstek: Akıcı bir fal yaz. Listeleme yapma."
+)
+
+_COFFEE_FORTUNE_SYSTEM = _system_prompt(
+    _COFFEE_FORTUNE_RULES,
+    "Eğer görseller kahve fincanı içi değilse: sadece şu tek cümleyi yaz ve dur:\n"
+    "'Görseller kahve fincanı içi görünmüyor.'",
+)
+_COFFEE_SINGLE_PASS_SYSTEM = _system_prompt(_COFFEE_FORTUNE_RULES, _COFFEE_SINGLE_PASS_GATE)
 
-        return {"ok": ok, "reason": reason, "confidence": conf}
 
-    return cast(Dict[str, Any], _wrap_openai_errors(_do))
+def _coffee_fortune_prompts(
+    *,
+    name: str,
+    topic: str,
+    question: str,
+    relationship_status: Optional[str],
+    big_decision: Optional[str],
+    single_pass: bool = False,
+) -> tuple[str, str]:
+    system = _COFFEE_SINGLE_PASS_SYSTEM if single_pass else _COFFEE_FORTUNE_SYSTEM
+    user_text = _request_prompt(
+        f"Kullanıcı adı: {name}\n"
+        f"Konu: {topic}\n"
+        f"Soru: {question}\n"
+        f"İlişki durumu: {relationship_status or 'belirtilmedi'}\n"
+        f"Büyük karar: {big_decision or 'belirtilmedi'}"
+    )
+    return system, user_text
 
 
 def generate_fortune(
@@ -478,117 +1166,334 @@ def generate_fortune(
     big_decision: Optional[str] = None,
 ) -> str:
     client = _make_client()
-    images = [{"type": "input_image", "image_url": _to_data_url(p)} for p in (image_paths or [])[:5]]
-
-    system = (
-        "Sen deneyimli bir kahve falcısısın.\n"
-        "Ton: samimi, sıcak, falcı edasında.\n"
-        "Biçim: KESİNLİKLE madde işareti/numara/başlık yok.\n"
-        "Sadece düz yazı: 6-9 paragraf.\n\n"
-        "Kural-1: UYDURMA YOK. Sadece görselde gerçekten seçilebilen telve izlerine dayan.\n"
-        "Belirsizse 'tam seçilmiyor' de.\n"
-        "Kural-2: Kesin hüküm yok; olasılık dili.\n"
-        "Kural-3: Konu ve soruya en az 2 paragraf direkt cevap ver.\n"
-        "Kural-4: Korkutma yok.\n\n"
-        "Uzunluk: en az 750 kelime.\n"
-        "Dil: Türkçe.\n\n"
-        "Eğer görseller kahve fincanı içi değilse: sadece şu tek cümleyi yaz ve dur:\n"
-        "'Görseller kahve fincanı içi görünmüyor.'\n\n"
-        f"{_QUALITY_RULE}"
+    images = _image_inputs(image_paths)
+    system, user_text = _coffee_fortune_prompts(
+        name=name,
+        topic=topic,
+        question=question,
+        relationship_status=relationship_status,
+        big_decision=big_decision,
     )
 
-    user_text = (
-        f"Bugün: {_today_str_tr()}\n"
-        f"Kullanıcı adı: {name}\n"
-        f"Konu: {topic}\n"
-        f"Soru: {question}\n"
-        f"İlişki durumu: {relationship_status or 'belirtilmedi'}\n"
-        f"Büyük karar: {big_decision or 'belirtilmedi'}\n\n"
-        "İstek: Akıcı bir fal yaz. Listeleme yapma.\n"
+    def _do() -> str:
+        resp = _create_response(
+            client,
+            model=_vision_model_name(),
+            max_output_tokens=_clamp_tokens(_initial_tokens("coffee", topic, 2600), 256, 4000),
+            input=[
+                {"role": "system", "content": [{"type": "input_text", "text": system}]},
+                {"role": "user", "content": [{"type": "input_text", "text": user_text}, *images]},
+            ],
+        )
+        return _continue_response(
+            client,
+            resp,
+            model=_vision_model_name(),
+            instruction=_GENERIC_CONTINUE_INSTRUCTION,
+            continue_tokens=_max_output_tokens(1200),
+            max_hops=1,
+            budget_key=("coffee", topic),
+        )
+
+    return _wrap_openai_errors(_do)
+
+
+def validate_and_generate_fortune(
+    *,
+    name: str,
+    topic: str,
+    question: str,
+    image_paths: List[str],
+    relationship_status: Optional[str] = None,
+    big_decision: Optional[str] = None,
+) -> Dict[str, Any]:
+    """
+    Tek vision çağrısında doğrulama + kahve falı: {"ok", "reason", "reading"}.
+    Görseller daha önce doğrulandıysa (verdict cache) doğrudan generate_fortune çalışır.
+    """
+    version = vision_verdict_cache.prompt_version(_COFFEE_VALIDATION_PROMPT, _vision_model_name())
+    key = vision_verdict_cache.verdict_key("coffee", version, (image_paths or [])[:5])
+    cached = vision_verdict_cache.get(key)
+    if cached is not None:
+        reading = generate_fortune(
+            name=name,
+            topic=topic,
+            question=question,
+            image_paths=image_paths,
+            relationship_status=relationship_status,
+            big_decision=big_decision,
+        )
+        return {"ok": True, "reason": cached.get("reason") or "Uygun", "reading": reading}
+
+    client = _make_client()
+    images = _image_inputs(image_paths)
+    system, user_text = _coffee_fortune_prompts(
+        name=name,
+        topic=topic,
+        question=question,
+        relationship_status=relationship_status,
+        big_decision=big_decision,
+        single_pass=True,
     )
 
     def _do() -> str:
-        resp = client.responses.create(
+        resp = _create_response(
+            client,
             model=_vision_model_name(),
-            max_output_tokens=_clamp_tokens(_max_output_tokens(2600), 256, 4000),
+            max_output_tokens=_clamp_tokens(_initial_tokens("coffee", topic, 2600), 256, 4000),
             input=[
                 {"role": "system", "content": [{"type": "input_text", "text": system}]},
                 {"role": "user", "content": [{"type": "input_text", "text": user_text}, *images]},
             ],
         )
-        out = (resp.output_text or "").strip()
-        if not out:
-            raise RuntimeError("OpenAI boş yanıt döndü. (output_text empty)")
-        if _looks_truncated(out):
-            cont_user = _reading_continue_user_generic(out)
-            nxt = call_openai_text(system=system, user=cont_user, max_output_tokens=_max_output_tokens(1200))
-            if nxt and nxt.strip():
-                out = (out + "\n\n" + nxt.strip()).strip()
-                out = re.sub(r"\n{3,}", "\n\n", out)
-        return out
+        return _continue_response(
+            client,
+            resp,
+            model=_vision_model_name(),
+            instruction=_GENERIC_CONTINUE_INSTRUCTION,
+            continue_tokens=_max_output_tokens(1200),
+            max_hops=1,
+            budget_key=("coffee", topic),
+        )
 
-    return _wrap_openai_errors(_do)
+    out = _wrap_openai_errors(_do)
+    parsed = _parse_coffee_single_pass(out)
+    if parsed is None:
+        # KARAR satırı yoksa: küçük doğrulama çağrısı, metin zaten elimizde
+        log.warning("Coffee single-pass verdict line missing; validating separately")
+        verdict = validate_coffee_images(image_paths)
+        return {"ok": bool(verdict.get("ok")), "reason": verdict.get("reason"), "reading": out if verdict.get("ok") else ""}
+
+    if parsed["ok"]:
+        vision_verdict_cache.put(
+            key,
+            kind="coffee",
+            version=version,
+            verdict={"ok": True, "reason": parsed["reason"], "confidence": 1.0},
+        )
+    return parsed
 
 
 # ============================================================
 # Hand (vision)
 # ============================================================
 
+_HAND_VALIDATION_PROMPT = (
+    "Sen bir görüntü doğrulama denetçisisin.\n"
+    "Görev: Yüklenen görseller 'EL FALI' için uygun mu?\n\n"
+    "Uygun (ok=true): Avuç içi net (palm) + çizgiler görünür.\n"
+    "Uygun değil (ok=false): kimlik/ehliyet, yüz, ekran görüntüsü, belge, kahve fincanı, manzara, ürün.\n\n"
+    "Kural: En az 1 görsel avuç içi net değilse ok=false.\n"
+    "reason: en fazla 12 kelimelik kısa açıklama. confidence: 0-1."
+)
+
+_HAND_OBSERVATION_PROMPT = (
+    "Sen bir avuç içi GÖZLEMLEYİCİSİN. Fal yazmıyorsun.\n"
+    "Görev: Fotoğraflarda GERÇEKTEN gördüğün çizgi ve işaretleri şemaya göre özetle.\n"
+    "Uydurma yok. Emin değilsen 'unclear' seç.\n"
+    "notes alanları: en fazla 20 kelime, sadece gördüklerin. overall_notes: en fazla 40 kelime."
+)
+
+
+def _enum(*values: str) -> Dict[str, Any]:
+    return {"type": "string", "enum": list(values)}
+
+
+def _strict_object(**properties: Dict[str, Any]) -> Dict[str, Any]:
+    # strict mod: tüm alanlar required, ek alan yok
+    return {
+        "type": "object",
+        "properties": properties,
+        "required": list(properties),
+        "additionalProperties": False,
+    }
+
+
+_VISIBILITY = _enum("clear", "partial", "unclear")
+_DEPTH = _enum("deep", "medium", "shallow", "unclear")
+_BREAKS = _enum("none", "some", "unclear")
+_MOUNT = _enum("prominent", "normal", "flat", "unclear")
+_NOTES = {"type": "string"}
+
+# ✅ El gözlemi: eskiden düzyazıda tarif edilen şema, artık strict JSON şeması
+_HAND_OBSERVATION_SCHEMA = _strict_object(
+    photo_quality=_enum("good", "medium", "poor"),
+    visibility=_strict_object(
+        heart_line=_VISIBILITY,
+        head_line=_VISIBILITY,
+        life_line=_VISIBILITY,
+        fate_line=_VISIBILITY,
+    ),
+    heart_line=_strict_object(
+        depth=_DEPTH,
+        shape=_enum("curved", "straight", "unclear"),
+        breaks=_BREAKS,
+        notes=_NOTES,
+    ),
+    head_line=_strict_object(
+        length=_enum("long", "medium", "short", "unclear"),
+        shape=_enum("straight", "curved", "unclear"),
+        start=_enum("joined", "separate", "unclear"),
+        notes=_NOTES,
+    ),
+    life_line=_strict_object(
+        depth=_DEPTH,
+        continuity=_enum("continuous", "broken", "unclear"),
+        arc=_enum("wide", "narrow", "unclear"),
+        notes=_NOTES,
+    ),
+    fate_line=_strict_object(
+        presence=_enum("clear", "faint", "none", "unclear"),
+        breaks=_BREAKS,
+        notes=_NOTES,
+    ),
+    mounts=_strict_object(
+        venus=_MOUNT,
+        moon=_MOUNT,
+        jupiter=_MOUNT,
+        saturn=_MOUNT,
+        apollo=_MOUNT,
+        mercury=_MOUNT,
+    ),
+    special_marks={"type": "array", "items": _enum("star", "triangle", "cross", "island", "none", "unclear")},
+    overall_notes=_NOTES,
+)
+_HAND_OBSERVATION_FORMAT = _json_schema_format("hand_observation", _HAND_OBSERVATION_SCHEMA)
+# Enum'lar + kısa notlar: tipik çıktı ~300 token
+_HAND_OBSERVATION_MAX_TOKENS = 600
+
+
+_HAND_REJECTED_TEXT = "Görseller el fotoğrafı gibi görünmüyor."
+
+
+def _parse_hand_verdict(obj: Optional[dict]) -> Dict[str, Any]:
+    return _parse_verdict(
+        obj,
+        unparsed_reason="Görseller doğrulanamadı. Lütfen avuç içi net fotoğraf yükle.",
+        rejected_reason="Görseller el falı için uygun değil.",
+    )
+
+
 def validate_hand_images(image_paths: List[str]) -> Dict[str, Any]:
+    version = vision_verdict_cache.prompt_version(_HAND_VALIDATION_PROMPT, _vision_model_name())
+    key = vision_verdict_cache.verdict_key("hand", version, (image_paths or [])[:5])
+    cached = vision_verdict_cache.get(key)
+    if cached is not None:
+        return cached
+
     client = _make_client()
-    images = [{"type": "input_image", "image_url": _to_data_url(p)} for p in (image_paths or [])[:5]]
-
-    prompt = (
-        "Sen bir görüntü doğrulama denetçisisin.\n"
-        "Görev: Yüklenen görseller 'EL FALI' için uygun mu?\n\n"
-        "Uygun (ok=true): Avuç içi net (palm) + çizgiler görünür.\n"
-        "Uygun değil (ok=false): kimlik/ehliyet, yüz, ekran görüntüsü, belge, kahve fincanı, manzara, ürün.\n\n"
-        "Kural: En az 1 görsel avuç içi net değilse ok=false.\n"
-        "Sadece JSON döndür:\n"
-        '{"ok": true/false, "reason": "kısa açıklama", "confidence": 0-1}\n'
-        "JSON DIŞINDA hiçbir şey yazma."
-    )
+    images = _image_inputs(image_paths, FIDELITY_LOW)
 
     def _do() -> Dict[str, Any]:
-        resp = client.responses.create(
+        resp = _create_response(
+            client,
             model=_vision_model_name(),
-            max_output_tokens=400,
-            input=[{"role": "user", "content": [{"type": "input_text", "text": prompt}, *images]}],
+            max_output_tokens=_VERDICT_MAX_TOKENS,
+            input=[{"role": "user", "content": [{"type": "input_text", "text": _HAND_VALIDATION_PROMPT}, *images]}],
+            text=_VERDICT_FORMAT,
         )
-        raw = (resp.output_text or "").strip()
-        obj = _parse_json_object(raw)
+        return _parse_hand_verdict(_structured_output(resp))
 
-        if not obj:
-            return {"ok": False, "reason": "Görseller doğrulanamadı. Lütfen avuç içi net fotoğraf yükle.", "confidence": 0.0}
+    with ai_retry.stage("hand.validate"):
+        verdict = cast(Dict[str, Any], _wrap_openai_errors(_do))
+    vision_verdict_cache.put(key, kind="hand", version=version, verdict=verdict)
+    return verdict
 
-        ok = bool(obj.get("ok", False))
-        reason = str(obj.get("reason", "")).strip() or ("Uygun" if ok else "Görseller el falı için uygun değil.")
-        conf = obj.get("confidence", 0.5)
-        try:
-            conf = float(conf)
-        except Exception:
-            conf = 0.5
 
-        return {"ok": ok, "reason": reason, "confidence": conf}
+async def avalidate_hand_images(image_paths: List[str]) -> Dict[str, Any]:
+    version = vision_verdict_cache.prompt_version(_HAND_VALIDATION_PROMPT, _vision_model_name())
+    key = await asyncio.to_thread(vision_verdict_cache.verdict_key, "hand", version, (image_paths or [])[:5])
+    cached = await asyncio.to_thread(vision_verdict_cache.get, key)
+    if cached is not None:
+        return cached
 
-    return cast(Dict[str, Any], _wrap_openai_errors(_do))
+    client = _make_async_client()
+    images = await _aimage_inputs(image_paths, FIDELITY_LOW)
+
+    async def _do() -> Dict[str, Any]:
+        resp = await _acreate_response(
+            client,
+            model=_vision_model_name(),
+            max_output_tokens=_VERDICT_MAX_TOKENS,
+            input=[{"role": "user", "content": [{"type": "input_text", "text": _HAND_VALIDATION_PROMPT}, *images]}],
+            text=_VERDICT_FORMAT,
+        )
+        return _parse_hand_verdict(_structured_output(resp))
+
+    with ai_retry.stage("hand.validate"):
+        verdict = cast(Dict[str, Any], await _awrap_openai_errors(_do))
+    await asyncio.to_thread(vision_verdict_cache.put, key, kind="hand", version=version, verdict=verdict)
+    return verdict
 
 
-def _call_openai_vision_json(*, prompt: str, image_paths: List[str], max_output_tokens: int = 1400) -> Dict[str, Any]:
+def _call_openai_vision_json(
+    *,
+    prompt: str,
+    image_paths: List[str],
+    text_format: Dict[str, Any],
+    max_output_tokens: int,
+) -> Dict[str, Any]:
     client = _make_client()
-    images = [{"type": "input_image", "image_url": _to_data_url(p)} for p in (image_paths or [])[:5]]
+    images = _image_inputs(image_paths)
 
     def _do() -> Dict[str, Any]:
-        resp = client.responses.create(
+        resp = _create_response(
+            client,
             model=_vision_model_name(),
-            max_output_tokens=_clamp_tokens(max_output_tokens, 256, 2500),
+            max_output_tokens=_clamp_tokens(max_output_tokens, 64, 2500),
             input=[{"role": "user", "content": [{"type": "input_text", "text": prompt}, *images]}],
+            text=text_format,
         )
-        raw = (resp.output_text or "").strip()
-        obj = _parse_json_object(raw)
-        return obj or {}
+        return _structured_output(resp) or {}
+
+    with ai_retry.stage("hand.observe"):
+        return cast(Dict[str, Any], _wrap_openai_errors(_do))
+
+
+_HAND_FORTUNE_SYSTEM = _system_prompt(
+    "Sen çok deneyimli bir el falcısısın.\n"
+    "Dil: Türkçe.\n"
+    "Ton: samimi, sıcak, güven verici; mistik ama abartısız.\n"
+    "Biçim: KESİNLİKLE madde işareti/numara/başlık yok. Sadece düz yazı.\n"
+    "Uydurma yok: SADECE verilen GÖZLEM verisine dayan.\n"
+    "Kesin kehanet yok: olasılık dili.\n"
+    "Korkutma yok.",
+    "ZORUNLU ÇIKTI:\n"
+    "- En az 1200 kelime.\n"
+    "- 8–12 paragraf.\n"
+    "- Topic & Question'a en az 3 paragraf direkt cevap.\n"
+    "- Metin boyunca en az 6 kez 'gözlem net/partial/unclear' gibi referanslar yap.\n"
+    "- Sonda tek paragraf: 14 günlük mini plan (BUGÜNDEN başlayarak tarihli).\n"
+    "- Tarihler KESİNLİKLE sabit/örnek tarih olmayacak.",
+    "İstek: Kullanıcı mesajındaki GÖZLEM JSON'una dayanarak uzun ve derin bir el falı yaz.\n"
+    "Eğer bazı alanlar 'unclear/partial' ise bunu açıkça söyle.",
+)
 
-    return cast(Dict[str, Any], _wrap_openai_errors(_do))
+
+def _hand_fortune_prompts(
+    *,
+    name: str,
+    topic: str,
+    question: str,
+    obs: Dict[str, Any],
+    dominant_hand: Optional[str],
+    photo_hand: Optional[str],
+    relationship_status: Optional[str],
+    big_decision: Optional[str],
+) -> tuple[str, str]:
+    obs_text = json.dumps(obs, ensure_ascii=False)
+    user_text = _request_prompt(
+        f"İsim: {name}\n"
+        f"Konu: {topic}\n"
+        f"Soru: {question}\n"
+        f"Baskın el: {dominant_hand or 'belirtilmedi'}\n"
+        f"Fotoğraftaki el: {photo_hand or 'belirtilmedi'}\n"
+        f"İlişki durumu: {relationship_status or 'belirtilmedi'}\n"
+        f"Büyük karar: {big_decision or 'belirtilmedi'}",
+        f"[GÖZLEM JSON]\n{obs_text}",
+        plan_days=True,
+    )
+    return _HAND_FORTUNE_SYSTEM, user_text
 
 
 def generate_hand_fortune(
@@ -604,69 +1509,32 @@ def generate_hand_fortune(
 ) -> str:
     val = validate_hand_images(image_paths)
     if not val.get("ok", False):
-        return "Görseller el fotoğrafı gibi görünmüyor."
-
-    vision_prompt = (
-        "Sen bir avuç içi GÖZLEMLEYİCİSİN. Fal yazmıyorsun.\n"
-        "Görev: Fotoğraflarda GERÇEKTEN gördüğün çizgi ve işaretleri özetle.\n"
-        "Uydurma yok. Emin değilsen 'unclear' yaz.\n"
-        "Sadece JSON döndür. JSON dışında hiçbir şey yazma.\n\n"
-        "Şu şemaya uy:\n"
-        "{\n"
-        '  "photo_quality": "good/medium/poor",\n'
-        '  "visibility": {"heart_line":"clear/partial/unclear","head_line":"clear/partial/unclear","life_line":"clear/partial/unclear","fate_line":"clear/partial/unclear"},\n'
-        '  "heart_line": {"depth":"deep/medium/shallow/unclear","shape":"curved/straight/unclear","breaks":"none/some/unclear","notes":"..."},\n'
-        '  "head_line": {"length":"long/medium/short/unclear","shape":"straight/curved/unclear","start":"joined/separate/unclear","notes":"..."},\n'
-        '  "life_line": {"depth":"deep/medium/shallow/unclear","continuity":"continuous/broken/unclear","arc":"wide/narrow/unclear","notes":"..."},\n'
-        '  "fate_line": {"presence":"clear/faint/none/unclear","breaks":"none/some/unclear","notes":"..."},\n'
-        '  "mounts": {"venus":"prominent/normal/flat/unclear","moon":"prominent/normal/flat/unclear","jupiter":"prominent/normal/flat/unclear","saturn":"prominent/normal/flat/unclear","apollo":"prominent/normal/flat/unclear","mercury":"prominent/normal/flat/unclear"},\n'
-        '  "special_marks": ["star/triangle/cross/island/none/unclear"],\n'
-        '  "overall_notes": "Sadece gördüklerin"\n'
-        "}\n"
-    )
-
-    obs = _call_openai_vision_json(prompt=vision_prompt, image_paths=image_paths, max_output_tokens=1600)
-    obs_text = json.dumps(obs, ensure_ascii=False)
+        return _HAND_REJECTED_TEXT
 
-    system = (
-        "Sen çok deneyimli bir el falcısısın.\n"
-        "Dil: Türkçe.\n"
-        "Ton: samimi, sıcak, güven verici; mistik ama abartısız.\n"
-        "Biçim: KESİNLİKLE madde işareti/numara/başlık yok. Sadece düz yazı.\n"
-        "Uydurma yok: SADECE verilen GÖZLEM verisine dayan.\n"
-        "Kesin kehanet yok: olasılık dili.\n"
-        "Korkutma yok.\n\n"
-        "ZORUNLU ÇIKTI:\n"
-        "- En az 1200 kelime.\n"
-        "- 8–12 paragraf.\n"
-        "- Topic & Question'a en az 3 paragraf direkt cevap.\n"
-        "- Metin boyunca en az 6 kez 'gözlem net/partial/unclear' gibi referanslar yap.\n"
-        "- Sonda tek paragraf: 14 günlük mini plan (BUGÜNDEN başlayarak tarihli).\n"
-        "- Tarihler KESİNLİKLE sabit/örnek tarih olmayacak.\n\n"
-        f"{_QUALITY_RULE}"
+    obs = _call_openai_vision_json(
+        prompt=_HAND_OBSERVATION_PROMPT,
+        image_paths=image_paths,
+        text_format=_HAND_OBSERVATION_FORMAT,
+        max_output_tokens=_HAND_OBSERVATION_MAX_TOKENS,
     )
-
-    user_text = (
-        f"Bugün: {_today_str_tr()}\n"
-        f"14 gün şablonu:\n{_next_14_days_lines_tr()}\n\n"
-        f"İsim: {name}\n"
-        f"Konu: {topic}\n"
-        f"Soru: {question}\n"
-        f"Baskın el: {dominant_hand or 'belirtilmedi'}\n"
-        f"Fotoğraftaki el: {photo_hand or 'belirtilmedi'}\n"
-        f"İlişki durumu: {relationship_status or 'belirtilmedi'}\n"
-        f"Büyük karar: {big_decision or 'belirtilmedi'}\n\n"
-        "Aşağıdaki GÖZLEM JSON'una dayanarak uzun ve derin bir el falı yaz.\n"
-        "Eğer bazı alanlar 'unclear/partial' ise bunu açıkça söyle.\n\n"
-        f"[GÖZLEM JSON]\n{obs_text}\n"
+    system, user_text = _hand_fortune_prompts(
+        name=name,
+        topic=topic,
+        question=question,
+        obs=obs,
+        dominant_hand=dominant_hand,
+        photo_hand=photo_hand,
+        relationship_status=relationship_status,
+        big_decision=big_decision,
     )
 
-    return _stitch_with_guard_generic(
+    return _stitch_with_guard(
         system=system,
         initial_user=user_text,
-        initial_tokens=_max_output_tokens(3200),
+        initial_tokens=_initial_tokens("hand", topic, 3200),
         continue_tokens=_max_output_tokens(1200),
         max_hops=2,
+        budget_key=("hand", topic),
     )
 
 
@@ -674,7 +1542,180 @@ def generate_hand_fortune(
 # Tarot / Numerology / BirthChart / Personality / Synastry
 # ============================================================
 
-def generate_tarot_reading(
+@dataclass(frozen=True)
+class ReadingPrompt:
+    """Bir metin yorumunun promptları + token bütçesi (bloklayan ve stream yolu aynı spec'i kullanır)."""
+
+    system: str
+    user: str
+    initial_tokens: int
+    continue_tokens: int
+    max_hops: int = 2
+    continue_instruction: str = _GENERIC_CONTINUE_INSTRUCTION
+    # token_budget anahtarı (ürün, varyant); None ise bütçe öğrenilmez
+    budget_key: Optional[Tuple[str, str]] = None
+
+
+def _run_reading_prompt(prompt: ReadingPrompt, budget: Optional[CallBudget] = None) -> str:
+    return _stitch_with_guard(
+        system=prompt.system,
+        initial_user=prompt.user,
+        initial_tokens=prompt.initial_tokens,
+        continue_tokens=prompt.continue_tokens,
+        max_hops=prompt.max_hops,
+        instruction=prompt.continue_instruction,
+        budget=budget,
+        budget_key=prompt.budget_key,
+    )
+
+
+async def _astream_text(
+    *,
+    input: List[Dict[str, Any]],
+    max_output_tokens: int,
+    final: Dict[str, Any],
+    previous_response_id: Optional[str] = None,
+    hop: int = 0,
+) -> AsyncIterator[str]:
+    """Metin parçalarını yield eder; stream bitince son Response nesnesi final["response"]'a yazılır."""
+    client = _make_async_client()
+    mot = _clamp_tokens(int(max_output_tokens or _max_output_tokens()))
+    extra: Dict[str, Any] = {"previous_response_id": previous_response_id} if previous_response_id else {}
+
+    model = _text_model_name()
+
+    async def _open() -> Any:
+        return await client.responses.create(
+            **_with_cache_key(
+                {
+                    "model": model,
+                    "max_output_tokens": mot,
+                    "input": input,
+                    "stream": True,
+                    **extra,
+                }
+            )
+        )
+
+    # İlk parça gönderilmeden düşen stream tekrar açılır; metin akmaya başladıysa tekrar denenmez
+    retry = ai_retry.RetryState()
+    emitted = False
+    while True:
+        try:
+            # Slot (ve breaker sonucu) stream boyunca tutulur (bağlantı açık kaldıkça model kapasitesi kullanılıyor)
+            async with _aguarded_call(model):
+                started = time.monotonic()
+                try:
+                    stream = await _awrap_openai_errors(_open)
+                    try:
+                        async for event in stream:
+                            etype = getattr(event, "type", "")
+                            if etype == "response.output_text.delta":
+                                delta = getattr(event, "delta", "") or ""
+                                if delta:
+                                    emitted = True
+                                    yield delta
+                            elif etype in ("response.completed", "response.incomplete", "response.failed"):
+                                final["response"] = getattr(event, "response", None)
+                    except Exception as e:
+                        err = _translate_openai_error(e)
+                        if err is e:
+                            raise
+                        raise err from e
+                except BaseException as e:
+                    _record_call(model, started, error=e, hop=hop)
+                    raise
+                _record_call(model, started, resp=final.get("response"), hop=hop)
+            return
+        except Exception as e:
+            delay = retry.backoff(e) if not emitted and _is_retryable(e) else None
+            if delay is None:
+                raise
+        await asyncio.sleep(delay)
+
+
+def join_reading_chunks(chunks: List[str]) -> str:
+    """astream_reading parçalarını kalıcı metne çevirir (_run_reading_prompt ile aynı normalizasyon)."""
+    return _finalize_stitched("".join(chunks))
+
+
+async def astream_reading(prompt: ReadingPrompt) -> AsyncIterator[str]:
+    """
+    Yorumu Responses API stream'i ile parça parça üretir (SSE endpoint'i kullanır).
+    Yanıt token limitinde kesilirse previous_response_id ile devam hop'ları da stream edilir.
+    """
+    final: Dict[str, Any] = {}
+    out = ""
+    async for delta in _astream_text(
+        input=_text_input(prompt.system, prompt.user),
+        max_output_tokens=prompt.initial_tokens,
+        final=final,
+    ):
+        out += delta
+        yield delta
+
+    resp = final.get("response")
+    if resp is not None:
+        _log_hop(0, resp)
+    produced, hops = _output_tokens(resp), 0
+
+    for hop in range(1, prompt.max_hops + 1):
+        if resp is None or not _is_truncated(resp):
+            break
+        final = {}
+        sentence_done = bool(_SENTENCE_END_RE.search(out))
+        started = False
+        async for delta in _astream_text(
+            input=_continue_input(prompt.continue_instruction),
+            max_output_tokens=prompt.continue_tokens,
+            final=final,
+            previous_response_id=resp.id,
+            hop=hop,
+        ):
+            if not started:
+                started = True
+                if sentence_done:
+                    delta = "\n\n" + delta.lstrip()
+            out += delta
+            yield delta
+        resp = final.get("response")
+        if resp is not None:
+            _log_hop(hop, resp)
+        produced, hops = produced + _output_tokens(resp), hop
+        if not started:
+            break
+
+    _observe_budget(prompt.budget_key, produced, hops)
+
+
+_TAROT_SYSTEM = _system_prompt(
+    "Sen üst düzey, deneyimli bir Tarot yorumcususun.\n"
+    "Dil: Türkçe.\n"
+    "Ton: profesyonel, güven verici, sezgisel ama abartısız.",
+    "TEMEL KURALLAR:\n"
+    "- Tarot kesin kehanet değildir; olasılık dili kullan.\n"
+    "- Korkutma yok, sağlık/ölüm gibi ağır iddialar yok.\n"
+    "- Genel geçer cümlelerle geçiştirme yok; her şey soruya bağlanacak.",
+    "ZORUNLU YAPI (başlıklar kullan):\n"
+    "1) Genel Açılım Enerjisi (8-12 cümle)\n"
+    "2) Kart Kart Detaylı Yorum (tüm kartlar sırayla; her kart için 2-4 paragraf)\n"
+    "3) Kartlar Arası İlişki Analizi\n"
+    "4) Sorunun Özüne Net Cevap (en az 3 paragraf)\n"
+    "5) Gözden Kaçan Mesajlar / Bilinçaltı (1-2 paragraf)\n"
+    "6) Net Mesaj (5–7 cümle)\n"
+    "7) Önümüzdeki 14 Gün Mini Plan (BUGÜNDEN başlayarak tarihli)\n"
+    "8) Dikkat & Denge (2-4 cümle)\n"
+    "9) Kapanış",
+    "Uzunluk zorunluluğu: kullanıcı mesajındaki kelime aralığı.\n"
+    "Kısa/üstünkörü çıktı yasak.\n"
+    "14 günlük planda sabit/örnek tarih kullanma.",
+    "Notlar:\n"
+    "- Kartları pozisyon sırasına göre yorumla.\n"
+    "- Kart id'lerinden isim çıkaramıyorsan id üzerinden sembolik yorum yap.",
+)
+
+
+def build_tarot_prompt(
     *,
     name: str,
     age: Optional[int],
@@ -682,7 +1723,7 @@ def generate_tarot_reading(
     question: str,
     spread_type: str,
     selected_cards: List[str],
-) -> str:
+) -> ReadingPrompt:
     count = _infer_spread_count(spread_type, selected_cards)
 
     if count == 3:
@@ -698,107 +1739,162 @@ def generate_tarot_reading(
         token_default = 3600
         spread_label = "12 Kart Premium Açılımı (Genel Enerji…Kapanış)"
 
-    system = (
-        "Sen üst düzey, deneyimli bir Tarot yorumcususun.\n"
-        "Dil: Türkçe.\n"
-        "Ton: profesyonel, güven verici, sezgisel ama abartısız.\n\n"
-        "TEMEL KURALLAR:\n"
-        "- Tarot kesin kehanet değildir; olasılık dili kullan.\n"
-        "- Korkutma yok, sağlık/ölüm gibi ağır iddialar yok.\n"
-        "- Genel geçer cümlelerle geçiştirme yok; her şey soruya bağlanacak.\n\n"
-        "ZORUNLU YAPI (başlıklar kullan):\n"
-        "1) Genel Açılım Enerjisi (8-12 cümle)\n"
-        "2) Kart Kart Detaylı Yorum (tüm kartlar sırayla; her kart için 2-4 paragraf)\n"
-        "3) Kartlar Arası İlişki Analizi\n"
-        "4) Sorunun Özüne Net Cevap (en az 3 paragraf)\n"
-        "5) Gözden Kaçan Mesajlar / Bilinçaltı (1-2 paragraf)\n"
-        "6) Net Mesaj (5–7 cümle)\n"
-        "7) Önümüzdeki 14 Gün Mini Plan (BUGÜNDEN başlayarak tarihli)\n"
-        "8) Dikkat & Denge (2-4 cümle)\n"
-        "9) Kapanış\n\n"
-        f"Uzunluk zorunluluğu: {min_words}-{max_words} kelime.\n"
-        "Kısa/üstünkörü çıktı yasak.\n"
-        "14 günlük planda sabit/örnek tarih kullanma.\n\n"
-        f"{_QUALITY_RULE}"
-    )
-
-    user = (
-        f"Bugün: {_today_str_tr()}\n"
-        f"14 gün şablonu:\n{_next_14_days_lines_tr()}\n\n"
+    user = _request_prompt(
         f"Danışan: {name}{f' ({age})' if age is not None else ''}\n"
         f"Konu: {topic}\n"
         f"Soru: {question}\n"
         f"Açılım: {spread_type} -> {spread_label}\n"
-        f"Kartlar (id|R/U): {', '.join(selected_cards)}\n\n"
-        "Notlar:\n"
-        "- Kartları pozisyon sırasına göre yorumla.\n"
-        "- Kart id'lerinden isim çıkaramıyorsan id üzerinden sembolik yorum yap.\n"
+        f"Kartlar (id|R/U): {', '.join(selected_cards)}\n"
+        f"Uzunluk: {min_words}-{max_words} kelime.",
+        plan_days=True,
     )
 
-    return _stitch_with_guard_generic(
-        system=system,
-        initial_user=user,
-        initial_tokens=_max_output_tokens(token_default),
+    budget_key = ("tarot", str(count))
+    return ReadingPrompt(
+        system=_TAROT_SYSTEM,
+        user=user,
+        initial_tokens=_initial_tokens(*budget_key, token_default),
         continue_tokens=_max_output_tokens(1400),
         max_hops=2,
+        budget_key=budget_key,
     )
 
 
-def generate_numerology_reading(
+def generate_tarot_reading(
+    *,
+    name: str,
+    age: Optional[int],
+    topic: str,
+    question: str,
+    spread_type: str,
+    selected_cards: List[str],
+) -> str:
+    return _run_reading_prompt(
+        build_tarot_prompt(
+            name=name,
+            age=age,
+            topic=topic,
+            question=question,
+            spread_type=spread_type,
+            selected_cards=selected_cards,
+        )
+    )
+
+
+_NUMEROLOGY_SYSTEM = _system_prompt(
+    "Sen üst düzey profesyonel bir numeroloji analistisin.\n"
+    "Dil: Türkçe.\n"
+    "Ton: sıcak, güven verici, olgun ve danışman gibi.\n"
+    "Kesin kehanet yok; olasılık dili kullan.\n"
+    "Korkutma yok; sağlık/ölüm gibi ağır iddialar yok.\n"
+    "Boş genelleme yok: her paragraf kullanıcının verisine ve sorusuna bağlanacak.",
+    "BİÇİM KURALI:\n"
+    "- Liste/madde işareti/numaralandırma YOK.\n"
+    "- Sadece akıcı düz yazı.\n"
+    "- 10–14 paragraf.",
+    "ZORUNLU KALİTE:\n"
+    "- Doğum tarihinden yaşam yolu hesaplamasını metin içinde anlaşılır şekilde yap.\n"
+    "- 11/22/33 gibi master sayıları koru.\n"
+    "- Kullanıcının sorusuna en az 4 paragraf direkt cevap ver.\n"
+    "- Sonda tek paragrafta: 14 günlük mini plan (BUGÜNDEN başlayarak tarihli).\n"
+    "- Tarihler sabit/örnek olmayacak.\n"
+    "- Uzunluk: en az 1800 kelime hedefle.\n"
+    "- Metni mutlaka tamamlanmış bir cümleyle bitir (sonu nokta olsun).",
+    "İstek: Kullanıcı mesajındaki verilerle çok kapsamlı ve derin bir numeroloji analizi yaz.",
+)
+
+
+def build_numerology_prompt(
     *,
     name: str,
     birth_date: str,
     topic: str,
     question: Optional[str] = None,
-) -> str:
+) -> ReadingPrompt:
     q = (question or "").strip() or "Genel numeroloji yorumu istiyorum."
 
-    system = (
-        "Sen üst düzey profesyonel bir numeroloji analistisin.\n"
-        "Dil: Türkçe.\n"
-        "Ton: sıcak, güven verici, olgun ve danışman gibi.\n"
-        "Kesin kehanet yok; olasılık dili kullan.\n"
-        "Korkutma yok; sağlık/ölüm gibi ağır iddialar yok.\n"
-        "Boş genelleme yok: her paragraf kullanıcının verisine ve sorusuna bağlanacak.\n\n"
-        "BİÇİM KURALI:\n"
-        "- Liste/madde işareti/numaralandırma YOK.\n"
-        "- Sadece akıcı düz yazı.\n"
-        "- 10–14 paragraf.\n\n"
-        "ZORUNLU KALİTE:\n"
-        "- Doğum tarihinden yaşam yolu hesaplamasını metin içinde anlaşılır şekilde yap.\n"
-        "- 11/22/33 gibi master sayıları koru.\n"
-        "- Kullanıcının sorusuna en az 4 paragraf direkt cevap ver.\n"
-        "- Sonda tek paragrafta: 14 günlük mini plan (BUGÜNDEN başlayarak tarihli).\n"
-        "- Tarihler sabit/örnek olmayacak.\n"
-        "- Uzunluk: en az 1800 kelime hedefle.\n"
-        "- Metni mutlaka tamamlanmış bir cümleyle bitir (sonu nokta olsun).\n\n"
-        f"{_QUALITY_RULE}"
+    user = _request_prompt(
+        "Kullanıcı:\n"
+        f"- Ad: {name}\n"
+        f"- Doğum tarihi: {birth_date}\n"
+        f"- Konu: {topic}\n"
+        f"- Soru: {q}",
+        plan_days=True,
     )
 
-    user = f"""
-Bugün: {_today_str_tr()}
-14 gün şablonu:
-{_next_14_days_lines_tr()}
+    budget_key = ("numerology", topic)
+    return ReadingPrompt(
+        system=_NUMEROLOGY_SYSTEM,
+        user=user,
+        initial_tokens=_initial_tokens(*budget_key, 4200),
+        continue_tokens=_max_output_tokens(1800),
+        max_hops=3,
+        continue_instruction=_NUMEROLOGY_CONTINUE_INSTRUCTION,
+        budget_key=budget_key,
+    )
+
+
+def generate_numerology_reading(
+    *,
+    name: str,
+    birth_date: str,
+    topic: str,
+    question: Optional[str] = None,
+) -> str:
+    return _run_reading_prompt(
+        build_numerology_prompt(name=name, birth_date=birth_date, topic=topic, question=question)
+    )
 
-Kullanıcı:
-- Ad: {name}
-- Doğum tarihi: {birth_date}
-- Konu: {topic}
-- Soru: {q}
 
-İstek:
-Bu verilerle çok kapsamlı ve derin bir numeroloji analizi yaz.
-""".strip()
+_BIRTHCHART_SYSTEM = _system_prompt(
+    "Sen profesyonel bir astroloji yorum asistanısın.\n"
+    "Dil: Türkçe.\n"
+    "Ton: profesyonel, sıcak, motive edici; abartısız.\n"
+    "Kesin kader/kehanet dili yok; olasılık dili kullan.\n"
+    "Korkutma yok (sağlık/ölüm vb.).\n"
+    "Boş genelleme yok; her bölüm kullanıcı verisine ve konu/soruya bağlanacak.\n"
+    "Saat yoksa yükselen/ev/ASC iddiası yapma.\n"
+    "Çıktı Markdown başlıkları ile yapılandırılacak.",
+    "Doğum saati kritik notu:\n"
+    "- Doğum saati VERİLMİŞSE yorumlarda olasılık diliyle daha net vurgu yapabilirsin; kesinlik kurma.\n"
+    "- Doğum saati BİLİNMİYORSA yükselen/ev yerleşimleri gibi kesin teknik iddialar YAPMA.",
+    "Kurallar:\n"
+    "- En az 1200 kelime hedefle; ideal 1400-2200.\n"
+    "- Topic merkeze alınacak.\n"
+    "- Sağlık/ölüm gibi korkutucu kehanet yok.",
+)
 
-    initial_tokens = _max_output_tokens(4200)
-    continue_tokens = _max_output_tokens(1800)
 
-    return _stitch_with_guard(
-        system=system,
-        initial_user=user,
-        initial_tokens=initial_tokens,
-        continue_tokens=continue_tokens,
-        max_hops=3,
+def build_birthchart_prompt(
+    *,
+    name: str,
+    birth_date: str,
+    birth_time: Optional[str],
+    birth_city: str,
+    birth_country: str,
+    topic: str,
+    question: Optional[str] = None,
+) -> ReadingPrompt:
+    q = (question or "").strip() or "Genel doğum haritası yorumu istiyorum."
+
+    user = _request_prompt(
+        "Kullanıcı:\n"
+        f"- Ad: {name}\n"
+        f"- Doğum tarihi: {birth_date}\n"
+        f"- Doğum saati: {birth_time or 'Bilinmiyor'}\n"
+        f"- Doğum yeri: {birth_city}, {birth_country}\n"
+        f"- Konu: {topic}\n"
+        f"- Soru: {q}"
+    )
+
+    budget_key = ("birthchart", topic)
+    return ReadingPrompt(
+        system=_BIRTHCHART_SYSTEM,
+        user=user,
+        initial_tokens=_initial_tokens(*budget_key, 3800),
+        continue_tokens=_max_output_tokens(1600),
+        max_hops=2,
+        budget_key=budget_key,
     )
 
 
@@ -812,54 +1908,79 @@ def generate_birthchart_reading(
     topic: str,
     question: Optional[str] = None,
 ) -> str:
-    q = (question or "").strip() or "Genel doğum haritası yorumu istiyorum."
-    has_time = bool((birth_time or "").strip())
-
-    system = (
-        "Sen profesyonel bir astroloji yorum asistanısın.\n"
-        "Dil: Türkçe.\n"
-        "Ton: profesyonel, sıcak, motive edici; abartısız.\n"
-        "Kesin kader/kehanet dili yok; olasılık dili kullan.\n"
-        "Korkutma yok (sağlık/ölüm vb.).\n"
-        "Boş genelleme yok; her bölüm kullanıcı verisine ve konu/soruya bağlanacak.\n"
-        "Saat yoksa yükselen/ev/ASC iddiası yapma.\n"
-        "Çıktı Markdown başlıkları ile yapılandırılacak.\n\n"
-        f"{_QUALITY_RULE}"
+    return _run_reading_prompt(
+        build_birthchart_prompt(
+            name=name,
+            birth_date=birth_date,
+            birth_time=birth_time,
+            birth_city=birth_city,
+            birth_country=birth_country,
+            topic=topic,
+            question=question,
+        )
     )
 
-    time_note = (
-        "Doğum saati VERİLMİŞ. Yorumlarda olasılık diliyle daha net vurgu yapabilirsin; kesinlik kurma."
-        if has_time
-        else
-        "Doğum saati BİLİNMİYOR. Yükselen/ev yerleşimleri gibi kesin teknik iddialar YAPMA."
-    )
 
-    user = f"""
-Bugün: {_today_str_tr()}
+_PERSONALITY_FUSION_SYSTEM = _system_prompt(
+    "Sen elit seviyede bir 'BİRLEŞİK KİŞİLİK ANALİSTİ'sin.\n"
+    "Elindeki iki kaynaktan (Numeroloji + Doğum Haritası) bilgileri HARMANLAYIP TEK BİR PROFİL çıkaracaksın.\n"
+    "İki metni yan yana ekleme.\n"
+    "‘Numeroloji şöyle / astroloji böyle’ diye ayıran dil kullanma.\n"
+    "Aynı şeyi tekrarlama.\n"
+    "Kesin kehanet yok; korkutma yok.",
+    "Çıktı bölümleri:\n"
+    "1) Net özet\n"
+    "2) Entegre çekirdek profil\n"
+    "3) Duygusal düzen & stres\n"
+    "4) İlişki dinamikleri\n"
+    "5) Kariyer/para tarzı\n"
+    "6) Gölge çalışma planı (6 hafta)\n"
+    "7) 14 günlük mini plan (BUGÜNDEN başlayarak tarihli)\n"
+    "8) 90 günlük yol haritası\n"
+    "9) Kapanış",
+    "Uzunluk: 2600-3600 kelime.\n"
+    "14 günlük planda sabit/örnek tarih kullanma.\n"
+    "Dil: Türkçe.",
+    "İstek: Kullanıcı mesajının sonunda iki ayrı metin var "
+    "([NUMEROLOJİ METNİ], [DOĞUM HARİTASI METNİ]). Bunları harmanlayıp TEK bir birleşik analiz yaz.",
+)
 
-Kullanıcı:
-- Ad: {name}
-- Doğum tarihi: {birth_date}
-- Doğum saati: {birth_time or "Bilinmiyor"}
-- Doğum yeri: {birth_city}, {birth_country}
-- Konu: {topic}
-- Soru: {q}
 
-Kritik not:
-- {time_note}
+def build_personality_fusion_prompt(
+    *,
+    name: str,
+    birth_date: str,
+    birth_time: Optional[str],
+    birth_city: str,
+    birth_country: str,
+    topic: str,
+    question: Optional[str],
+    numerology_text: str,
+    birthchart_text: str,
+) -> ReadingPrompt:
+    q = (question or "").strip() or "Genel kişilik analizi istiyorum."
 
-Kurallar:
-- En az 1200 kelime hedefle; ideal 1400-2200.
-- Topic merkeze alınacak.
-- Sağlık/ölüm gibi korkutucu kehanet yok.
-""".strip()
+    user = _request_prompt(
+        "Kullanıcı:\n"
+        f"- Ad: {name}\n"
+        f"- Doğum tarihi: {birth_date}\n"
+        f"- Doğum saati: {birth_time or 'bilinmiyor'}\n"
+        f"- Doğum yeri: {birth_city}, {birth_country}\n"
+        f"- Konu: {topic}\n"
+        f"- Soru: {q}",
+        f"[NUMEROLOJİ METNİ]\n{numerology_text}",
+        f"[DOĞUM HARİTASI METNİ]\n{birthchart_text}",
+        plan_days=True,
+    )
 
-    return _stitch_with_guard_generic(
-        system=system,
-        initial_user=user,
-        initial_tokens=_max_output_tokens(3800),
+    budget_key = ("personality", topic)
+    return ReadingPrompt(
+        system=_PERSONALITY_FUSION_SYSTEM,
+        user=user,
+        initial_tokens=_initial_tokens(*budget_key, 3600),
         continue_tokens=_max_output_tokens(1600),
         max_hops=2,
+        budget_key=budget_key,
     )
 
 
@@ -875,60 +1996,33 @@ def generate_personality_fusion_reading(
     numerology_text: str,
     birthchart_text: str,
 ) -> str:
-    q = (question or "").strip() or "Genel kişilik analizi istiyorum."
-
-    system = (
-        "Sen elit seviyede bir 'BİRLEŞİK KİŞİLİK ANALİSTİ'sin.\n"
-        "Elindeki iki kaynaktan (Numeroloji + Doğum Haritası) bilgileri HARMANLAYIP TEK BİR PROFİL çıkaracaksın.\n"
-        "İki metni yan yana ekleme.\n"
-        "‘Numeroloji şöyle / astroloji böyle’ diye ayıran dil kullanma.\n"
-        "Aynı şeyi tekrarlama.\n"
-        "Kesin kehanet yok; korkutma yok.\n\n"
-        "Çıktı bölümleri:\n"
-        "1) Net özet\n"
-        "2) Entegre çekirdek profil\n"
-        "3) Duygusal düzen & stres\n"
-        "4) İlişki dinamikleri\n"
-        "5) Kariyer/para tarzı\n"
-        "6) Gölge çalışma planı (6 hafta)\n"
-        "7) 14 günlük mini plan (BUGÜNDEN başlayarak tarihli)\n"
-        "8) 90 günlük yol haritası\n"
-        "9) Kapanış\n\n"
-        "Uzunluk: 2600-3600 kelime.\n"
-        "14 günlük planda sabit/örnek tarih kullanma.\n"
-        "Dil: Türkçe.\n\n"
-        f"{_QUALITY_RULE}"
+    return _run_reading_prompt(
+        build_personality_fusion_prompt(
+            name=name,
+            birth_date=birth_date,
+            birth_time=birth_time,
+            birth_city=birth_city,
+            birth_country=birth_country,
+            topic=topic,
+            question=question,
+            numerology_text=numerology_text,
+            birthchart_text=birthchart_text,
+        )
     )
 
-    user = f"""
-Bugün: {_today_str_tr()}
-14 gün şablonu:
-{_next_14_days_lines_tr()}
-
-Kullanıcı:
-- Ad: {name}
-- Doğum tarihi: {birth_date}
-- Doğum saati: {birth_time or 'bilinmiyor'}
-- Doğum yeri: {birth_city}, {birth_country}
-- Konu: {topic}
-- Soru: {q}
-
-Aşağıda iki ayrı metin var. Bunları harmanlayıp TEK bir birleşik analiz yaz:
 
-[NUMEROLOJİ METNİ]
-{numerology_text}
+# ✅ Kişilik analizi fan-out: numeroloji ∥ doğum haritası -> füzyon.
+# İki alt yorum bağımsız; paylaşılan bir son tarihle paralel koşar, biri düşerse diğeri iptal edilir.
+_fanout_pool = ThreadPoolExecutor(max_workers=8, thread_name_prefix="ai-fanout")
 
-[DOĞUM HARİTASI METNİ]
-{birthchart_text}
-""".strip()
 
-    return _stitch_with_guard_generic(
-        system=system,
-        initial_user=user,
-        initial_tokens=_max_output_tokens(3600),
-        continue_tokens=_max_output_tokens(1600),
-        max_hops=2,
-    )
+def _timed_stage(stage: str, timings: Dict[str, float], fn: Callable[[], str]) -> str:
+    t0 = time.monotonic()
+    try:
+        with ai_retry.stage(f"personality.{stage}"):
+            return fn()
+    finally:
+        timings[stage] = round(time.monotonic() - t0, 2)
 
 
 def generate_personality_reading(
@@ -940,14 +2034,23 @@ def generate_personality_reading(
     birth_country: str,
     topic: str,
     question: Optional[str] = None,
+    numerology_text: Optional[str] = None,
+    birthchart_text: Optional[str] = None,
+    stage_results: Optional[Dict[str, str]] = None,
 ) -> str:
-    numerology_text = generate_numerology_reading(
-        name=name,
-        birth_date=birth_date,
-        topic=topic,
-        question=question,
-    )
-    birthchart_text = generate_birthchart_reading(
+    """
+    numerology_text / birthchart_text verilirse (aynı kişinin tamamlanmış yorumu)
+    o aşama üretilmez, metin doğrudan füzyona girer.
+    stage_results: biten alt aşamalar buraya yazılır; aynı dict ile tekrar çağrılınca
+    sadece eksik / başarısız aşamalar üretilir.
+    """
+    deadline_s = float(getattr(settings, "personality_deadline_seconds", 420) or 420)
+    budget = CallBudget(deadline=time.monotonic() + deadline_s)
+    timings: Dict[str, float] = {}
+    t0 = time.monotonic()
+
+    numerology_prompt = build_numerology_prompt(name=name, birth_date=birth_date, topic=topic, question=question)
+    birthchart_prompt = build_birthchart_prompt(
         name=name,
         birth_date=birth_date,
         birth_time=birth_time,
@@ -956,7 +2059,51 @@ def generate_personality_reading(
         topic=topic,
         question=question,
     )
-    return generate_personality_fusion_reading(
+
+    texts: Dict[str, str] = {}
+    if stage_results is None:
+        stage_results = {}
+    for stage, text in stage_results.items():
+        if (text or "").strip():
+            texts[stage] = text.strip()
+    if (numerology_text or "").strip():
+        texts["numerology"] = cast(str, numerology_text).strip()
+    if (birthchart_text or "").strip():
+        texts["birthchart"] = cast(str, birthchart_text).strip()
+
+    futures = {
+        stage: ai_retry.submit(_fanout_pool, _timed_stage, stage, timings, lambda p=prompt: _run_reading_prompt(p, budget))
+        for stage, prompt in (("numerology", numerology_prompt), ("birthchart", birthchart_prompt))
+        if stage not in texts
+    }
+    if texts:
+        log.info("personality reusing stages=%s", ",".join(sorted(texts)))
+
+    done, pending = wait(
+        futures.values(),
+        timeout=max(0.0, budget.deadline - time.monotonic()),
+        return_when=FIRST_EXCEPTION,
+    )
+    failed = [f for f in done if f.exception() is not None]
+    for stage, f in futures.items():
+        if f in done and f.exception() is None:
+            stage_results[stage] = f.result()
+    if failed or pending:
+        # Kalan aşama bir sonraki çağrısında durur; henüz başlamadıysa hiç başlamaz
+        budget.cancel.set()
+        for f in pending:
+            f.cancel()
+        log.warning(
+            "personality fan-out aborted failed=%d pending=%d timings=%s",
+            len(failed),
+            len(pending),
+            timings,
+        )
+        if failed:
+            raise cast(BaseException, failed[0].exception())
+        raise AIServiceUnavailableError("AI işlemi zaman aşımına uğradı.")
+
+    fusion_prompt = build_personality_fusion_prompt(
         name=name,
         birth_date=birth_date,
         birth_time=birth_time,
@@ -964,12 +2111,44 @@ def generate_personality_reading(
         birth_country=birth_country,
         topic=topic,
         question=question,
-        numerology_text=numerology_text,
-        birthchart_text=birthchart_text,
+        numerology_text=texts.get("numerology") or futures["numerology"].result(),
+        birthchart_text=texts.get("birthchart") or futures["birthchart"].result(),
     )
+    result = _timed_stage("fusion", timings, lambda: _run_reading_prompt(fusion_prompt, budget))
+
+    log.info(
+        "personality stages numerology=%.1fs birthchart=%.1fs fusion=%.1fs total=%.1fs",
+        timings.get("numerology", 0.0),
+        timings.get("birthchart", 0.0),
+        timings.get("fusion", 0.0),
+        time.monotonic() - t0,
+    )
+    return result
+
+
+_SYNASTRY_SYSTEM = _system_prompt(
+    "Sen elit seviyede bir SİNASTRİ (aşk uyumu) analistisin.\n"
+    "Yaklaşım: numeroloji + doğum haritası temaları.\n"
+    "İki kişiyi ayrı ayrı anlatıp yapıştırma; her bölümde iki kişiyi birlikte ele al.\n"
+    "Kesin kehanet yok; korkutma yok.",
+    "ÇIKTI ŞU YAPIYLA:\n"
+    "1) Özet + ilişkinin ana teması\n"
+    "2) Çekim/uyum profili\n"
+    "3) Duygusal tetikleyiciler + çözüm ritüelleri\n"
+    "4) İletişim dili örnekleri\n"
+    "5) Romantik kimya + sınırlar\n"
+    "6) Uzun vadeli uyum: para/aile/yaşam\n"
+    "7) Risk haritası: 6-10 risk + her risk için 1 önlem\n"
+    "8) 21 günlük ilişki planı (BUGÜNDEN itibaren gün gün; sabit tarih yok)\n"
+    "9) Kapanış",
+    "Doğum saati eksikse bunu belirt, yorumları daha genel kur.\n"
+    "Dil: Türkçe.\n"
+    "Uzunluk hedefi: 2200-3200 kelime.",
+    "İstek: Çok detaylı sinastri üret.",
+)
 
 
-def generate_synastry_reading(
+def build_synastry_prompt(
     *,
     name_a: str,
     birth_date_a: str,
@@ -983,55 +2162,63 @@ def generate_synastry_reading(
     birth_country_b: str,
     topic: str,
     question: Optional[str] = None,
-) -> str:
+) -> ReadingPrompt:
     q = (question or "").strip() or "Genel aşk uyumu analizi istiyorum."
 
-    system = (
-        "Sen elit seviyede bir SİNASTRİ (aşk uyumu) analistisin.\n"
-        "Yaklaşım: numeroloji + doğum haritası temaları.\n"
-        "İki kişiyi ayrı ayrı anlatıp yapıştırma; her bölümde iki kişiyi birlikte ele al.\n"
-        "Kesin kehanet yok; korkutma yok.\n\n"
-        "ÇIKTI ŞU YAPIYLA:\n"
-        "1) Özet + ilişkinin ana teması\n"
-        "2) Çekim/uyum profili\n"
-        "3) Duygusal tetikleyiciler + çözüm ritüelleri\n"
-        "4) İletişim dili örnekleri\n"
-        "5) Romantik kimya + sınırlar\n"
-        "6) Uzun vadeli uyum: para/aile/yaşam\n"
-        "7) Risk haritası: 6-10 risk + her risk için 1 önlem\n"
-        "8) 21 günlük ilişki planı (BUGÜNDEN itibaren gün gün; sabit tarih yok)\n"
-        "9) Kapanış\n\n"
-        "Doğum saati eksikse bunu belirt, yorumları daha genel kur.\n"
-        "Dil: Türkçe.\n"
-        "Uzunluk hedefi: 2200-3200 kelime.\n\n"
-        f"{_QUALITY_RULE}"
+    user = _request_prompt(
+        f"Konu: {topic}\n"
+        f"Soru: {q}",
+        "Partner A:\n"
+        f"- Ad: {name_a}\n"
+        f"- Doğum: {birth_date_a}\n"
+        f"- Saat: {birth_time_a or 'bilinmiyor'}\n"
+        f"- Yer: {birth_city_a}, {birth_country_a}",
+        "Partner B:\n"
+        f"- Ad: {name_b}\n"
+        f"- Doğum: {birth_date_b}\n"
+        f"- Saat: {birth_time_b or 'bilinmiyor'}\n"
+        f"- Yer: {birth_city_b}, {birth_country_b}",
     )
 
-    user = f"""
-Bugün: {_today_str_tr()}
-
-Konu: {topic}
-Soru: {q}
-
-Partner A:
-- Ad: {name_a}
-- Doğum: {birth_date_a}
-- Saat: {birth_time_a or "bilinmiyor"}
-- Yer: {birth_city_a}, {birth_country_a}
-
-Partner B:
-- Ad: {name_b}
-- Doğum: {birth_date_b}
-- Saat: {birth_time_b or "bilinmiyor"}
-- Yer: {birth_city_b}, {birth_country_b}
-
-İstek: Çok detaylı sinastri üret.
-""".strip()
-
-    return _stitch_with_guard_generic(
-        system=system,
-        initial_user=user,
-        initial_tokens=_max_output_tokens(3600),
+    budget_key = ("synastry", topic)
+    return ReadingPrompt(
+        system=_SYNASTRY_SYSTEM,
+        user=user,
+        initial_tokens=_initial_tokens(*budget_key, 3600),
         continue_tokens=_max_output_tokens(1600),
         max_hops=2,
+        budget_key=budget_key,
+    )
+
+
+def generate_synastry_reading(
+    *,
+    name_a: str,
+    birth_date_a: str,
+    birth_time_a: Optional[str],
+    birth_city_a: str,
+    birth_country_a: str,
+    name_b: str,
+    birth_date_b: str,
+    birth_time_b: Optional[str],
+    birth_city_b: str,
+    birth_country_b: str,
+    topic: str,
+    question: Optional[str] = None,
+) -> str:
+    return _run_reading_prompt(
+        build_synastry_prompt(
+            name_a=name_a,
+            birth_date_a=birth_date_a,
+            birth_time_a=birth_time_a,
+            birth_city_a=birth_city_a,
+            birth_country_a=birth_country_a,
+            name_b=name_b,
+            birth_date_b=birth_date_b,
+            birth_time_b=birth_time_b,
+            birth_city_b=birth_city_b,
+            birth_country_b=birth_country_b,
+            topic=topic,
+            question=question,
+        )
     )
@@ -4,7 +4,7 @@ from __future__ import annotations
 from sqlmodel import Session
 
 from app.repositories.personality_repo import personality_repo
-from app.services.personality_service import generate_personality_reading
+from app.services.personality_service import find_reusable_subreadings, generate_personality_reading
 
 
 def _get_session_factory():
@@ -69,6 +69,7 @@ def run_personality_generation(reading_id: str) -> None:
                 birth_country=reading.get("birth_country") or "TR",
                 topic=reading.get("topic") or "genel",
                 question=reading.get("question"),
+                **find_reusable_subreadings(session, reading),
             )
 
             personality_repo.set_result(session=session, reading_id=reading_id, result_text=result)
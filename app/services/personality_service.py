@@ -1,9 +1,60 @@
 # app/services/personality_service.py
 from __future__ import annotations
 
-from typing import Optional
+import logging
+from typing import Any, Dict, Optional
+
+from sqlmodel import Session
+
+from app.repositories.birthchart_repo import birthchart_repo
+from app.repositories.numerology_repo import numerology_repo
 from app.services.openai_service import generate_personality_reading as _generate_personality_reading
 
+log = logging.getLogger("lunaura.personality")
+
+
+def find_reusable_subreadings(session: Session, reading: Dict[str, Any]) -> Dict[str, Optional[str]]:
+    """
+    Aynı cihazın aynı kişi bilgileriyle (ad, doğum tarihi/saati/yeri) tamamladığı
+    numeroloji ve doğum haritası yorumlarını bulur; kişilik füzyonuna doğrudan girer.
+    """
+    did = (reading.get("device_id") or "").strip()
+    if not did:
+        return {"numerology_text": None, "birthchart_text": None}
+
+    num = None
+    bc = None
+    try:
+        num = numerology_repo.find_completed(
+            session=session,
+            device_id=did,
+            name=reading.get("name") or "",
+            birth_date=reading.get("birth_date") or "",
+        )
+        bc = birthchart_repo.find_completed(
+            session=session,
+            device_id=did,
+            name=reading.get("name") or "",
+            birth_date=reading.get("birth_date") or "",
+            birth_time=reading.get("birth_time"),
+            birth_city=reading.get("birth_city") or "",
+            birth_country=reading.get("birth_country") or "TR",
+        )
+    except Exception as e:
+        log.warning("Personality sub-reading lookup failed: %s", e)
+
+    if num or bc:
+        log.info(
+            "Personality %s reuses numerology=%s birthchart=%s",
+            reading.get("id"),
+            num.get("id") if num else None,
+            bc.get("id") if bc else None,
+        )
+    return {
+        "numerology_text": num.get("result_text") if num else None,
+        "birthchart_text": bc.get("result_text") if bc else None,
+    }
+
 
 def generate_personality_reading(
     *,
@@ -14,6 +65,9 @@ def generate_personality_reading(
     birth_country: str,
     topic: str,
     question: Optional[str] = None,
+    numerology_text: Optional[str] = None,
+    birthchart_text: Optional[str] = None,
+    stage_results: Optional[Dict[str, str]] = None,
 ) -> str:
     return _generate_personality_reading(
         name=name,
@@ -23,4 +77,7 @@ def generate_personality_reading(
         birth_country=birth_country,
         topic=topic,
         question=question,
+        numerology_text=numerology_text,
+        birthchart_text=birthchart_text,
+        stage_results=stage_results,
     )
@@ -0,0 +1,155 @@
+# app/services/processing_reaper.py
+"""
+processing'de takılı kalmış okumaları toplayan reaper.
+
+- Her tablo için tek indexli sorgu: status='processing' AND updated_at < now - eşik (ürün bazlı).
+- Aktif generation_jobs işi varsa dokunulmaz (kuyruk / lease kendisi halleder).
+- Ödenmiş okuma: atomik reclaim + tekrar kuyruğa bırakılır.
+- Ödenmemiş okuma: kullanıcının tekrar deneyebileceği duruma çekilir.
+Worker (ve inline tüketicili web süreci) periyodik çalıştırır; /cron/reap-processing ile de tetiklenebilir.
+"""
+from __future__ import annotations
+
+import logging
+import threading
+from datetime import datetime, timedelta
+from typing import Any, Dict, Optional, Type
+
+from sqlalchemy import update
+from sqlmodel import Session, select
+
+from app.core.config import settings
+from app.db import engine
+from app.repositories import claims, generation_job_repo
+from app.services.generation_jobs import READING_MODELS, enqueue_generation
+
+log = logging.getLogger("lunaura.reaper")
+
+# Ödenmemiş okuma üretim öncesi hangi duruma dönsün
+_RESET_STATUS: Dict[str, str] = {
+    "coffee": "photos_uploaded",
+    "hand": "photos_uploaded",
+    "tarot": "selected",
+    "numerology": "started",
+    "birthchart": "started",
+    "personality": "created",
+    "synastry": "started",
+}
+
+_stats_lock = threading.Lock()
+_totals: Dict[str, Dict[str, int]] = {}
+_last_run: Dict[str, Any] = {}
+
+
+def thresholds() -> Dict[str, int]:
+    out = dict(claims.STALE_SECONDS)
+    for part in (settings.processing_reaper_thresholds or "").split(","):
+        key, _, value = part.partition("=")
+        key = key.strip().lower()
+        if key in READING_MODELS and value.strip().isdigit():
+            out[key] = int(value.strip())
+    return out
+
+
+def _reset(session: Session, model: Type[Any], reading_id: str, status: str, cutoff: datetime) -> bool:
+    # Sadece hâlâ takılıysa sıfırla (bu arada claim/sonuç geldiyse dokunma)
+    res = session.exec(
+        update(model)
+        .where(model.id == reading_id)
+        .where(model.status == "processing")
+        .where(model.updated_at < cutoff)
+        .values(status=status, updated_at=datetime.utcnow())
+    )
+    session.commit()
+    return bool(getattr(res, "rowcount", 0) or 0)
+
+
+def _sweep_product(session: Session, product: str, stale_seconds: int, limit: int) -> Dict[str, int]:
+    model = READING_MODELS[product]
+    cutoff = datetime.utcnow() - timedelta(seconds=int(stale_seconds))
+    rows = session.exec(
+        select(model.id, model.is_paid)
+        .where(model.status == "processing")
+        .where(model.updated_at < cutoff)
+        .order_by(model.updated_at)
+        .limit(limit)
+    ).all()
+
+    counts = {"found": len(rows), "requeued": 0, "reset": 0, "skipped_active_job": 0}
+    for reading_id, is_paid in rows:
+        if generation_job_repo.get_active(session, product, reading_id):
+            counts["skipped_active_job"] += 1
+            continue
+        if is_paid:
+            if claims.claim_processing(session, model, reading_id, product=product, stale_seconds=stale_seconds):
+                enqueue_generation(session, product, reading_id)
+                counts["requeued"] += 1
+        elif _reset(session, model, reading_id, _RESET_STATUS[product], cutoff):
+            counts["reset"] += 1
+    return counts
+
+
+def sweep_stale_processing() -> Dict[str, Dict[str, int]]:
+    """Tüm ürünleri bir kez tarar; ürün bazlı found/requeued/reset/skipped_active_job döner."""
+    limit = max(1, int(settings.processing_reaper_batch or 200))
+    result: Dict[str, Dict[str, int]] = {}
+    with Session(engine) as session:
+        for product, stale_seconds in thresholds().items():
+            if product not in READING_MODELS:
+                continue
+            try:
+                result[product] = _sweep_product(session, product, stale_seconds, limit)
+            except Exception:
+                session.rollback()
+                log.exception("Reaper sweep failed for %s", product)
+
+    with _stats_lock:
+        for product, counts in result.items():
+            bucket = _totals.setdefault(product, {k: 0 for k in counts})
+            for k, v in counts.items():
+                bucket[k] = bucket.get(k, 0) + v
+        _last_run.clear()
+        _last_run.update({"at": datetime.utcnow().isoformat(), "result": result})
+
+    recovered = {p: c for p, c in result.items() if c["requeued"] or c["reset"]}
+    if recovered:
+        log.warning("Reaper recovered stuck readings: %s", recovered)
+    return result
+
+
+def reaper_stats() -> Dict[str, Any]:
+    with _stats_lock:
+        return {
+            "thresholds": thresholds(),
+            "totals": {k: dict(v) for k, v in _totals.items()},
+            "last_run": dict(_last_run),
+        }
+
+
+def run_reaper(stop: threading.Event, interval_seconds: Optional[float] = None) -> None:
+    interval = float(interval_seconds or settings.processing_reaper_interval_seconds or 0)
+    if interval <= 0:
+        return
+    while not stop.wait(timeout=interval):
+        try:
+            sweep_stale_processing()
+        except Exception:
+            log.exception("Reaper run failed")
+
+
+_reaper_stop = threading.Event()
+_reaper_thread: Optional[threading.Thread] = None
+
+
+def start_reaper() -> bool:
+    global _reaper_thread
+    if _reaper_thread is not None or int(settings.processing_reaper_interval_seconds or 0) <= 0:
+        return False
+    _reaper_stop.clear()
+    _reaper_thread = threading.Thread(target=run_reaper, args=(_reaper_stop,), name="processing-reaper", daemon=True)
+    _reaper_thread.start()
+    return True
+
+
+def stop_reaper() -> None:
+    _reaper_stop.set()
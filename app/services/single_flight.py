@@ -0,0 +1,189 @@
+# app/services/single_flight.py
+"""
+(product, reading_id) bazında single-flight: aynı okuma için aynı anda tek OpenAI üretimi.
+
+- Süreç içi: futures map; ikinci çağıran (follower) lider'in sonucunu bekler, yeni çağrı yapmaz.
+- Süreçler arası (Postgres): lider üretim boyunca session-level pg_try_advisory_lock tutar;
+  kilit başka worker'daysa SingleFlightBusy fırlatılır (çağıran tekrar denemeyi erteler).
+- Kilit bağlantısı uygulama pool'undan ALINMAZ: NullPool + AUTOCOMMIT ayrı engine, lider başına bir
+  bağlantı. Açık transaction yok (idle_in_transaction_session_timeout kilidi düşüremez) ve dakikalarca
+  süren üretimler pool'u tüketmez. Postgres max_connections'ta eşzamanlı lider sayısı kadar pay gerekir.
+- Bağlantı üretim sırasında koparsa (idle_session_timeout, ağ, restart) kilit sunucuda sessizce düşer;
+  release'te fark edilir, uyarı loglanır ve lock_lost sayılır. Sonuç yazımı zaten claim_processing ve
+  "sonuç var mı" kontrolüyle korunduğu için en kötü durum ikinci bir üretimdir, bozuk veri değil.
+- SQLite: sadece süreç içi koordinasyon (tek süreç varsayımı).
+"""
+from __future__ import annotations
+
+import hashlib
+import logging
+import threading
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, Optional, Tuple, TypeVar
+
+from sqlalchemy import create_engine, text
+from sqlalchemy.engine import Engine
+from sqlalchemy.pool import NullPool
+
+from app.db import engine
+
+log = logging.getLogger("lunaura.singleflight")
+
+T = TypeVar("T")
+
+_lock = threading.Lock()
+_inflight: Dict[Tuple[str, str], "Flight"] = {}
+_stats: Dict[str, Dict[str, int]] = {}
+
+
+class SingleFlightBusy(Exception):
+    """Aynı okumayı başka bir süreç üretiyor (advisory lock alınamadı)."""
+
+
+def _count(product: str, key: str) -> None:
+    with _lock:
+        bucket = _stats.setdefault(product, {"leaders": 0, "coalesced": 0, "busy_elsewhere": 0, "lock_lost": 0})
+        bucket[key] += 1
+
+
+def single_flight_stats() -> Dict[str, Any]:
+    with _lock:
+        return {
+            "inflight": len(_inflight),
+            "products": {k: dict(v) for k, v in _stats.items()},
+        }
+
+
+def _advisory_key(product: str, reading_id: str) -> int:
+    digest = hashlib.sha256(f"{product}:{reading_id}".encode("utf-8")).digest()
+    return int.from_bytes(digest[:8], "big", signed=True)
+
+
+_lock_engine: Optional[Engine] = None
+
+
+def _advisory_engine() -> Engine:
+    """Advisory lock'lar için pool dışı engine (her lider kendi bağlantısını açar, release'te kapatır)."""
+    global _lock_engine
+    with _lock:
+        if _lock_engine is None:
+            _lock_engine = create_engine(engine.url, poolclass=NullPool, isolation_level="AUTOCOMMIT")
+        return _lock_engine
+
+
+class Flight:
+    """begin() sonucu: leader ise iş yapılır ve finish() çağrılır; değilse future beklenir."""
+
+    def __init__(self, product: str, reading_id: str, *, leader: bool, future: "Future[Any]") -> None:
+        self.product = product
+        self.reading_id = reading_id
+        self.leader = leader
+        self.future = future
+        self._conn = None
+
+    def _acquire_cross_process(self) -> bool:
+        if engine.dialect.name != "postgresql":
+            return True
+        conn = _advisory_engine().connect()
+        try:
+            got = conn.execute(
+                text("SELECT pg_try_advisory_lock(:k)"),
+                {"k": _advisory_key(self.product, self.reading_id)},
+            ).scalar()
+        except Exception:
+            conn.close()
+            raise
+        if not got:
+            conn.close()
+            return False
+        # Kilit bağlantı açık kaldıkça (finish'e kadar) tutulur; transaction açık değil
+        self._conn = conn
+        return True
+
+    def _release_cross_process(self) -> None:
+        if self._conn is None:
+            return
+        try:
+            released = self._conn.execute(
+                text("SELECT pg_advisory_unlock(:k)"),
+                {"k": _advisory_key(self.product, self.reading_id)},
+            ).scalar()
+        except Exception as e:
+            released = False
+            log.warning("Advisory lock connection lost for %s/%s: %s", self.product, self.reading_id, e)
+        if not released:
+            # Bağlantı üretim sırasında koptu: kilit sunucuda çoktan düştü (başka worker girmiş olabilir)
+            _count(self.product, "lock_lost")
+            log.warning("Advisory lock for %s/%s was lost before release", self.product, self.reading_id)
+        try:
+            self._conn.close()
+        except Exception:
+            pass
+        self._conn = None
+
+    def finish(self, result: Any = None, error: Optional[BaseException] = None) -> None:
+        if not self.leader:
+            return
+        self._release_cross_process()
+        with _lock:
+            if _inflight.get((self.product, self.reading_id)) is self:
+                del _inflight[(self.product, self.reading_id)]
+        if error is not None:
+            self.future.set_exception(error)
+        else:
+            self.future.set_result(result)
+
+
+def begin(product: str, reading_id: str) -> Flight:
+    """
+    Leader olunursa advisory lock da alınmış döner; başka süreç tutuyorsa SingleFlightBusy.
+    Follower dönerse flight.future lider'in sonucu/hatasıyla tamamlanır.
+    """
+    key = (product, reading_id)
+    with _lock:
+        existing = _inflight.get(key)
+        if existing is None:
+            flight = Flight(product, reading_id, leader=True, future=Future())
+            _inflight[key] = flight
+    if existing is not None:
+        _count(product, "coalesced")
+        return Flight(product, reading_id, leader=False, future=existing.future)
+
+    try:
+        acquired = flight._acquire_cross_process()
+    except BaseException as e:
+        flight.finish(error=e)
+        raise
+    if not acquired:
+        _count(product, "busy_elsewhere")
+        busy = SingleFlightBusy(f"{product}/{reading_id} başka bir süreçte üretiliyor")
+        flight.finish(error=busy)
+        raise busy
+
+    _count(product, "leaders")
+    return flight
+
+
+def follow(product: str, reading_id: str) -> "Optional[Future[Any]]":
+    """Bu süreçte süren üretim varsa onun future'ı (leader olmadan sadece bağlanmak için)."""
+    with _lock:
+        existing = _inflight.get((product, reading_id))
+    if existing is None:
+        return None
+    _count(product, "coalesced")
+    return existing.future
+
+
+def run(product: str, reading_id: str, fn: Callable[[], T]) -> Tuple[T, bool]:
+    """fn'i tek uçuşta çalıştırır. Dönüş: (sonuç, leader_mı). Follower lider'in sonucunu alır."""
+    flight = begin(product, reading_id)
+    if not flight.leader:
+        return flight.future.result(), False
+
+    try:
+        result = fn()
+    except BaseException as e:
+        flight.finish(error=e)
+        raise
+    flight.finish(result=result)
+    return result, True
@@ -1,17 +1,33 @@
 # app/services/storage.py
 from __future__ import annotations
 
+import asyncio
+import io
+import logging
 import uuid
 from pathlib import Path
-from typing import List
+from typing import List, Optional
 
 from fastapi import UploadFile, HTTPException
+from PIL import Image, ImageOps
 
 from app.core.config import settings
 
+log = logging.getLogger("lunaura.storage")
+
 # DB'de saklayacağımız sabit prefix (stabil path)
 STABLE_ROOT = Path("storage") / "uploads"
 
+# Orijinalin yanına yazılan vision türevleri:
+# - <uuid>.vision.jpg|webp: yorum / gözlem (detail=high)
+# - <uuid>.thumb.jpg|webp : doğrulama (detail=low, 512 px yeter)
+VISION_SUFFIX = ".vision"
+THUMB_SUFFIX = ".thumb"
+
+# Çağrı türüne göre görsel çözünürlüğü
+FIDELITY_HIGH = "high"
+FIDELITY_LOW = "low"
+
 
 def _safe_filename(original: str) -> str:
     original = (original or "").strip()
@@ -55,6 +71,92 @@ def resolve_stable_path(stable_path: str) -> Path:
         return base / p
 
 
+# -------------------------
+# Vision türevleri (resize + re-encode + EXIF)
+# -------------------------
+def _vision_format() -> tuple[str, str]:
+    fmt = (settings.vision_image_format or "jpeg").lower().strip()
+    if fmt == "webp":
+        return "WEBP", ".webp"
+    return "JPEG", ".jpg"
+
+
+def vision_candidates(disk_path: Path, suffix: str = VISION_SUFFIX) -> List[Path]:
+    """Orijinal dosya için olası türev yolları (format sonradan değişmiş olabilir)."""
+    stem = disk_path.stem
+    return [disk_path.with_name(f"{stem}{suffix}{ext}") for ext in (".jpg", ".webp")]
+
+
+def _encode_derivative(im: Image.Image, long_edge: int, pil_format: str, quality: int) -> bytes:
+    im = im.copy()
+    im.thumbnail((long_edge, long_edge), Image.LANCZOS)
+    buf = io.BytesIO()
+    im.save(buf, format=pil_format, quality=quality, optimize=True)
+    return buf.getvalue()
+
+
+def make_vision_derivatives(data: bytes, disk_path: Path) -> Optional[Path]:
+    """
+    EXIF yönünü düzeltir; tek decode'dan iki türev yazar:
+    uzun kenar VISION_IMAGE_LONG_EDGE (yorum) ve VISION_THUMB_LONG_EDGE (doğrulama).
+    Görsel açılamazsa (ör. HEIC) None döner; vision orijinali kullanır.
+    """
+    pil_format, ext = _vision_format()
+    out_path = disk_path.with_name(f"{disk_path.stem}{VISION_SUFFIX}{ext}")
+    thumb_path = disk_path.with_name(f"{disk_path.stem}{THUMB_SUFFIX}{ext}")
+    long_edge = max(256, int(settings.vision_image_long_edge or 1536))
+    thumb_edge = max(128, min(long_edge, int(settings.vision_thumb_long_edge or 512)))
+    quality = max(40, min(95, int(settings.vision_image_quality or 82)))
+
+    try:
+        with Image.open(io.BytesIO(data)) as im:
+            im = ImageOps.exif_transpose(im)
+            if im.mode not in ("RGB", "L"):
+                im = im.convert("RGB")
+            high = _encode_derivative(im, long_edge, pil_format, quality)
+            thumb = _encode_derivative(im, thumb_edge, pil_format, quality)
+    except Exception as e:
+        log.warning("Vision derivative failed for %s: %s", disk_path.name, e)
+        return None
+
+    out_path.write_bytes(high)
+    thumb_path.write_bytes(thumb)
+    log.info(
+        "Vision derivatives %s: %d -> %d bytes (thumb %d bytes)",
+        out_path.name,
+        len(data),
+        len(high),
+        len(thumb),
+    )
+    return out_path
+
+
+def vision_path(stable_path: str, fidelity: str = FIDELITY_HIGH) -> Path:
+    """
+    Vision çağrısına gidecek dosya: low -> thumb türevi; high (ya da thumb yoksa) -> vision türevi;
+    türev yoksa orijinal. Eski kayıtlar (türevsiz) orijinal ile çalışmaya devam eder.
+    """
+    disk = resolve_stable_path(stable_path)
+    candidates = vision_candidates(disk)
+    if fidelity == FIDELITY_LOW:
+        candidates = vision_candidates(disk, THUMB_SUFFIX) + candidates
+    for cand in candidates:
+        if cand.exists():
+            return cand
+    return disk
+
+
+def delete_uploads(stable_paths: List[str]) -> None:
+    """Orijinalleri ve vision türevlerini siler (doğrulama reddi)."""
+    for sp in stable_paths or []:
+        disk = resolve_stable_path(sp)
+        for p in [disk, *vision_candidates(disk), *vision_candidates(disk, THUMB_SUFFIX)]:
+            try:
+                p.unlink(missing_ok=True)
+            except Exception:
+                pass
+
+
 async def save_uploads(reading_id: str, files: List[UploadFile]) -> List[str]:
     """
     Dosyaları diske yazar ve DB için stable path listesi döndürür.
@@ -75,6 +177,7 @@ async def save_uploads(reading_id: str, files: List[UploadFile]) -> List[str]:
             raise HTTPException(status_code=400, detail="Yüklenen görsel boş veya bozuk görünüyor.")
 
         disk_path.write_bytes(data)
+        await asyncio.to_thread(make_vision_derivatives, data, disk_path)
 
         stable_path = (STABLE_ROOT / reading_id / filename).as_posix()
         saved.append(stable_path)
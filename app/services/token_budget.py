@@ -0,0 +1,184 @@
+# app/services/token_budget.py
+"""
+Uyarlamalı ilk max_output_tokens (devam hop'larını azaltmak için).
+
+- Her (ürün, varyant) için tamamlanan yorumun toplam output token'ı (ilk çağrı + devam hop'ları) izlenir;
+  varyant: tarot'ta açılım (3/6/12), diğerlerinde konu.
+- İlk bütçe = gözlenen dağılımın (1 - hedef devam oranı) yüzdeliği * pay; taban / tavan ile sınırlı.
+- Varyantta yeterli örnek yoksa ürün geneli havuz (statik varsayılanın altına inmez), o da yoksa statik varsayılan.
+- OPENAI_MAX_OUTPUT_TOKENS (> 0) hepsini ezer; o durumda controller devre dışıdır.
+- Süreç açılışında ai_calls defterinden ürün geneli havuz ısıtılır (warm_start).
+"""
+from __future__ import annotations
+
+import logging
+import threading
+from collections import deque
+from datetime import datetime, timedelta
+from typing import Any, Deque, Dict, List, Optional, Tuple
+
+from sqlmodel import Session
+
+from app.core.config import settings
+from app.db import engine
+from app.repositories import ai_call_repo
+
+log = logging.getLogger("lunaura.tokens")
+
+ALL_VARIANTS = "*"
+# Değişken konu metinleri sınırsız anahtar üretmesin; aşılırsa sadece ürün geneli havuz öğrenir
+_MAX_SERIES = 300
+
+
+class _Series:
+    __slots__ = ("samples", "calls", "continued", "hops", "budget", "source")
+
+    def __init__(self, window: int) -> None:
+        self.samples: Deque[int] = deque(maxlen=max(10, window))
+        self.calls = 0
+        self.continued = 0
+        self.hops = 0
+        self.budget: Optional[int] = None
+        self.source = "static"
+
+
+_lock = threading.Lock()
+_series: Dict[Tuple[str, str], _Series] = {}
+
+
+def _variant(value: Optional[str]) -> str:
+    return " ".join((value or "").strip().lower().split())[:40] or ALL_VARIANTS
+
+
+def _get_series(key: Tuple[str, str], *, create: bool) -> Optional[_Series]:
+    s = _series.get(key)
+    if s is None and create and (key[1] == ALL_VARIANTS or len(_series) < _MAX_SERIES):
+        s = _series[key] = _Series(int(settings.token_budget_window))
+    return s
+
+
+def _quantile(values: List[int], q: float) -> float:
+    ordered = sorted(values)
+    return float(ordered[min(len(ordered) - 1, int(round(q * (len(ordered) - 1))))])
+
+
+def _enabled() -> bool:
+    return bool(settings.token_budget_enabled) and int(settings.openai_max_output_tokens or 0) <= 0
+
+
+def initial_tokens(product: str, variant: Optional[str], default: int) -> int:
+    """İlk çağrının max_output_tokens'ı; öğrenilmiş dağılım yoksa default."""
+    if not _enabled() or not product:
+        return int(default)
+
+    q = min(0.999, max(0.5, 1.0 - float(settings.token_budget_target_continuation_rate)))
+    min_samples = max(1, int(settings.token_budget_min_samples))
+    variant_key = (product, _variant(variant))
+    with _lock:
+        chosen: Optional[int] = None
+        source = "static"
+        for key in (variant_key, (product, ALL_VARIANTS)):
+            s = _series.get(key)
+            if s is not None and len(s.samples) >= min_samples:
+                raw = _quantile(list(s.samples), q) * float(settings.token_budget_headroom)
+                chosen = int(min(int(settings.token_budget_ceiling), max(int(settings.token_budget_floor), raw)))
+                source = "variant" if key == variant_key and key[1] != ALL_VARIANTS else "product"
+                if source == "product":
+                    # Ürün havuzu açılımları karıştırır (3 / 12 kart): varsayılanı sadece yukarı çeker
+                    chosen = max(chosen, int(default))
+                break
+
+        s = _get_series(variant_key, create=True)
+        if s is not None:
+            s.budget = chosen if chosen is not None else int(default)
+            s.source = source
+    return chosen if chosen is not None else int(default)
+
+
+def observe(product: str, variant: Optional[str], *, output_tokens: int, hops: int) -> None:
+    """Tamamlanan yorum: toplam output token (tüm hop'lar) ve kaç devam hop'u gerektiği."""
+    if not product or output_tokens <= 0:
+        return
+    with _lock:
+        keys = {(product, _variant(variant)), (product, ALL_VARIANTS)}
+        for key in keys:
+            s = _get_series(key, create=True)
+            if s is None:
+                continue
+            s.samples.append(int(output_tokens))
+            s.calls += 1
+            s.hops += int(hops)
+            if hops:
+                s.continued += 1
+
+
+def warm_start(days: Optional[int] = None) -> int:
+    """ai_calls defterinden okuma başına toplam output token'ı ürün geneli havuza yükler."""
+    days = int(days if days is not None else settings.token_budget_warm_start_days)
+    if days <= 0 or not settings.token_budget_enabled:
+        return 0
+    since = datetime.utcnow() - timedelta(days=days)
+    try:
+        with Session(engine) as session:
+            rows = ai_call_repo.list_reading_outputs_since(session, since)
+    except Exception:
+        log.exception("Token budget warm start failed")
+        return 0
+
+    totals: Dict[Tuple[str, str], List[int]] = {}
+    for product, reading_id, stage, output_tokens in rows:
+        kind = _stage_kind(product, stage)
+        if kind is None or not reading_id:
+            continue
+        t = totals.setdefault((kind, reading_id), [0, 0])
+        t[0] += int(output_tokens or 0)
+        if ".continue_" in stage or stage.startswith("continue_"):
+            t[1] += 1
+
+    with _lock:
+        for (kind, _), (out, hops) in totals.items():
+            s = _get_series((kind, ALL_VARIANTS), create=True)
+            if s is None or out <= 0:
+                continue
+            s.samples.append(out)
+            s.calls += 1
+            s.hops += hops
+            if hops:
+                s.continued += 1
+    if totals:
+        log.info("Token budget warm start: %d readings from the last %d days", len(totals), days)
+    return len(totals)
+
+
+# Defterdeki aşama -> controller ürünü (kişilik fan-out'u numeroloji / doğum haritası promptlarını kullanır)
+_STAGE_KINDS = {"numerology": "numerology", "birthchart": "birthchart", "fusion": "personality"}
+
+
+def _stage_kind(product: str, stage: str) -> Optional[str]:
+    base = stage.split(".continue_", 1)[0]
+    if base == "initial" or base.startswith("continue_"):
+        return product
+    return _STAGE_KINDS.get(base)
+
+
+def budget_stats() -> Dict[str, Any]:
+    q = 1.0 - float(settings.token_budget_target_continuation_rate)
+    with _lock:
+        out: Dict[str, Any] = {}
+        for (product, variant), s in sorted(_series.items()):
+            samples = list(s.samples)
+            out.setdefault(product, {})[variant] = {
+                "budget": s.budget,
+                "source": s.source,
+                "samples": len(samples),
+                "output_p50": int(_quantile(samples, 0.5)) if samples else None,
+                "output_target_q": int(_quantile(samples, q)) if samples else None,
+                "readings": s.calls,
+                "continuation_rate": round(s.continued / s.calls, 3) if s.calls else 0.0,
+                "avg_hops": round(s.hops / s.calls, 3) if s.calls else 0.0,
+            }
+    return {
+        "enabled": _enabled(),
+        "target_continuation_rate": float(settings.token_budget_target_continuation_rate),
+        "products": out,
+    }
@@ -0,0 +1,83 @@
+# app/services/vision_verdict_cache.py
+"""
+Coffee/hand görsel doğrulama sonuçlarının içerik-hash cache'i.
+
+Anahtar: sha256(kind | prompt_version | sıralı görsel sha256'ları)
+  - Aynı dosyalar upload'da doğrulandıysa /generate ve generate_hand_fortune tekrar ödemez.
+  - Prompt veya vision modeli değişirse prompt_version değişir, eski kararlar kullanılmaz.
+Sadece ok=true kararlar saklanır (parse hatası / geçici ret kalıcı hale gelmesin).
+"""
+from __future__ import annotations
+
+import hashlib
+import logging
+from typing import Any, Dict, List, Optional
+
+from sqlmodel import Session
+
+from app.core.config import settings
+from app.db import engine
+from app.repositories import vision_verdict_repo
+from app.services.storage import vision_path
+
+log = logging.getLogger("lunaura.vision_cache")
+
+
+def _ttl_seconds() -> int:
+    try:
+        return max(0, int(getattr(settings, "vision_verdict_ttl_seconds", 0) or 0))
+    except Exception:
+        return 0
+
+
+def prompt_version(prompt: str, model: str) -> str:
+    return f"{hashlib.sha256(prompt.encode('utf-8')).hexdigest()[:16]}:{model}"
+
+
+def _file_sha256(stable_path: str) -> str:
+    h = hashlib.sha256()
+    with open(vision_path(stable_path), "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def verdict_key(kind: str, version: str, image_paths: List[str]) -> Optional[str]:
+    """Görseller okunamazsa None (cache atlanır, normal doğrulama çalışır)."""
+    if _ttl_seconds() <= 0 or not image_paths:
+        return None
+    try:
+        digests = sorted(_file_sha256(p) for p in image_paths)
+    except Exception as e:
+        log.warning("Verdict key failed (%s): %s", kind, e)
+        return None
+    raw = "|".join([kind, version, *digests])
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+def get(key: Optional[str]) -> Optional[Dict[str, Any]]:
+    if not key:
+        return None
+    try:
+        with Session(engine) as session:
+            return vision_verdict_repo.get_valid(session, key)
+    except Exception as e:
+        log.warning("Verdict cache read failed: %s", e)
+        return None
+
+
+def put(key: Optional[str], *, kind: str, version: str, verdict: Dict[str, Any]) -> None:
+    if not key or not verdict.get("ok"):
+        return
+    try:
+        with Session(engine) as session:
+            vision_verdict_repo.put(
+                session,
+                key=key,
+                kind=kind,
+                prompt_version=version,
+                verdict=verdict,
+                ttl_seconds=_ttl_seconds(),
+            )
+    except Exception as e:
+        log.warning("Verdict cache write failed: %s", e)
@@ -0,0 +1,93 @@
+# app/worker.py
+"""
+Ayrı üretim worker'ı: python -m app.worker [--concurrency N]
+
+generation_jobs kuyruğundan iş alır, yorumu üretip repo'lar üzerinden yazar ve FCM bildirimi gönderir.
+processing'de takılı okumaları toplayan reaper da burada periyodik çalışır.
+Web süreçleri (gunicorn) sadece enqueue eder; bu worker'lar ayrı ölçeklenir.
+Web tarafında GENERATION_INLINE_WORKERS=0 verilirse üretim tamamen bu süreçlere kalır.
+"""
+from __future__ import annotations
+
+import argparse
+import logging
+import signal
+import threading
+import uuid
+from typing import List, Optional, Tuple
+
+from app.core.config import settings
+from app.db import init_db
+from app.services.ai_ledger import start_ledger, stop_ledger
+from app.services.generation_jobs import drain_consumers, run_consumer, worker_id_prefix
+from app.services.openai_service import warmup_openai_client
+from app.services.processing_reaper import start_reaper, stop_reaper
+from app.services.token_budget import warm_start as warm_token_budgets
+
+log = logging.getLogger("lunaura.worker")
+
+
+def _parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    p = argparse.ArgumentParser(prog="python -m app.worker", description="Lunaura generation worker")
+    p.add_argument(
+        "--concurrency",
+        type=int,
+        default=int(settings.generation_worker_concurrency),
+        help="Eşzamanlı üretim sayısı (GENERATION_WORKER_CONCURRENCY)",
+    )
+    p.add_argument("--poll-seconds", type=float, default=1.0, help="Kuyruk boşken bekleme süresi")
+    return p.parse_args(argv)
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    args = _parse_args(argv)
+    logging.basicConfig(
+        level=logging.DEBUG if settings.debug else logging.INFO,
+        format="%(asctime)s %(levelname)s %(name)s %(message)s",
+    )
+
+    settings.ensure_dirs()
+    init_db()
+    warmup_openai_client()
+
+    n = max(1, int(args.concurrency))
+    stop = threading.Event()
+
+    def _on_signal(signum, _frame) -> None:
+        log.info("Signal %s received, draining current jobs", signum)
+        stop.set()
+
+    signal.signal(signal.SIGTERM, _on_signal)
+    signal.signal(signal.SIGINT, _on_signal)
+
+    prefix = worker_id_prefix()
+    consumers: List[Tuple[threading.Thread, str]] = []
+    for i in range(n):
+        wid = f"{prefix}:worker-{i}-{uuid.uuid4().hex[:6]}"
+        t = threading.Thread(
+            target=run_consumer,
+            args=(stop, wid),
+            kwargs={"poll_seconds": args.poll_seconds},
+            name=f"gen-worker-{i}",
+            # drain süresi dolarsa süreç bitmeyen thread'i beklemeden çıkabilsin (iş kuyruğa geri verilir)
+            daemon=True,
+        )
+        t.start()
+        consumers.append((t, wid))
+    start_reaper()
+    start_ledger()
+    warm_token_budgets()
+    log.info("Generation worker started (%d consumers)", n)
+
+    # Ana thread sinyalleri alabilsin diye kısa aralıklarla bekle
+    while not stop.is_set():
+        stop.wait(timeout=1.0)
+
+    stop_reaper()
+    drain_consumers(stop, consumers, deadline_seconds=float(settings.generation_drain_seconds), label="worker")
+    stop_ledger()
+    log.info("Generation worker stopped")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,43 @@
+# tests/conftest.py
+"""
+Testler geçici bir SQLite veritabanı ve storage dizini ile çalışır.
+Ayarlar ve engine import anında okunduğu için ortam değişkenleri app import edilmeden önce set edilir.
+"""
+from __future__ import annotations
+
+import os
+import tempfile
+
+_TMP = tempfile.mkdtemp(prefix="lunaura-tests-")
+os.environ["STORAGE_DIR"] = os.path.join(_TMP, "storage")
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_TMP, 'test.db')}"
+os.environ["OPENAI_API_KEY"] = "test"
+# İşler testte elle işlenir; web süreci içi tüketici thread'i başlamasın
+os.environ["GENERATION_INLINE_WORKERS"] = "0"
+os.environ["AI_LEDGER_ENABLED"] = "false"
+os.environ["TOKEN_BUDGET_WARM_START_DAYS"] = "0"
+
+from typing import Iterator  # noqa: E402
+
+import pytest  # noqa: E402
+from sqlmodel import SQLModel, Session  # noqa: E402
+
+from app.core.config import settings  # noqa: E402
+from app.db import engine, init_db  # noqa: E402
+
+settings.ensure_dirs()
+init_db()
+
+
+@pytest.fixture(autouse=True)
+def _clean_tables() -> Iterator[None]:
+    yield
+    with engine.begin() as conn:
+        for table in reversed(SQLModel.metadata.sorted_tables):
+            conn.execute(table.delete())
+
+
+@pytest.fixture
+def session() -> Iterator[Session]:
+    with Session(engine) as s:
+        yield s
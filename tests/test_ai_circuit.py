@@ -0,0 +1,106 @@
+from __future__ import annotations
+
+import time
+
+import pytest
+
+from app.core.config import settings
+from app.services.ai_circuit import CLOSED, HALF_OPEN, OPEN, CircuitBreaker, CircuitOpen
+
+OPEN_SECONDS = 0.05
+
+
+@pytest.fixture(autouse=True)
+def _fast_circuit(monkeypatch):
+    monkeypatch.setattr(settings, "openai_circuit_open_seconds", OPEN_SECONDS)
+    monkeypatch.setattr(settings, "openai_circuit_min_calls", 4)
+    monkeypatch.setattr(settings, "openai_circuit_error_rate", 0.5)
+    monkeypatch.setattr(settings, "openai_circuit_consecutive_timeouts", 3)
+
+
+def _call(cb: CircuitBreaker, outcome: str = "ok") -> None:
+    cb.before_call()
+    if outcome == "ok":
+        cb.on_success()
+    else:
+        cb.on_failure(outcome)
+
+
+def _open_after_wait(cb: CircuitBreaker) -> None:
+    assert cb.state() == OPEN
+    time.sleep(OPEN_SECONDS * 1.5)
+    assert cb.state() == HALF_OPEN
+
+
+def test_consecutive_timeouts_open_and_reject_fast():
+    cb = CircuitBreaker()
+    for _ in range(3):
+        _call(cb, "timeout")
+
+    assert cb.state() == OPEN
+    with pytest.raises(CircuitOpen) as exc:
+        cb.before_call()
+    assert 0 < exc.value.retry_after <= OPEN_SECONDS
+    assert cb.stats()["rejected"] == 1
+
+
+def test_error_rate_opens_only_after_min_calls():
+    cb = CircuitBreaker()
+    _call(cb, "unavailable")
+    _call(cb, "unavailable")
+    assert cb.state() == CLOSED
+
+    _call(cb)
+    _call(cb, "unavailable")
+    assert cb.state() == OPEN
+    assert "error rate" in cb.stats()["reason"]
+
+
+def test_half_open_allows_single_probe_and_closes_on_success():
+    cb = CircuitBreaker()
+    for _ in range(3):
+        _call(cb, "timeout")
+    _open_after_wait(cb)
+
+    cb.before_call()
+    with pytest.raises(CircuitOpen):
+        cb.before_call()
+    cb.on_success()
+
+    assert cb.state() == CLOSED
+    assert cb.stats()["probes"] == 1
+
+
+def test_failed_probe_reopens():
+    cb = CircuitBreaker()
+    for _ in range(3):
+        _call(cb, "timeout")
+    _open_after_wait(cb)
+
+    _call(cb, "unavailable")
+
+    assert cb.state() == OPEN
+    assert cb.stats()["opened"] == 2
+
+
+def test_neutral_outcome_returns_probe_slot():
+    cb = CircuitBreaker()
+    for _ in range(3):
+        _call(cb, "timeout")
+    _open_after_wait(cb)
+
+    cb.before_call()
+    cb.on_neutral()
+    cb.before_call()
+    assert cb.state() == HALF_OPEN
+
+
+def test_quota_opens_immediately_for_quota_window(monkeypatch):
+    monkeypatch.setattr(settings, "openai_circuit_quota_open_seconds", 300.0)
+    cb = CircuitBreaker()
+
+    _call(cb, "quota")
+
+    assert cb.state() == OPEN
+    assert cb.stats()["reason"] == "insufficient_quota"
+    assert cb.stats()["open_remaining_seconds"] > OPEN_SECONDS
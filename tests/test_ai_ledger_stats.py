@@ -0,0 +1,79 @@
+from __future__ import annotations
+
+from datetime import datetime
+
+from app.core.config import settings
+from app.repositories import ai_call_repo
+from app.services import ai_ledger
+
+
+def _calls(session, latencies, *, stage="initial", outcome="ok"):
+    ai_call_repo.insert_many(
+        session,
+        [
+            {
+                "product": "coffee",
+                "stage": stage,
+                "model": "gpt-4.1",
+                "input_tokens": 100,
+                "cached_tokens": 50,
+                "output_tokens": 10,
+                "latency_ms": ms,
+                "outcome": outcome,
+                "created_at": datetime.utcnow(),
+            }
+            for ms in latencies
+        ],
+    )
+
+
+def test_sqlite_fallback_summarizes_in_python(session):
+    _calls(session, [100, 200, 300])
+    _calls(session, [1000], stage="validate", outcome="timeout")
+
+    stats = ai_ledger.daily_stats(days=1)
+
+    assert stats["aggregated_in"] == "python" and stats["truncated"] is False
+    (day,) = stats["days"].values()
+    coffee = day["coffee"]
+    assert coffee["calls"] == 4 and coffee["errors"] == 1
+    assert coffee["cached_ratio"] == 0.5
+    assert coffee["stages"]["initial"]["latency_ms_p50"] == 200
+    assert coffee["stages"]["validate"]["calls"] == 1
+
+
+def test_sqlite_fallback_caps_rows(session, monkeypatch):
+    monkeypatch.setattr(settings, "ai_ledger_stats_max_rows", 2)
+    _calls(session, [100, 200, 300])
+
+    stats = ai_ledger.daily_stats(days=1)
+
+    assert stats["truncated"] is True
+    (day,) = stats["days"].values()
+    assert day["coffee"]["calls"] == 2
+
+
+def test_sql_summary_rows_are_nested_per_day_and_stage(monkeypatch):
+    day = datetime(2026, 10, 1)
+    base = {
+        "calls": 2,
+        "errors": 0,
+        "latency_ms_p50": 150.0,
+        "latency_ms_p95": 195.0,
+        "tokens_p50": 110.0,
+        "tokens_p95": 110.0,
+        "input_tokens": 200,
+        "cached_tokens": 0,
+        "output_tokens": 20,
+    }
+    rows = [
+        {"day": day, "product": "coffee", "stage": None, **base},
+        {"day": day, "product": "coffee", "stage": "initial", **base},
+    ]
+    monkeypatch.setattr(ai_call_repo, "summarize_since", lambda session, since, product=None: [dict(r) for r in rows])
+
+    out = ai_ledger._daily_stats_sql(None, day, None)
+
+    coffee = out["2026-10-01"]["coffee"]
+    assert coffee["latency_ms_p95"] == 195 and coffee["cached_ratio"] == 0.0
+    assert coffee["stages"]["initial"]["calls"] == 2
@@ -0,0 +1,86 @@
+from __future__ import annotations
+
+import io
+from datetime import datetime
+
+import pytest
+from fastapi.testclient import TestClient
+from PIL import Image
+
+from app.core.config import settings
+from app.main import app
+from app.models.coffee_db import CoffeeReadingDB
+from app.repositories import coffee_repo
+from app.services import ai_circuit, ai_limiter
+
+
+def _limiter(**kwargs) -> ai_limiter.ModelLimiter:
+    opts = {"initial": 1, "minimum": 1, "maximum": 4, "queue_max": 0, "queue_timeout": 0.05}
+    opts.update(kwargs)
+    return ai_limiter.ModelLimiter("test-model", **opts)
+
+
+def test_full_queue_is_rejected_with_retry_after():
+    lim = _limiter()
+    lim.acquire()
+
+    with pytest.raises(ai_limiter.LimiterSaturated) as exc:
+        lim.acquire()
+
+    assert exc.value.reason == "queue full"
+    assert 1 <= exc.value.retry_after <= 30
+    assert lim.stats()["rejected_full"] == 1
+
+
+def test_queue_timeout_is_rejected_and_release_wakes_waiters():
+    lim = _limiter(queue_max=1)
+    lim.acquire()
+
+    with pytest.raises(ai_limiter.LimiterSaturated) as exc:
+        lim.acquire()
+    assert exc.value.reason == "queue timeout"
+
+    lim.release()
+    lim.acquire()
+    assert lim.stats()["in_use"] == 1
+
+
+def test_throttle_halves_limit_once_per_burst():
+    lim = _limiter(initial=4)
+
+    lim.on_throttle()
+    lim.on_throttle()
+
+    assert lim.stats()["limit"] == 2.0
+    assert lim.stats()["throttled"] == 2
+
+
+def _jpeg() -> bytes:
+    buf = io.BytesIO()
+    Image.new("RGB", (64, 64), (120, 80, 40)).save(buf, format="JPEG")
+    return buf.getvalue()
+
+
+def test_saturated_limiter_maps_to_503_with_retry_after(session, monkeypatch):
+    r = coffee_repo.create_reading(
+        session,
+        CoffeeReadingDB(
+            topic="Genel",
+            name="Ada",
+            status="pending_payment",
+            device_id="device-1",
+            created_at=datetime.utcnow(),
+            updated_at=datetime.utcnow(),
+        ),
+    )
+    lim = _limiter()
+    lim.acquire()
+    monkeypatch.setattr(ai_limiter, "get_limiter", lambda model: lim)
+    monkeypatch.setattr(ai_circuit, "breaker", ai_circuit.CircuitBreaker())
+
+    files = [("files", (f"{i}.jpg", _jpeg(), "image/jpeg")) for i in range(settings.min_photos)]
+    res = TestClient(app).post(f"/api/v1/coffee/{r.id}/upload-images", files=files, headers={"X-Device-Id": "device-1"})
+
+    assert res.status_code == 503
+    assert int(res.headers["Retry-After"]) >= 1
+    assert lim.stats()["rejected_full"] == 1
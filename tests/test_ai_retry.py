@@ -0,0 +1,52 @@
+from __future__ import annotations
+
+from datetime import datetime, timedelta, timezone
+from email.utils import format_datetime
+
+import httpx
+import pytest
+
+from app.services import ai_retry
+from app.services.openai_service import AIServiceUnavailableError
+
+
+class _SDKError(Exception):
+    def __init__(self, headers: dict) -> None:
+        super().__init__("rate limited")
+        self.response = httpx.Response(429, headers=headers)
+
+
+@pytest.mark.parametrize(
+    "headers, expected",
+    [
+        ({"retry-after-ms": "1500"}, 1.5),
+        ({"retry-after": "7"}, 7.0),
+        ({"retry-after-ms": "oops", "retry-after": "2"}, 2.0),
+        ({"x-ratelimit-reset-requests": "20ms", "x-ratelimit-reset-tokens": "6m0s"}, 360.0),
+        ({"x-ratelimit-reset-tokens": "1h2m3.5s"}, 3723.5),
+        ({"x-ratelimit-reset-requests": "soon"}, None),
+        ({}, None),
+    ],
+)
+def test_server_delay_header_precedence(headers, expected):
+    assert ai_retry.server_delay(_SDKError(headers)) == expected
+
+
+def test_server_delay_parses_http_date():
+    when = datetime.now(timezone.utc) + timedelta(seconds=30)
+    delay = ai_retry.server_delay(_SDKError({"retry-after": format_datetime(when, usegmt=True)}))
+    assert delay is not None and 25 <= delay <= 31
+
+
+def test_server_delay_follows_cause_of_domain_error():
+    try:
+        try:
+            raise _SDKError({"retry-after": "3"})
+        except _SDKError as e:
+            raise AIServiceUnavailableError("OpenAI rate limit") from e
+    except AIServiceUnavailableError as wrapped:
+        assert ai_retry.server_delay(wrapped) == 3.0
+
+
+def test_server_delay_without_response_is_none():
+    assert ai_retry.server_delay(RuntimeError("boom")) is None
@@ -0,0 +1,51 @@
+from __future__ import annotations
+
+from datetime import datetime, timedelta
+
+from app.models.numerology_db import NumerologyReadingDB
+from app.repositories import claims
+
+
+def _reading(session, **fields) -> NumerologyReadingDB:
+    r = NumerologyReadingDB(name="Ada", birth_date="1990-01-01", **fields)
+    session.add(r)
+    session.commit()
+    session.refresh(r)
+    return r
+
+
+def _claim(session, r: NumerologyReadingDB, **kwargs) -> bool:
+    return claims.claim_processing(session, NumerologyReadingDB, r.id, product="numerology", **kwargs)
+
+
+def test_only_first_claim_wins(session):
+    r = _reading(session, status="paid")
+
+    assert _claim(session, r) is True
+    assert _claim(session, r) is False
+    session.refresh(r)
+    assert r.status == "processing"
+
+
+def test_stale_processing_is_reclaimed(session):
+    r = _reading(session, status="processing", updated_at=datetime.utcnow() - timedelta(seconds=120))
+
+    assert _claim(session, r, stale_seconds=300) is False
+    before = claims.claim_stats().get("numerology", {}).get("reclaimed_stale", 0)
+    assert _claim(session, r, stale_seconds=60) is True
+    assert claims.claim_stats()["numerology"]["reclaimed_stale"] == before + 1
+
+
+def test_completed_reading_is_never_claimed(session):
+    r = _reading(session, status="completed", result_text="yorum")
+    stuck = _reading(session, status="processing", result_text="yorum", updated_at=datetime.utcnow() - timedelta(days=1))
+
+    assert _claim(session, r) is False
+    assert _claim(session, stuck, stale_seconds=1) is False
+
+
+def test_extra_condition_limits_claim(session):
+    r = _reading(session, status="started", is_paid=False)
+
+    assert _claim(session, r, extra=NumerologyReadingDB.is_paid.is_(True)) is False
+    assert _claim(session, r) is True
@@ -0,0 +1,100 @@
+from __future__ import annotations
+
+from datetime import datetime
+from pathlib import Path
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.core.config import settings
+from app.main import app
+from app.models.coffee_db import CoffeeReadingDB
+from app.repositories import coffee_repo, generation_job_repo
+from app.services import generation_jobs, openai_service
+
+DEVICE = {"X-Device-Id": "device-1"}
+
+
+@pytest.fixture
+def client() -> TestClient:
+    return TestClient(app)
+
+
+def _reading(session, *, is_paid: bool = False) -> CoffeeReadingDB:
+    r = coffee_repo.create_reading(
+        session,
+        CoffeeReadingDB(
+            topic="Aşk",
+            question="?",
+            name="Ada",
+            status="photos_uploaded",
+            is_paid=is_paid,
+            device_id="device-1",
+            created_at=datetime.utcnow(),
+            updated_at=datetime.utcnow(),
+        ),
+    )
+    photo_dir = Path(settings.upload_dir_effective) / r.id
+    photo_dir.mkdir(parents=True, exist_ok=True)
+    (photo_dir / "a.jpg").write_bytes(b"x" * 200)
+    return coffee_repo.set_photos(session, r.id, [f"storage/uploads/{r.id}/a.jpg"])
+
+
+def _run_queued_job(session) -> None:
+    job = generation_jobs.claim_next("test-worker")
+    assert job is not None
+    generation_jobs.process_job(job)
+
+
+def test_generate_enqueues_without_calling_openai(client, session, monkeypatch):
+    r = _reading(session)
+
+    async def _no_validation(*args, **kwargs):
+        raise AssertionError("/generate must not validate in the request")
+
+    monkeypatch.setattr(openai_service, "avalidate_coffee_images", _no_validation)
+    res = client.post(f"/api/v1/coffee/{r.id}/generate", headers=DEVICE)
+
+    assert res.status_code == 200
+    assert res.json()["status"] == "processing"
+    assert generation_job_repo.get_active(session, "coffee", r.id) is not None
+
+
+def test_rejected_job_persists_state_and_generate_returns_400(client, session, monkeypatch):
+    r = _reading(session)
+    monkeypatch.setattr(settings, "coffee_single_pass", True)
+    monkeypatch.setattr(
+        openai_service,
+        "validate_and_generate_fortune",
+        lambda **kwargs: {"ok": False, "reason": "fincan değil", "reading": ""},
+    )
+
+    assert client.post(f"/api/v1/coffee/{r.id}/generate", headers=DEVICE).status_code == 200
+    _run_queued_job(session)
+
+    detail = client.get(f"/api/v1/coffee/{r.id}", headers=DEVICE).json()
+    assert detail["status"] == "rejected"
+    assert detail["reject_reason"] == "Lütfen sadece kahve fincanı içi fotoğrafı yükleyin."
+    assert detail["photos"] == []
+    assert not (Path(settings.upload_dir_effective) / r.id / "a.jpg").exists()
+
+    res = client.post(f"/api/v1/coffee/{r.id}/generate", headers=DEVICE)
+    assert res.status_code == 400
+    assert res.json()["detail"] == "Lütfen sadece kahve fincanı içi fotoğrafı yükleyin."
+
+
+@pytest.mark.parametrize("is_paid, expected", [(False, "photos_uploaded"), (True, "paid")])
+def test_failed_job_releases_to_payment_state(client, session, monkeypatch, is_paid, expected):
+    r = _reading(session, is_paid=is_paid)
+    monkeypatch.setattr(settings, "coffee_single_pass", False)
+    monkeypatch.setattr(settings, "generation_job_max_attempts", 1)
+
+    def _boom(**kwargs):
+        raise RuntimeError("boom")
+
+    monkeypatch.setattr(openai_service, "generate_fortune", _boom)
+
+    assert client.post(f"/api/v1/coffee/{r.id}/generate", headers=DEVICE).status_code == 200
+    _run_queued_job(session)
+
+    assert client.get(f"/api/v1/coffee/{r.id}", headers=DEVICE).json()["status"] == expected
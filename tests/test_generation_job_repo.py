@@ -0,0 +1,121 @@
+from __future__ import annotations
+
+from datetime import datetime, timedelta
+
+from app.repositories import generation_job_repo
+from app.services import generation_jobs
+
+LEASE = 900
+
+
+def _job(session, reading_id: str, **fields):
+    job = generation_job_repo.enqueue(session, "tarot", reading_id)
+    for key, value in fields.items():
+        setattr(job, key, value)
+    session.add(job)
+    session.commit()
+    session.refresh(job)
+    return job
+
+
+def test_claim_next_takes_due_job_once(session):
+    due = _job(session, "r-1")
+    _job(session, "r-2", next_run_at=datetime.utcnow() + timedelta(minutes=5))
+
+    claimed = generation_job_repo.claim_next(session, "w-1", lease_seconds=LEASE)
+
+    assert claimed is not None and claimed.id == due.id
+    assert claimed.status == "running" and claimed.attempts == 1 and claimed.locked_by == "w-1"
+    # Diğer iş henüz zamanı gelmediği için alınmaz; alınan iş ikinci kez verilmez
+    assert generation_job_repo.claim_next(session, "w-2", lease_seconds=LEASE) is None
+
+
+def test_claim_next_reclaims_running_job_after_lease(session):
+    job = _job(session, "r-1")
+    assert generation_job_repo.claim_next(session, "w-1", lease_seconds=LEASE) is not None
+    assert generation_job_repo.claim_next(session, "w-2", lease_seconds=LEASE) is None
+
+    job = generation_job_repo.get_job(session, job.id)
+    job.locked_at = datetime.utcnow() - timedelta(seconds=LEASE + 1)
+    session.add(job)
+    session.commit()
+
+    reclaimed = generation_job_repo.claim_next(session, "w-2", lease_seconds=LEASE)
+    assert reclaimed is not None and reclaimed.locked_by == "w-2" and reclaimed.attempts == 2
+
+
+def test_defer_requeues_without_burning_an_attempt(session):
+    job = _job(session, "r-1")
+    generation_job_repo.claim_next(session, "w-1", lease_seconds=LEASE)
+
+    generation_job_repo.defer(session, job.id, "busy elsewhere", delay_seconds=30)
+
+    job = generation_job_repo.get_job(session, job.id)
+    assert job.status == "queued" and job.attempts == 0 and job.locked_at is None
+    assert job.last_error == "busy elsewhere"
+    assert job.next_run_at > datetime.utcnow() + timedelta(seconds=20)
+    assert generation_job_repo.claim_next(session, "w-2", lease_seconds=LEASE) is None
+
+
+def test_hand_back_makes_running_job_claimable_immediately(session):
+    job = _job(session, "r-1")
+    generation_job_repo.claim_next(session, "w-1", lease_seconds=LEASE)
+
+    assert generation_job_repo.hand_back(session, job.id, "drained on shutdown") is True
+    # Sadece running iş geri verilir
+    assert generation_job_repo.hand_back(session, job.id, "again") is False
+
+    reclaimed = generation_job_repo.claim_next(session, "w-2", lease_seconds=LEASE)
+    assert reclaimed is not None and reclaimed.id == job.id
+    assert reclaimed.locked_by == "w-2" and reclaimed.attempts == 1
+
+
+def _steal_after_lease(session, job_id: str):
+    job = generation_job_repo.get_job(session, job_id)
+    job.locked_at = datetime.utcnow() - timedelta(seconds=LEASE + 1)
+    session.add(job)
+    session.commit()
+    return generation_job_repo.claim_next(session, "w-2", lease_seconds=LEASE)
+
+
+def test_stale_owner_cannot_finish_or_fail_reclaimed_job(session):
+    job = _job(session, "r-1")
+    generation_job_repo.claim_next(session, "w-1", lease_seconds=LEASE)
+    assert _steal_after_lease(session, job.id).locked_by == "w-2"
+
+    assert generation_job_repo.mark_done(session, job.id, "w-1") is False
+    assert generation_job_repo.mark_failed(session, job.id, "w-1", "boom", retry_in_seconds=5) is None
+    assert generation_job_repo.mark_failed(session, job.id, "w-1", "boom", retry_in_seconds=None) is None
+
+    session.expire_all()
+    job = generation_job_repo.get_job(session, job.id)
+    assert job.status == "running" and job.locked_by == "w-2" and job.last_error is None
+
+    assert generation_job_repo.mark_done(session, job.id, "w-2") is True
+
+
+def test_mark_failed_requeues_until_attempts_run_out(session):
+    job = _job(session, "r-1", max_attempts=2)
+
+    generation_job_repo.claim_next(session, "w-1", lease_seconds=LEASE)
+    assert generation_job_repo.mark_failed(session, job.id, "w-1", "boom", retry_in_seconds=0) == "queued"
+
+    generation_job_repo.claim_next(session, "w-1", lease_seconds=LEASE)
+    assert generation_job_repo.mark_failed(session, job.id, "w-1", "boom", retry_in_seconds=0) == "failed"
+
+
+def test_process_job_keeps_reclaimed_row_when_lease_was_lost(session, monkeypatch):
+    job = _job(session, "r-1")
+    stale = generation_jobs.claim_next("w-1")
+    assert _steal_after_lease(session, job.id).locked_by == "w-2"
+
+    monkeypatch.setitem(
+        generation_jobs._HANDLERS,
+        "tarot",
+        generation_jobs._JobHandler(run=lambda s, rid: None, release=lambda s, rid: None),
+    )
+    generation_jobs.process_job(stale)
+
+    session.expire_all()
+    job = generation_job_repo.get_job(session, job.id)
+    assert job.status == "running" and job.locked_by == "w-2"
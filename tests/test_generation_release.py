@@ -0,0 +1,67 @@
+from __future__ import annotations
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.api.v1 import routes_stream
+from app.core.config import settings
+from app.main import app
+from app.models.numerology_db import NumerologyReadingDB
+from app.repositories import generation_job_repo
+from app.repositories.claims import claim_processing
+from app.repositories.numerology_repo import numerology_repo
+from app.services import generation_jobs, openai_service
+
+DEVICE = {"X-Device-Id": "device-1"}
+
+
+def _reading(session, *, is_paid: bool) -> NumerologyReadingDB:
+    r = NumerologyReadingDB(
+        device_id="device-1",
+        name="Ada",
+        birth_date="1990-01-01",
+        status="paid" if is_paid else "started",
+        is_paid=is_paid,
+    )
+    session.add(r)
+    session.commit()
+    session.refresh(r)
+    return r
+
+
+def _status(session, r: NumerologyReadingDB) -> str:
+    session.expire_all()
+    return numerology_repo.get(session=session, reading_id=r.id)["status"]
+
+
+@pytest.mark.parametrize("is_paid, expected", [(False, "started"), (True, "paid")])
+def test_failed_job_releases_by_payment_state(session, monkeypatch, is_paid, expected):
+    r = _reading(session, is_paid=is_paid)
+    monkeypatch.setattr(settings, "generation_job_max_attempts", 1)
+
+    def _boom(**kwargs):
+        raise RuntimeError("boom")
+
+    monkeypatch.setattr(openai_service, "generate_numerology_reading", _boom)
+    assert claim_processing(session, NumerologyReadingDB, r.id, product="numerology")
+    generation_jobs.enqueue_generation(session, "numerology", r.id)
+
+    generation_jobs.process_job(generation_jobs.claim_next("test-worker"))
+
+    assert _status(session, r) == expected
+    assert generation_job_repo.get_active(session, "numerology", r.id) is None
+
+
+@pytest.mark.parametrize("is_paid, expected", [(False, "started"), (True, "paid")])
+def test_failed_stream_uses_the_same_release(session, monkeypatch, is_paid, expected):
+    r = _reading(session, is_paid=is_paid)
+
+    async def _boom(prompt):
+        raise RuntimeError("boom")
+        yield
+
+    monkeypatch.setattr(routes_stream, "astream_reading", _boom)
+    res = TestClient(app).get(f"/api/v1/numerology/{r.id}/stream", headers=DEVICE)
+
+    assert "event: error" in res.text
+    assert _status(session, r) == expected
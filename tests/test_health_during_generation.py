@@ -0,0 +1,114 @@
+from __future__ import annotations
+
+import asyncio
+import threading
+import time
+from datetime import datetime
+
+import httpx
+
+from app.api.v1 import routes_coffee
+from app.core.config import settings
+from app.main import app
+from app.models.coffee_db import CoffeeReadingDB
+from app.repositories import coffee_repo
+from app.services import generation_jobs, openai_service
+
+DEVICE = {"X-Device-Id": "device-1"}
+SLOW_SECONDS = 1.0
+
+
+def _reading(session, *, photos: bool) -> CoffeeReadingDB:
+    r = coffee_repo.create_reading(
+        session,
+        CoffeeReadingDB(
+            topic="Genel",
+            name="Ada",
+            status="photos_uploaded" if photos else "pending_payment",
+            device_id="device-1",
+            created_at=datetime.utcnow(),
+            updated_at=datetime.utcnow(),
+        ),
+    )
+    if photos:
+        r = coffee_repo.set_photos(session, r.id, [f"storage/uploads/{r.id}/a.jpg"])
+    return r
+
+
+async def _race(slow_request, *, health_after: float = 0.1):
+    """slow_request ile /health'i aynı event loop'ta yarıştırır; bitiş sırasını döner."""
+    finished = []
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+
+        async def _slow():
+            res = await slow_request(client)
+            finished.append(("slow", res))
+
+        async def _health():
+            await asyncio.sleep(health_after)
+            started = time.monotonic()
+            res = await client.get("/health")
+            finished.append(("health", res))
+            return time.monotonic() - started
+
+        _, health_seconds = await asyncio.gather(_slow(), _health())
+    return finished, health_seconds
+
+
+def test_health_answers_while_upload_validation_is_slow(session, monkeypatch):
+    r = _reading(session, photos=False)
+
+    async def _slow_validate(paths):
+        await asyncio.sleep(SLOW_SECONDS)
+        return {"ok": True, "reason": "Uygun", "confidence": 1.0}
+
+    monkeypatch.setattr(routes_coffee, "avalidate_coffee_images", _slow_validate)
+    files = [("files", (f"{i}.jpg", b"x" * 200, "image/jpeg")) for i in range(settings.min_photos)]
+
+    finished, health_seconds = asyncio.run(
+        _race(lambda c: c.post(f"/api/v1/coffee/{r.id}/upload-images", files=files, headers=DEVICE))
+    )
+
+    assert [name for name, _ in finished] == ["health", "slow"]
+    assert health_seconds < SLOW_SECONDS / 2
+    assert all(res.status_code == 200 for _, res in finished)
+
+
+def test_health_answers_while_generation_job_is_slow(session, monkeypatch):
+    r = _reading(session, photos=True)
+    started = threading.Event()
+
+    def _slow_generate(**kwargs):
+        started.set()
+        time.sleep(SLOW_SECONDS)
+        return "Uzun bir yorum."
+
+    monkeypatch.setattr(settings, "coffee_single_pass", False)
+    monkeypatch.setattr(openai_service, "generate_fortune", _slow_generate)
+
+    stop = threading.Event()
+    consumer = threading.Thread(target=generation_jobs.run_consumer, args=(stop, "test-consumer"), kwargs={"poll_seconds": 0.05})
+    consumer.start()
+    try:
+
+        async def _scenario():
+            transport = httpx.ASGITransport(app=app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+                t0 = time.monotonic()
+                gen = await client.post(f"/api/v1/coffee/{r.id}/generate", headers=DEVICE)
+                generate_seconds = time.monotonic() - t0
+                assert await asyncio.to_thread(started.wait, 5)
+                t1 = time.monotonic()
+                health = await client.get("/health")
+                return gen, generate_seconds, health, time.monotonic() - t1
+
+        gen, generate_seconds, health, health_seconds = asyncio.run(_scenario())
+    finally:
+        stop.set()
+        consumer.join(timeout=5)
+
+    assert gen.status_code == 200 and gen.json()["status"] == "processing"
+    assert generate_seconds < SLOW_SECONDS / 2
+    assert health.status_code == 200
+    assert health_seconds < SLOW_SECONDS / 2
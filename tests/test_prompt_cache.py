@@ -0,0 +1,42 @@
+from __future__ import annotations
+
+from types import SimpleNamespace as NS
+
+from app.services import ai_retry, ai_usage, openai_service
+
+
+def _resp(input_tokens: int, cached_tokens: int) -> NS:
+    return NS(
+        id="resp",
+        output_text="ok.",
+        status="completed",
+        usage=NS(input_tokens=input_tokens, output_tokens=10, input_tokens_details=NS(cached_tokens=cached_tokens)),
+    )
+
+
+def test_create_response_sends_stage_prompt_cache_key():
+    sent = {}
+
+    def _create(**kwargs):
+        sent.update(kwargs)
+        return _resp(100, 0)
+
+    client = NS(responses=NS(create=_create))
+    with ai_retry.stage("personality.fusion"):
+        openai_service._create_response(client, model="m", input=[], extra_body={"x": 1})
+
+    assert sent["extra_body"] == {"x": 1, "prompt_cache_key": "lunaura:personality.fusion"}
+
+
+def test_usage_separates_cache_eligible_calls():
+    label = "cachetest.initial"
+    ai_usage.record(label, _resp(600, 0))  # eşik altı: cache'lenemez
+    ai_usage.record(label, _resp(2048, 1024))
+    ai_usage.record(label, _resp(1500, 0))
+
+    stage = ai_usage.usage_stats()["stages"][label]
+    assert stage["calls"] == 3
+    assert stage["eligible_calls"] == 2
+    assert stage["cache_hits"] == 1
+    assert stage["eligible_hit_rate"] == 0.5
+    assert stage["call_hit_rate"] == round(1 / 3, 3)
@@ -0,0 +1,52 @@
+from __future__ import annotations
+
+import threading
+
+from app.services import single_flight
+
+
+def test_followers_get_the_leader_result():
+    started, release = threading.Event(), threading.Event()
+    calls = []
+
+    def _generate():
+        calls.append(1)
+        started.set()
+        release.wait(5)
+        return "yorum"
+
+    results = []
+    leader = threading.Thread(target=lambda: results.append(single_flight.run("coffee", "sf-1", _generate)))
+    leader.start()
+    assert started.wait(5)
+    follower = threading.Thread(target=lambda: results.append(single_flight.run("coffee", "sf-1", _generate)))
+    follower.start()
+    release.set()
+    leader.join(5)
+    follower.join(5)
+
+    assert calls == [1]
+    assert sorted(results, key=lambda r: r[1]) == [("yorum", False), ("yorum", True)]
+    assert single_flight.follow("coffee", "sf-1") is None
+
+
+class _DeadConnection:
+    closed = False
+
+    def execute(self, *args, **kwargs):
+        raise ConnectionError("server closed the connection")
+
+    def close(self):
+        self.closed = True
+
+
+def test_lost_advisory_lock_is_counted_and_connection_closed():
+    before = single_flight.single_flight_stats()["products"].get("coffee", {}).get("lock_lost", 0)
+    flight = single_flight.begin("coffee", "sf-2")
+    conn = flight._conn = _DeadConnection()
+
+    flight.finish(result="yorum")
+
+    assert conn.closed and flight._conn is None
+    assert flight.future.result() == "yorum"
+    assert single_flight.single_flight_stats()["products"]["coffee"]["lock_lost"] == before + 1
@@ -0,0 +1,121 @@
+from __future__ import annotations
+
+import json
+from datetime import datetime
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.api.v1 import routes_stream
+from app.main import app
+from app.models.tarot_db import TarotReadingDB
+from app.repositories import generation_job_repo, tarot_repo
+from app.services import generation_jobs
+
+DEVICE = {"X-Device-Id": "device-1"}
+
+
+@pytest.fixture
+def client() -> TestClient:
+    return TestClient(app)
+
+
+def _reading(session) -> TarotReadingDB:
+    r = TarotReadingDB(
+        device_id="device-1",
+        name="Ada",
+        topic="Aşk",
+        spread_type="three",
+        is_paid=True,
+        status="paid",
+        created_at=datetime.utcnow(),
+        updated_at=datetime.utcnow(),
+    )
+    r.set_cards(["The Fool", "The Sun", "The Moon"])
+    return tarot_repo.create_reading(session, r)
+
+
+def _events(res) -> list:
+    out = []
+    for block in res.text.strip().split("\n\n"):
+        event, data = block.split("\n", 1)
+        out.append((event.removeprefix("event: "), json.loads(data.removeprefix("data: "))))
+    return out
+
+
+def _fake_stream(*parts, error: Exception | None = None):
+    async def _stream(prompt):
+        for p in parts:
+            yield p
+        if error is not None:
+            raise error
+
+    return _stream
+
+
+def test_stream_takes_over_job_queued_by_generate(client, session, monkeypatch):
+    r = _reading(session)
+    monkeypatch.setattr(routes_stream, "astream_reading", _fake_stream("Kartların ", "güzel."))
+
+    assert client.post(f"/api/v1/tarot/{r.id}/generate", headers=DEVICE).json()["status"] == "processing"
+    events = _events(client.get(f"/api/v1/tarot/{r.id}/stream", headers=DEVICE))
+
+    assert [e for e, _ in events] == ["status", "delta", "delta", "done"]
+    assert events[-1][1]["result_text"] == "Kartların güzel."
+    session.expire_all()
+    assert generation_job_repo.get_active(session, "tarot", r.id) is None
+    assert tarot_repo.get_reading(session, r.id).status == "completed"
+
+
+def test_failed_takeover_requeues_job_and_keeps_processing(client, session, monkeypatch):
+    r = _reading(session)
+    monkeypatch.setattr(routes_stream, "astream_reading", _fake_stream("Yarım", error=RuntimeError("boom")))
+
+    client.post(f"/api/v1/tarot/{r.id}/generate", headers=DEVICE)
+    events = _events(client.get(f"/api/v1/tarot/{r.id}/stream", headers=DEVICE))
+
+    assert [e for e, _ in events] == ["status", "delta", "status"]
+    session.expire_all()
+    job = generation_job_repo.get_active(session, "tarot", r.id)
+    assert job is not None and job.status == "queued" and job.attempts == 1
+    assert tarot_repo.get_reading(session, r.id).status == "processing"
+
+
+def test_stream_does_not_take_over_job_already_running(client, session, monkeypatch):
+    r = _reading(session)
+
+    async def _no_stream(prompt):
+        raise AssertionError("job is owned by a worker")
+        yield
+
+    monkeypatch.setattr(routes_stream, "astream_reading", _no_stream)
+
+    client.post(f"/api/v1/tarot/{r.id}/generate", headers=DEVICE)
+    assert generation_jobs.claim_next("test-worker") is not None
+    events = _events(client.get(f"/api/v1/tarot/{r.id}/stream", headers=DEVICE))
+
+    assert [e for e, _ in events] == ["status"]
+
+
+def test_drain_after_takeover_hands_job_back(client, session, monkeypatch):
+    r = _reading(session)
+    take_over = generation_jobs.take_over
+    monkeypatch.setattr(routes_stream, "_draining", False)
+
+    def _take_over_then_drain(*args):
+        job = take_over(*args)
+        # Kapanış take_over ile single-flight arasındaki await'te başladı
+        routes_stream._draining = True
+        return job
+
+    monkeypatch.setattr(generation_jobs, "take_over", _take_over_then_drain)
+    monkeypatch.setattr(routes_stream, "astream_reading", _fake_stream("Yorum"))
+
+    client.post(f"/api/v1/tarot/{r.id}/generate", headers=DEVICE)
+    events = _events(client.get(f"/api/v1/tarot/{r.id}/stream", headers=DEVICE))
+
+    assert [e for e, _ in events] == ["status"]
+    session.expire_all()
+    job = generation_job_repo.get_active(session, "tarot", r.id)
+    assert job is not None and job.status == "queued" and job.attempts == 0
+    assert job.locked_by is None